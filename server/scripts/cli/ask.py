@@ -4,7 +4,8 @@ import argparse
 from pathlib import Path
 
 from src.core.store import StudyStore
-from src.retrieval.indexer import TfIdfIndex
+from src.core.load_studies import corpus_hash
+from src.retrieval.indexer import load_or_build_tfidf
 from src.ft.answerer import answer_query, Mode
 from src.core.logging_utils import log_interaction, build_retrieval_log
 
@@ -46,9 +47,9 @@ def main() -> None:
     passages = store.get_all_passages()
     study_lookup = {s.id: s for s in studies}
 
-    index = TfIdfIndex()
-    index.add_passages(passages)
-    index.build()
+    index = load_or_build_tfidf(
+        Path("data/index/tfidf"), passages, corpus_hash(studies_dir)
+    )
 
     raw_results = index.search(query, top_k=args.top_k_passages)
 
@@ -59,6 +60,7 @@ def main() -> None:
         studies=studies,
         top_k_passages=args.top_k_passages,
         max_studies=args.max_studies,
+        results=raw_results,
     )
 
     print("\n=== Answer ===")
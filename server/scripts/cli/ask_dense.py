@@ -41,7 +41,7 @@ def main() -> None:
     studies = store.get_all_studies()
     passages = store.get_all_passages()
 
-    retriever = DenseRetriever()
+    retriever = DenseRetriever(cache_dir=Path("data/index/embeddings"))
     retriever.add_passages(passages)
 
     ans = answer_query(
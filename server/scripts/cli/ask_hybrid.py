@@ -54,6 +54,7 @@ def main() -> None:
     retriever = HybridRetriever(
         tfidf_weight=args.tfidf_weight,
         dense_weight=args.dense_weight,
+        embedding_cache_dir=Path("data/index/embeddings"),
     )
     retriever.add_passages(passages)
 
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from src.core.corpus_pack import write_corpus_pack
+from src.core.load_studies import corpus_hash
+from src.core.sqlite_store import SqliteStudyStore
+from src.core.store import StudyStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compile the study JSON files into a single binary corpus pack."
+    )
+    parser.add_argument("--studies-dir", type=str, default="data/studies")
+    parser.add_argument("--out", type=str, default="data/index/corpus.pack")
+    parser.add_argument(
+        "--sqlite",
+        type=str,
+        default="",
+        help="Also upsert the corpus into this SQLite store (FTS5 sparse search).",
+    )
+    args = parser.parse_args()
+
+    studies_dir = Path(args.studies_dir)
+    out = Path(args.out)
+
+    start = time.perf_counter()
+    store = StudyStore.from_dir(studies_dir)
+    load_s = time.perf_counter() - start
+    print(
+        f"Loaded {len(store.studies)} studies, {len(store.passages)} passages "
+        f"from JSON in {load_s:.2f}s"
+    )
+
+    digest = corpus_hash(studies_dir)
+    write_corpus_pack(out, store.studies, store.passages, digest)
+    print(f"Wrote {out} ({out.stat().st_size / 1e6:.1f} MB)")
+
+    # Reopen and check it round-trips
+    start = time.perf_counter()
+    packed = StudyStore.from_pack(out, corpus_hash=digest)
+    open_ms = (time.perf_counter() - start) * 1000
+    if packed.studies != store.studies or list(packed.passages) != list(store.passages):
+        raise RuntimeError(f"{out} does not match the JSON corpus")
+    print(f"Verified pack (open: {open_ms:.1f}ms)")
+
+    if args.sqlite:
+        start = time.perf_counter()
+        db = SqliteStudyStore(Path(args.sqlite))
+        db.import_corpus(store.studies, store.passages, corpus_hash=digest)
+        db.close()
+        print(f"Upserted into {args.sqlite} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
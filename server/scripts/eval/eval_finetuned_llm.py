@@ -7,6 +7,8 @@ import re
 
 from src.core.store import StudyStore
 from src.core.models import Study, Passage
+from src.retrieval.dense_retriever import DEFAULT_MODEL_NAME
+from src.retrieval.embedding_cache import QueryEmbeddingCache
 from src.retrieval.hybrid_retriever import HybridRetriever
 from src.retrieval.retriever import Retriever
 from src.ft.answerer import answer_query, Mode
@@ -16,9 +18,19 @@ from server.scripts.eval.batch_eval import load_test_queries
 from src.eval.citations import check_citations
 
 
-def make_retriever(passages: List[Passage]) -> Retriever:
+QUERY_CACHE_PATH = Path("data/index/query_embeddings.npz")
+
+
+def make_retriever(
+    passages: List[Passage], query_cache: QueryEmbeddingCache | None = None
+) -> Retriever:
     # Retriever weights can be adjusted
-    retriever = HybridRetriever(tfidf_weight=0.4, dense_weight=0.6)
+    retriever = HybridRetriever(
+        tfidf_weight=0.4,
+        dense_weight=0.6,
+        embedding_cache_dir=Path("data/index/embeddings"),
+        query_cache=query_cache,
+    )
     retriever.add_passages(passages)
     return retriever
 
@@ -74,7 +86,8 @@ def eval_finetuned_llm() -> Dict[str, Any]:
     passages = store.get_all_passages()
     studies_by_id = {s.id: s for s in studies}
 
-    retriever = make_retriever(passages)
+    query_cache = QueryEmbeddingCache(DEFAULT_MODEL_NAME, path=QUERY_CACHE_PATH)
+    retriever = make_retriever(passages, query_cache)
     test = load_test_queries(test_path)
 
     # Load fine-tuned LLM
@@ -198,6 +211,8 @@ def eval_finetuned_llm() -> Dict[str, Any]:
         "per_query": per_query_results,
     }
 
+    query_cache.save()
+
     out_path.parent.mkdir(parents=True, exist_ok=True)
     with out_path.open("w", encoding="utf-8") as f:
         json.dump(report, f, ensure_ascii=False, indent=2)
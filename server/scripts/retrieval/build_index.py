@@ -1,11 +1,14 @@
+import time
 from pathlib import Path
 
 from src.core.store import StudyStore
+from src.core.load_studies import corpus_hash
 from src.retrieval.indexer import TfIdfIndex
 
 
 def main():
     studies_dir = Path("data/studies")
+    index_dir = Path("data/index/tfidf")
     store = StudyStore.from_dir(studies_dir)
 
     studies = store.get_all_studies()
@@ -13,11 +16,21 @@ def main():
 
     print(f"Loaded {len(studies)} studies, {len(passages)} passages.")
 
+    start = time.perf_counter()
     index = TfIdfIndex()
     index.add_passages(passages)
     index.build()
+    build_s = time.perf_counter() - start
 
-    print(f"Index built with vocab size: {len(index.vocab)}")
+    print(f"Index built with vocab size: {len(index.vocab)} in {build_s:.2f}s")
+
+    # Persist so the API and scripts can memory-map it instead of rebuilding
+    index.save(index_dir, corpus_hash(studies_dir))
+
+    start = time.perf_counter()
+    TfIdfIndex.load(index_dir, passages, corpus_hash=corpus_hash(studies_dir))
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"Saved index to {index_dir} (reload + hash check: {load_ms:.1f}ms)")
 
     # Testing
     for s in studies:
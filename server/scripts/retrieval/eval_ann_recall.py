@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.core.store import StudyStore
+from src.retrieval.ann import HnswIndex, IvfFlatIndex
+from src.retrieval.dense_retriever import DenseRetriever
+
+# Settings swept for each index kind
+NPROBE_GRID = [1, 2, 4, 8, 16, 32]
+EF_SEARCH_GRID = [16, 32, 64, 128, 256]
+
+
+def load_queries(path: Path, store: StudyStore, sample_passages: int) -> List[str]:
+    with path.open("r", encoding="utf-8") as f:
+        queries = [item["query"] for item in json.load(f)]
+
+    # Optional extra pseudo-queries (first sentence of random passages) for
+    # steadier recall numbers than a handful of labelled queries give
+    if sample_passages > 0:
+        passages = store.get_all_passages()
+        rng = np.random.default_rng(0)
+        picked = rng.choice(
+            len(passages), size=min(sample_passages, len(passages)), replace=False
+        )
+        for i in sorted(picked.tolist()):
+            queries.append(passages[i].text.split(". ")[0][:200])
+    return queries
+
+
+def sweep(
+    index: Any,
+    knob: str,
+    grid: List[int],
+    query_emb: np.ndarray,
+    exact: List[set],
+    top_k: int,
+) -> List[Dict[str, Any]]:
+    rows = []
+    for value in grid:
+        setattr(index, knob, value)
+        hits = 0
+        start = time.perf_counter()
+        for q, truth in zip(query_emb, exact):
+            found, _scores = index.search(q, top_k)
+            hits += len(truth & set(found.tolist()))
+        elapsed = time.perf_counter() - start
+        rows.append(
+            {
+                knob: value,
+                f"recall@{top_k}": hits / max(1, len(exact) * top_k),
+                "ms_per_query": 1000.0 * elapsed / max(1, len(query_emb)),
+            }
+        )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Recall of the ANN indexes against exact dense search"
+    )
+    parser.add_argument("--studies-dir", default="data/studies")
+    parser.add_argument("--queries", default="data/eval/test_queries.json")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument(
+        "--sample-passages",
+        type=int,
+        default=0,
+        help="Add N pseudo-queries taken from random passages",
+    )
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=100)
+    parser.add_argument(
+        "--save-dir",
+        default=None,
+        help="Also save the built indexes here (ivf.npz / hnsw.npz)",
+    )
+    parser.add_argument("--out", default="data/eval/ann_recall.json")
+    args = parser.parse_args()
+
+    store = StudyStore.from_dir(Path(args.studies_dir))
+    dense = DenseRetriever(cache_dir=Path("data/index/embeddings"))
+    if not dense.enabled:
+        print("sentence-transformers is not installed; nothing to evaluate")
+        return
+
+    dense.add_passages(store.get_all_passages())
+    vectors = np.asarray(dense.embeddings, dtype=np.float32)
+    top_k = min(args.top_k, len(vectors))
+
+    queries = load_queries(Path(args.queries), store, args.sample_passages)
+    query_emb = dense.model.encode(queries, convert_to_numpy=True)
+    query_emb = query_emb / (np.linalg.norm(query_emb, axis=1, keepdims=True) + 1e-8)
+    query_emb = query_emb.astype(np.float32)
+
+    start = time.perf_counter()
+    exact = [
+        set(np.argsort(-(vectors @ q), kind="stable")[:top_k].tolist())
+        for q in query_emb
+    ]
+    exact_ms = 1000.0 * (time.perf_counter() - start) / max(1, len(queries))
+
+    report: Dict[str, Any] = {
+        "num_passages": len(vectors),
+        "num_queries": len(queries),
+        "top_k": top_k,
+        "exact_ms_per_query": exact_ms,
+    }
+
+    for name, index, knob, grid in (
+        ("ivf", IvfFlatIndex(nlist=args.nlist), "nprobe", NPROBE_GRID),
+        (
+            "hnsw",
+            HnswIndex(M=args.hnsw_m, ef_construction=args.ef_construction),
+            "ef_search",
+            EF_SEARCH_GRID,
+        ),
+    ):
+        start = time.perf_counter()
+        index.build(vectors)
+        build_s = time.perf_counter() - start
+        print(f"Built {name} index in {build_s:.1f}s")
+
+        report[name] = {
+            "build_seconds": build_s,
+            "sweep": sweep(index, knob, grid, query_emb, exact, top_k),
+        }
+        if args.save_dir:
+            path = Path(args.save_dir) / f"{name}.npz"
+            index.save(path, dense.fingerprint())
+            print(f"Saved {name} index to {path}")
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Exact search: {exact_ms:.2f} ms/query over {len(vectors)} passages")
+    for name, knob in (("ivf", "nprobe"), ("hnsw", "ef_search")):
+        for row in report[name]["sweep"]:
+            print(
+                f"{name:5s} {knob}={row[knob]:<4d} "
+                f"recall@{top_k}={row[f'recall@{top_k}']:.3f} "
+                f"{row['ms_per_query']:.2f} ms/query"
+            )
+    print(f"Wrote ANN recall report to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
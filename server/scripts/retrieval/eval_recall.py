@@ -4,8 +4,8 @@ import json
 from pathlib import Path
 from typing import List, Dict, Any
 
-from src.core.load_studies import load_studies_from_dir
-from src.retrieval.indexer import TfIdfIndex
+from src.core.load_studies import load_studies_from_dir, corpus_hash
+from src.retrieval.indexer import TfIdfIndex, load_or_build_tfidf
 
 
 def load_test_queries(path: Path) -> List[Dict[str, Any]]:
@@ -56,10 +56,10 @@ def main() -> None:
     studies, passages = load_studies_from_dir(studies_dir)
     print(f"Loaded {len(studies)} studies, {len(passages)} passages.")
 
-    index = TfIdfIndex()
-    index.add_passages(passages)
-    index.build()
-    print(f"Index built with vocab size {len(index.vocab)}.")
+    index = load_or_build_tfidf(
+        Path("data/index/tfidf"), passages, corpus_hash(studies_dir)
+    )
+    print(f"Index ready with vocab size {len(index.vocab)}.")
 
     test_queries = load_test_queries(test_path)
 
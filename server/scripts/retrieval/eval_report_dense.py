@@ -5,11 +5,15 @@ from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
 from src.core.store import StudyStore
-from src.retrieval.dense_retriever import DenseRetriever
+from src.retrieval.dense_retriever import DEFAULT_MODEL_NAME, DenseRetriever
+from src.retrieval.embedding_cache import QueryEmbeddingCache
 from src.core.text_utils import tokenize
 from src.core.models import Study, Passage
 
 
+QUERY_CACHE_PATH = Path("data/index/query_embeddings.npz")
+
+
 def load_test_queries(path: Path) -> List[Dict[str, Any]]:
     with path.open("r", encoding="utf-8") as f:
         return json.load(f)
@@ -91,7 +95,11 @@ def eval_report(
     passages = store.get_all_passages()
     studies_by_id = {s.id: s for s in studies}
 
-    retriever = DenseRetriever()
+    # Query encodings persist across runs
+    query_cache = QueryEmbeddingCache(DEFAULT_MODEL_NAME, path=QUERY_CACHE_PATH)
+    retriever = DenseRetriever(
+        cache_dir=Path("data/index/embeddings"), query_cache=query_cache
+    )
     retriever.add_passages(passages)
 
     per_query = []
@@ -134,6 +142,7 @@ def eval_report(
         for k, v in agg.items():
             avg[k] = v / max(1, count)
 
+        query_cache.save()
         return {
             "num_queries": count,
             "avg_metrics": avg,
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import argparse
 import json
 from pathlib import Path
 from typing import List, Dict, Any
 
-from src.core.load_studies import load_studies_from_dir
-from src.retrieval.indexer import TfIdfIndex
+from src.core.load_studies import load_studies_from_dir, corpus_hash
+from src.retrieval.indexer import load_or_build_tfidf
+from src.retrieval.bm25 import Bm25Index, Bm25FIndex
+from src.retrieval.retriever import SparseIndex
 
 
 def load_test_queries(path: Path) -> List[Dict[str, Any]]:
@@ -14,7 +17,7 @@ def load_test_queries(path: Path) -> List[Dict[str, Any]]:
 
 
 def compute_recall_and_mrr(
-    index: TfIdfIndex,
+    index: SparseIndex,
     test_queries: List[Dict[str, Any]],
     k_values: List[int],
 ) -> Dict[str, float]:
@@ -64,16 +67,31 @@ def compute_recall_and_mrr(
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate sparse retrieval")
+    parser.add_argument(
+        "--scorer",
+        type=str,
+        choices=["tfidf", "bm25", "bm25f"],
+        default="tfidf",
+        help="Sparse scoring engine to evaluate",
+    )
+    args = parser.parse_args()
+
     studies_dir = Path("data/studies")
     test_path = Path("data/eval/test_queries.json")
 
     studies, passages = load_studies_from_dir(studies_dir)
     print(f"Loaded {len(studies)} studies, {len(passages)} passages.")
 
-    index = TfIdfIndex()
-    index.add_passages(passages)
-    index.build()
-    print(f"Index built with vocab size {len(index.vocab)}.")
+    if args.scorer == "tfidf":
+        index: SparseIndex = load_or_build_tfidf(
+            Path("data/index/tfidf"), passages, corpus_hash(studies_dir)
+        )
+    else:
+        index = Bm25Index() if args.scorer == "bm25" else Bm25FIndex(studies)
+        index.add_passages(passages)
+        index.build()
+    print(f"{args.scorer} index ready with vocab size {len(index.vocab)}.")
 
     test_queries = load_test_queries(test_path)
 
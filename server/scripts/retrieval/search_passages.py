@@ -1,20 +1,22 @@
 from pathlib import Path
 
 from src.core.store import StudyStore
-from src.retrieval.indexer import TfIdfIndex
+from src.core.load_studies import corpus_hash
+from src.retrieval.indexer import load_or_build_tfidf
 
 
 def main() -> None:
-    store = StudyStore.from_dir(Path("data/studies"))
+    studies_dir = Path("data/studies")
+    store = StudyStore.from_dir(studies_dir)
     studies = store.get_all_studies()
     passages = store.get_all_passages()
 
     print(f"Loaded {len(studies)} studies, {len(passages)} passages.")
 
-    index = TfIdfIndex()
-    index.add_passages(passages)
-    index.build()
-    print(f"Index built with vocab size {len(index.vocab)}.")
+    index = load_or_build_tfidf(
+        Path("data/index/tfidf"), passages, corpus_hash(studies_dir)
+    )
+    print(f"Index ready with vocab size {len(index.vocab)}.")
 
     # Build study lookup with study_id -> study
     study_lookup = {s.id: s for s in studies}
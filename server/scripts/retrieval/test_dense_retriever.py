@@ -12,7 +12,7 @@ def main() -> None:
 
     print(f"Loaded {len(passages)} passages.")
 
-    retriever = DenseRetriever()
+    retriever = DenseRetriever(cache_dir=Path("data/index/embeddings"))
     retriever.add_passages(passages)
 
     print("Dense embeddings built")
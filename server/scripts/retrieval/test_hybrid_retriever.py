@@ -15,7 +15,11 @@ def main() -> None:
 
     print(f"Loaded {len(passages)} passages.")
 
-    retriever = HybridRetriever(tfidf_weight=0.5, dense_weight=0.5)
+    retriever = HybridRetriever(
+        tfidf_weight=0.5,
+        dense_weight=0.5,
+        embedding_cache_dir=Path("data/index/embeddings"),
+    )
     retriever.add_passages(passages)
 
     print("Hybrid retriever initialised (TF-IDF + Dense)")
@@ -1,15 +1,56 @@
 from __future__ import annotations
 
+import argparse
 import json
 from pathlib import Path
 from typing import Any, Dict, List
 
 from src.core.store import StudyStore
 from src.core.models import Study, Passage
-from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.dense_retriever import DEFAULT_MODEL_NAME
+from src.retrieval.embedding_cache import QueryEmbeddingCache
+from src.retrieval.hybrid_retriever import FUSION_MODES, HybridRetriever
+from src.retrieval.indexer import TfIdfIndex
 from src.retrieval.retriever import Retriever
 
-from server.scripts.eval.batch_eval import eval_report, load_test_queries
+from scripts.retrieval.eval_report_dense import (
+    compute_recall_mrr_for_query,
+    load_test_queries,
+    top1_alignment,
+)
+
+QUERY_CACHE_PATH = Path("data/index/query_embeddings.npz")
+
+
+def eval_retriever(
+    retriever: Retriever,
+    studies_by_id: Dict[int, Study],
+    k_values: List[int],
+    test_queries: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Average recall / MRR and top-1 alignment of retriever over the test queries
+    """
+    agg: Dict[str, float] = {}
+    for item in test_queries:
+        results = retriever.search(item["query"], top_k=max(k_values))
+        metrics = compute_recall_mrr_for_query(
+            results, item.get("relevant_studies", []), k_values
+        )
+        align = top1_alignment(
+            top_passage=results[0][0] if results else None,
+            studies_by_id=studies_by_id,
+            target_training_status=item.get("target_training_status"),
+            target_outcomes=item.get("target_outcomes", []),
+        )
+        for k, v in {**metrics, **align}.items():
+            agg[k] = agg.get(k, 0.0) + v
+
+    count = len(test_queries)
+    return {
+        "num_queries": count,
+        "avg_metrics": {k: v / max(1, count) for k, v in agg.items()},
+    }
 
 
 def run_for_weights(
@@ -18,13 +59,20 @@ def run_for_weights(
     passages: List[Passage],
     studies_by_id: Dict[int, Study],
     test_queries: List[Dict[str, Any]],
+    query_cache: QueryEmbeddingCache | None = None,
+    fusion: str = "minmax",
+    sparse: TfIdfIndex | None = None,
 ) -> Dict[str, Any]:
     retriever: Retriever = HybridRetriever(
         tfidf_weight=tfidf_w,
         dense_weight=dense_w,
+        embedding_cache_dir=Path("data/index/embeddings"),
+        sparse=sparse,
+        query_cache=query_cache,
+        fusion=fusion,
     )
     retriever.add_passages(passages)
-    report = eval_report(
+    report = eval_retriever(
         retriever=retriever,
         studies_by_id=studies_by_id,
         k_values=[1, 3, 5],
@@ -34,9 +82,17 @@ def run_for_weights(
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare hybrid fusion modes over a weight grid"
+    )
+    parser.add_argument(
+        "--out", type=Path, default=Path("data/eval/hybrid_tuning.json")
+    )
+    args = parser.parse_args()
+
     studies_dir = Path("data/studies")
     test_path = Path("data/eval/test_queries.json")
-    out_path = Path("data/eval/hybrid_tuning.json")
+    out_path = args.out
 
     store = StudyStore.from_dir(studies_dir)
     studies = store.get_all_studies()
@@ -45,6 +101,13 @@ def main() -> None:
 
     test = load_test_queries(test_path)
 
+    # Every run sees the same queries: encode each once, across runs too
+    query_cache = QueryEmbeddingCache(DEFAULT_MODEL_NAME, path=QUERY_CACHE_PATH)
+    # Weights and fusion don't change the sparse index: build it once
+    sparse = TfIdfIndex()
+    sparse.add_passages(passages)
+    sparse.build()
+
     # Tune weights
     weights = [
         (0.8, 0.2),
@@ -56,24 +119,36 @@ def main() -> None:
 
     all_results: List[Dict[str, Any]] = []
 
-    for tfidf_w, dense_w in weights:
-        print(f"\n=== Evaluating tfidf={tfidf_w:.2f}, dense={dense_w:.2f} ===")
-        report = run_for_weights(
-            tfidf_w=tfidf_w,
-            dense_w=dense_w,
-            passages=passages,
-            studies_by_id=studies_by_id,
-            test_queries=test,
-        )
-        avg = report["avg_metrics"]
-        print(json.dumps(avg, indent=2))
-        all_results.append(
-            {
-                "tfidf_weight": tfidf_w,
-                "dense_weight": dense_w,
-                "avg_metrics": avg,
-            }
-        )
+    # Every fusion mode over the same weight grid
+    for fusion in FUSION_MODES:
+        for tfidf_w, dense_w in weights:
+            print(
+                f"\n=== Evaluating fusion={fusion}, "
+                f"tfidf={tfidf_w:.2f}, dense={dense_w:.2f} ==="
+            )
+            report = run_for_weights(
+                tfidf_w=tfidf_w,
+                dense_w=dense_w,
+                passages=passages,
+                studies_by_id=studies_by_id,
+                test_queries=test,
+                query_cache=query_cache,
+                fusion=fusion,
+                sparse=sparse,
+            )
+            avg = report["avg_metrics"]
+            print(json.dumps(avg, indent=2))
+            all_results.append(
+                {
+                    "fusion": fusion,
+                    "tfidf_weight": tfidf_w,
+                    "dense_weight": dense_w,
+                    "avg_metrics": avg,
+                }
+            )
+
+    query_cache.save()
+    print(f"Query embedding cache: {query_cache.stats()}")
 
     out = {
         "results": all_results,
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+from src.core.text_utils import normalise
+
+
+def answer_cache_key(
+    query: str,
+    mode: str,
+    use_llm: bool,
+    top_k_passages: int,
+    max_studies: int,
+    model: str,
+    corpus_hash: str,
+    **extra: Any,
+) -> str:
+    """
+    Cache key for an /ask answer: every input that can change the response
+
+    The query is normalised (case, punctuation, whitespace), so trivially
+    different spellings of the same question share an entry
+    """
+    payload = {
+        "query": normalise(query),
+        "mode": mode,
+        "use_llm": use_llm,
+        "top_k_passages": top_k_passages,
+        "max_studies": max_studies,
+        "model": model,
+        "corpus_hash": corpus_hash,
+        **extra,
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class AnswerStore(Protocol):
+    """
+    Second cache tier shared between worker processes
+    """
+
+    def get(self, key: str, namespace: str, max_age: float) -> Optional[str]: ...
+
+    def put(self, key: str, namespace: str, value: str) -> None: ...
+
+    def drop_other_namespaces(self, namespace: str) -> int: ...
+
+
+class SqliteAnswerStore:
+    """
+    AnswerStore in a SQLite file (WAL mode, safe for several worker processes)
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=5.0, check_same_thread=False
+        )
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY,"
+                " namespace TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created REAL NOT NULL)"
+            )
+
+    def get(self, key: str, namespace: str, max_age: float) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM answers WHERE key = ? AND namespace = ?",
+                (key, namespace),
+            ).fetchone()
+        if row is None or time.time() - row[1] > max_age:
+            return None
+        return row[0]
+
+    def put(self, key: str, namespace: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, namespace, value, created)"
+                " VALUES (?, ?, ?, ?)",
+                (key, namespace, value, time.time()),
+            )
+
+    def drop_other_namespaces(self, namespace: str) -> int:
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "DELETE FROM answers WHERE namespace != ?", (namespace,)
+            )
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class AnswerCache:
+    """
+    Exact-match answer cache: in-process LRU with TTL, backed by an optional
+    shared AnswerStore (e.g. SqliteAnswerStore)
+
+    Entries live in a namespace, the corpus hash: switching namespace
+    (a corpus reload) empties the memory tier and purges the store, so an
+    answer computed against an older corpus is never served
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 1024,
+        ttl_seconds: float = 24 * 3600,
+        store: Optional[AnswerStore] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+        self.hits = 0  # memory or store
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0  # LRU evictions + expiries
+
+        self.namespace = ""
+        self.set_namespace(namespace)
+
+    def set_namespace(self, namespace: str) -> None:
+        with self._lock:
+            if namespace == self.namespace:
+                return
+            self.namespace = namespace
+            self.evictions += len(self._entries)
+            self._entries.clear()
+        if self.store is not None:
+            self.store.drop_other_namespaces(namespace)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+
+        if self.store is not None:
+            raw = self.store.get(key, self.namespace, self.ttl_seconds)
+            if raw is not None:
+                value = json.loads(raw)
+                self._remember(key, value, now)
+                with self._lock:
+                    self.hits += 1
+                    self.store_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, value: Dict[str, Any], created: float) -> None:
+        with self._lock:
+            self._entries[key] = (created, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        self._remember(key, value, time.time())
+        if self.store is not None:
+            self.store.put(key, self.namespace, json.dumps(value, ensure_ascii=False))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "namespace": self.namespace,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class SemanticAnswerCache:
+    """
+    Answers reused across paraphrased questions
+
+    Holds up to max_entries unit query embeddings in one matrix; a lookup is a
+    single mat-vec, and the best entry in the same group (mode, params, model,
+    corpus - everything in the exact key except the query) is a hit when its
+    cosine similarity is at least `threshold`. When full, the least recently
+    used entry is replaced
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 512) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._matrix: np.ndarray | None = None  # (max_entries, dim), allocated lazily
+        self._groups = np.full(max_entries, -1, dtype=np.int64)  # -1 = free slot
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._values: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._group_ids: Dict[str, int] = {}
+        self._clock = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, query_emb: np.ndarray, group: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            gid = self._group_ids.get(group)
+            if gid is None or self._matrix is None:
+                self.misses += 1
+                return None
+
+            sims = self._matrix @ query_emb.astype(np.float32, copy=False)
+            sims[self._groups != gid] = -np.inf
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._last_used[best] = self._tick()
+            self.hits += 1
+            return self._values[best]
+
+    def put(self, query_emb: np.ndarray, group: str, value: Dict[str, Any]) -> None:
+        query_emb = query_emb.astype(np.float32, copy=False)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros(
+                    (self.max_entries, query_emb.shape[0]), dtype=np.float32
+                )
+            gid = self._group_ids.setdefault(group, len(self._group_ids))
+
+            free = np.flatnonzero(self._groups == -1)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            self._matrix[slot] = query_emb
+            self._groups[slot] = gid
+            self._values[slot] = value
+            self._last_used[slot] = self._tick()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.evictions += int((self._groups != -1).sum())
+            self._groups[:] = -1
+            self._values = [None] * self.max_entries
+            self._group_ids.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": int((self._groups != -1).sum()),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,25 +1,101 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
+import numpy as np
 from pydantic import BaseModel
-from typing import Literal, List, Dict, Any, Tuple, Optional
+from typing import (
+    Literal,
+    List,
+    Dict,
+    Any,
+    Tuple,
+    Optional,
+    Callable,
+    Sequence,
+    TypeVar,
+)
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
 from pathlib import Path
 
-from src.core.store import StudyStore
+from src.core.sqlite_store import SqliteStudyStore
+from src.core.store import StudyStore, load_or_build_store
+from src.core.load_studies import corpus_hash
+from src.retrieval.ann import make_ann_index
+from src.retrieval.context import RetrievalContext
+from src.retrieval.filters import SearchFilters
+from src.retrieval.fts import Fts5Index
 from src.retrieval.hybrid_retriever import HybridRetriever
-from src.ft.answerer import answer_query, Mode
+from src.retrieval.indexer import load_or_build_tfidf
+from src.ft.answerer import StudyFeatures, answer_query, Mode
+from src.ft.compression import DEFAULT_CONTEXT_TOKEN_BUDGET, compress_context
 from src.core.models import Passage
+from .answer_cache import (
+    AnswerCache,
+    SemanticAnswerCache,
+    SqliteAnswerStore,
+    answer_cache_key,
+)
 from .api_utils import rerank_by_recency
+from .single_flight import SingleFlight
+from .streaming import CitationStream, sse_event
+
+from src.ft.openai_llm import AsyncOpenAIDomainLLM, close_async_client
+
+T = TypeVar("T")
+
+# Retrieval is numpy-heavy and releases the GIL, so a few threads keep up with
+# many concurrent requests while the event loop waits on the LLM
+RETRIEVAL_THREADS = int(
+    os.getenv("RETRIEVAL_THREADS", str(min(8, os.cpu_count() or 4)))
+)
+# Both pools are created per lifespan (a shut-down pool can't be restarted).
+# Sparse and dense legs of each hybrid search run side by side on the second;
+# kept apart from RETRIEVAL_EXECUTOR, whose threads block waiting on the legs
+RETRIEVAL_EXECUTOR: Optional[ThreadPoolExecutor] = None
+SEARCH_LEG_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _timeout_env(name: str, default: str) -> Optional[float]:
+    # Milliseconds in the environment, seconds for the retriever ("" = no limit)
+    value = os.getenv(name, default)
+    return float(value) / 1000.0 if value else None
+
 
-from src.ft.openai_llm import OpenAIDomainLLM
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    global RETRIEVAL_EXECUTOR, SEARCH_LEG_EXECUTOR, _llm
+    RETRIEVAL_EXECUTOR = ThreadPoolExecutor(
+        max_workers=RETRIEVAL_THREADS,
+        thread_name_prefix="retrieval",
+    )
+    SEARCH_LEG_EXECUTOR = ThreadPoolExecutor(
+        max_workers=2 * RETRIEVAL_THREADS,
+        thread_name_prefix="search-leg",
+    )
+    retriever.executor = SEARCH_LEG_EXECUTOR
+    try:
+        yield
+    finally:
+        # The LLM wraps the shared client closed here; the next startup rebuilds it
+        _llm = None
+        await close_async_client()
+        retriever.executor = None
+        RETRIEVAL_EXECUTOR.shutdown(wait=False)
+        SEARCH_LEG_EXECUTOR.shutdown(wait=False)
+        RETRIEVAL_EXECUTOR = SEARCH_LEG_EXECUTOR = None
+        if retriever.dense is not None:
+            retriever.dense.close()
 
 
-app = FastAPI(title="Evidence-Based Fitness Agent")
+app = FastAPI(title="Evidence-Based Fitness Agent", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,19 +110,98 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+STUDIES_DIR = DATA_DIR / "studies"
+CORPUS_PACK = DATA_DIR / "index" / "corpus.pack"
+TFIDF_INDEX_DIR = DATA_DIR / "index" / "tfidf"
+EMBEDDING_CACHE_DIR = DATA_DIR / "index" / "embeddings"
+# float32 | float16 | int8 | binary (quantised modes rescore against the mmap cache)
+DENSE_STORAGE = os.getenv("DENSE_STORAGE", "float32")
+# Approximate dense search: "" (exact) | ivf | hnsw, saved to / reloaded from ANN_PATH
+DENSE_ANN = os.getenv("DENSE_ANN", "")
+ANN_PATH = Path(os.getenv("ANN_PATH", str(DATA_DIR / "index" / f"ann_{DENSE_ANN}.npz")))
+# SQLite corpus (compile_corpus --sqlite), opened read-only; when set and fresh
+# it is the store and its FTS5 table serves the sparse leg. Passages, filters and
+# study features are still loaded from it at startup: restart after updating it
+CORPUS_DB = os.getenv("CORPUS_DB", "")
+
 # Load models on startup
-store = StudyStore.from_dir(
-    Path(__file__).resolve().parent.parent.parent / "data" / "studies"
-)
+CORPUS_HASH = corpus_hash(STUDIES_DIR)
+corpus_db: Optional[SqliteStudyStore] = None
+if CORPUS_DB:
+    try:
+        corpus_db = SqliteStudyStore(Path(CORPUS_DB), read_only=True)
+    except FileNotFoundError as e:
+        print(f"{e}, CORPUS_DB not used")
+if corpus_db is not None and corpus_db.corpus_hash != CORPUS_HASH:
+    print(f"{CORPUS_DB} is for another corpus version, not used")
+    corpus_db = None
+
+store: StudyStore | SqliteStudyStore
+if corpus_db is not None:
+    store = corpus_db
+else:
+    # Compiled corpus pack is memory-mapped when fresh; otherwise the study
+    # JSON is parsed and the pack rewritten for the next start
+    store = load_or_build_store(CORPUS_PACK, STUDIES_DIR, CORPUS_HASH)
 studies = store.studies
-passages: List[Passage] = store.get_all_passages()
-
-retriever = HybridRetriever(tfidf_weight=0.4, dense_weight=0.6)
-retriever.add_passages(passages)
+passages: Sequence[Passage] = store.get_all_passages()
+
+# Prebuilt TF-IDF index is memory-mapped when fresh, rebuilt otherwise
+retriever = HybridRetriever(
+    tfidf_weight=0.4,
+    dense_weight=0.6,
+    sparse=(
+        Fts5Index(corpus_db)
+        if corpus_db is not None
+        else load_or_build_tfidf(TFIDF_INDEX_DIR, passages, CORPUS_HASH)
+    ),
+    embedding_cache_dir=EMBEDDING_CACHE_DIR,
+    dense_storage=DENSE_STORAGE,
+    dense_ann=make_ann_index(DENSE_ANN) if DENSE_ANN else None,
+    dense_ann_path=ANN_PATH if DENSE_ANN else None,
+    # Concurrent requests' query encodes share one model call
+    query_batch_size=int(os.getenv("QUERY_BATCH_SIZE", "16")),
+    query_batch_wait_ms=float(os.getenv("QUERY_BATCH_WAIT_MS", "2")),
+    # A slow dense leg is dropped (sparse-only, flagged) rather than blowing the
+    # SLO; the lifespan attaches SEARCH_LEG_EXECUTOR so the legs run in parallel
+    sparse_timeout=_timeout_env("SPARSE_TIMEOUT_MS", ""),
+    dense_timeout=_timeout_env("DENSE_TIMEOUT_MS", "300"),
+)
+retriever.add_passages(passages, studies=studies)
 
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-001")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
 
+# Exact-match answer cache; the SQLite tier is shared by all workers
+# (ANSWER_CACHE_DB="" keeps it in-process only)
+ANSWER_CACHE_DB = os.getenv(
+    "ANSWER_CACHE_DB", str(DATA_DIR / "index" / "answer_cache.sqlite")
+)
+answer_cache = AnswerCache(
+    namespace=CORPUS_HASH,
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600))),
+    store=SqliteAnswerStore(Path(ANSWER_CACHE_DB)) if ANSWER_CACHE_DB else None,
+)
+
+# Paraphrased questions reuse answers via the dense model's query embeddings
+# (needs sentence-transformers; SEMANTIC_CACHE_SIZE=0 turns it off)
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+semantic_cache: Optional[SemanticAnswerCache] = (
+    SemanticAnswerCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+        max_entries=SEMANTIC_CACHE_SIZE,
+    )
+    if retriever.dense is not None
+    and retriever.dense.enabled
+    and SEMANTIC_CACHE_SIZE > 0
+    else None
+)
+
+# Identical /ask requests in flight at the same time share one answer
+ask_flights: SingleFlight[AskResponse] = SingleFlight()
+
 
 class AskRequest(BaseModel):
     mode: Literal["beginner", "intermediate"] = "beginner"
@@ -54,6 +209,10 @@ class AskRequest(BaseModel):
     use_llm: bool = True
     top_k_passages: int = 10
     max_studies: int = 3
+    # Words of study excerpts sent to the LLM (None = full passages)
+    context_token_budget: Optional[int] = DEFAULT_CONTEXT_TOKEN_BUDGET
+    # Restrict retrieval to matching studies / passages (year, tags, ...)
+    filters: Optional[SearchFilters] = None
 
 
 class CitationRef(BaseModel):
@@ -75,6 +234,8 @@ class AskResponse(BaseModel):
     citations: List[CitationRef]
     studies: List[Dict[str, Any]]
     confidence: ConfidenceOut
+    # A retrieval leg timed out, the answer is from partial results
+    retrieval_degraded: bool = False
 
 
 def build_study_dict(study) -> Dict[str, Any]:
@@ -101,6 +262,8 @@ def extract_study_year(study) -> Optional[int]:
     return None
 
 
+# Study columns the baseline answerer scores on, built once
+STUDY_FEATURES = StudyFeatures(studies)
 STUDY_YEAR_BY_ID: dict[int, int] = {}
 for s in studies:
     y = extract_study_year(s)
@@ -117,8 +280,10 @@ def filter_and_renumber_citations(
     """
     Keep only citations that actually appear in the answer text,
     including grouped ones like [1, 3], and renumber them sequentially.
+    Groups with no valid index are removed even when no citation survives,
+    so the text matches what CitationStream sends for /ask/stream.
     """
-    if not citations or not answer_text:
+    if not answer_text:
         return answer_text, citations
 
     valid_indexes = {c.index for c in citations}
@@ -135,9 +300,6 @@ def filter_and_renumber_citations(
             if idx in valid_indexes and idx not in used_order:
                 used_order.append(idx)
 
-    if not used_order:
-        return answer_text, []
-
     index_map: dict[int, int] = {
         old: new for new, old in enumerate(used_order, start=1)
     }
@@ -226,83 +388,120 @@ def compute_confidence(retrieval_results: List[tuple[Any, float]]) -> Tuple[int,
     return value, label
 
 
-@app.post("/ask", response_model=AskResponse)
-def ask(req: AskRequest):
-    mode: Mode = req.mode
+def citation_refs(pairs: List[Tuple[int, int]]) -> List[CitationRef]:
+    """
+    CitationRef per (citation index, study id), with the study title attached
+    """
+    refs: List[CitationRef] = []
+    for idx, sid in pairs:
+        s = store.get_study_by_id(sid)
+        refs.append(
+            CitationRef(
+                index=int(idx),
+                study_id=int(sid),
+                title=getattr(s, "title", None) if s else None,
+            )
+        )
+    return refs
 
-    raw_results = retriever.search(req.query, top_k=req.top_k_passages)
-    retrieval_results = rerank_by_recency(raw_results, STUDY_YEAR_BY_ID)
-    conf_value, conf_label = compute_confidence(retrieval_results)
 
-    if not req.use_llm:
-        result = answer_query(
-            mode=mode,
-            query=req.query,
-            retriever=retriever,
-            studies=studies,
-            top_k_passages=req.top_k_passages,
-            max_studies=req.max_studies,
-        )
+def retrieve(req: AskRequest) -> RetrievalContext:
+    """
+    The request's single retrieval pass: raw results, recency-ranked results
+    and the retrieval confidence
+    """
+    rc = RetrievalContext.search(
+        retriever, req.query, top_k=req.top_k_passages, filters=req.filters
+    )
+    rc.ranked = rerank_by_recency(rc.results, STUDY_YEAR_BY_ID)
+    rc.confidence = compute_confidence(rc.ranked)
+    return rc
 
-        citation_objs: List[CitationRef] = []
-        for ref in result.references:
-            if isinstance(ref, dict):
-                sid = ref.get("study_id")
-                idx = ref.get("index")
-            else:
-                sid = ref.study_id
-                idx = ref.index
-            if sid is None or idx is None:
-                continue
-            s = next((s for s in studies if s.id == sid), None)
-            citation_objs.append(
-                CitationRef(
-                    index=int(idx),
-                    study_id=int(sid),
-                    title=getattr(s, "title", None) if s else None,
-                )
-            )
 
-        filtered_answer, renumbered_citations = filter_and_renumber_citations(
-            result.answer_text,
-            citation_objs,
-        )
+def confidence_out(rc: RetrievalContext) -> ConfidenceOut:
+    value, label = rc.confidence
+    return ConfidenceOut(value=value, label=label)
 
-        referenced_ids = {c.study_id for c in renumbered_citations}
 
-        return AskResponse(
-            answer=filtered_answer,
-            mode=req.mode,
-            query=req.query,
-            backend="baseline",
-            citations=renumbered_citations,
-            studies=[
-                build_study_dict(s) for s in studies if s and s.id in referenced_ids
-            ],
-            confidence=ConfidenceOut(value=conf_value, label=conf_label),
-        )
+def baseline_response(req: AskRequest, rc: RetrievalContext) -> AskResponse:
+    result = answer_query(
+        mode=req.mode,
+        query=req.query,
+        retriever=retriever,
+        studies=studies,
+        top_k_passages=req.top_k_passages,
+        max_studies=req.max_studies,
+        results=rc.results,
+        study_features=STUDY_FEATURES,
+    )
+
+    pairs: List[Tuple[int, int]] = []
+    for ref in result.references:
+        if isinstance(ref, dict):
+            sid = ref.get("study_id")
+            idx = ref.get("index")
+        else:
+            sid = ref.study_id
+            idx = ref.index
+        if sid is None or idx is None:
+            continue
+        pairs.append((idx, sid))
+
+    filtered_answer, renumbered_citations = filter_and_renumber_citations(
+        result.answer_text,
+        citation_refs(pairs),
+    )
+
+    referenced_ids = {c.study_id for c in renumbered_citations}
+
+    return AskResponse(
+        answer=filtered_answer,
+        mode=req.mode,
+        query=req.query,
+        backend="baseline",
+        citations=renumbered_citations,
+        studies=[build_study_dict(s) for s in store.get_studies_by_ids(referenced_ids)],
+        confidence=confidence_out(rc),
+        retrieval_degraded=rc.degraded,
+    )
 
+
+def build_llm_context(req: AskRequest, rc: RetrievalContext) -> List[Dict[str, Any]]:
+    # One context entry per study (first max_studies studies in ranked order),
+    # holding all of that study's retrieved passages
     ctx = []
-    seen_studies = set()
+    study_texts: Dict[int, List[str]] = {}
 
-    for p, _score in retrieval_results:
-        if p.study_id in seen_studies:
-            continue
-        seen_studies.add(p.study_id)
-
-        ctx.append(
-            {
-                "study_id": p.study_id,
-                "citation_index": len(ctx) + 1,
-                "section": p.section,
-                "text": p.text,
-            }
+    for p, _score in rc.ranked:
+        if p.study_id not in study_texts:
+            if len(ctx) >= req.max_studies:
+                continue
+            study_texts[p.study_id] = []
+            ctx.append(
+                {
+                    "study_id": p.study_id,
+                    "citation_index": len(ctx) + 1,
+                    "section": p.section,
+                }
+            )
+        study_texts[p.study_id].append(p.text)
+
+    for c in ctx:
+        c["text"] = "\n\n".join(study_texts[c["study_id"]])
+
+    # Only the query-relevant sentences go into the prompt
+    if req.context_token_budget is not None:
+        ctx = compress_context(
+            req.query,
+            ctx,
+            token_budget=req.context_token_budget,
+            sparse=retriever.tfidf,
         )
+    return ctx
 
-        if len(ctx) >= req.max_studies:
-            break
 
-    if req.mode == "beginner":
+def build_instruction(mode: Mode) -> str:
+    if mode == "beginner":
         style_line = (
             "Assume the user is a beginner with little resistance-training experience. "
             "Use simple, friendly language, avoid jargon, and keep the answer concise "
@@ -322,52 +521,133 @@ def ask(req: AskRequest):
         "Explain clearly and include inline numeric citations like [1], [2] "
         "that correspond to the studies in the context. "
     )
-    instruction = base_instruction + style_line
+    return base_instruction + style_line
+
 
-    llm = OpenAIDomainLLM(
-        model=OPENAI_MODEL,
-        max_new_tokens=256,
+def llm_http_error(e: Exception) -> HTTPException:
+    msg = str(e)
+    print("LLM backend error:", repr(e), flush=True)
+
+    if "quota" in msg.lower() or "ResourceExhausted" in msg:
+        return HTTPException(
+            status_code=503,
+            detail=(
+                "LLM backend is out of quota / rate-limited. "
+                "Try again later or use baseline."
+            ),
+        )
+    return HTTPException(
+        status_code=502,
+        detail=f"LLM backend error: {msg}",
     )
 
+
+def get_llm() -> AsyncOpenAIDomainLLM:
+    # Built on first LLM request (needs OPENAI_API_KEY), then shared
+    global _llm
+    if _llm is None:
+        _llm = AsyncOpenAIDomainLLM(model=OPENAI_MODEL, max_new_tokens=256)
+    return _llm
+
+
+_llm: Optional[AsyncOpenAIDomainLLM] = None
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Run CPU-bound work (retrieval, answer assembly) off the event loop
+
+    Outside the lifespan (no RETRIEVAL_EXECUTOR) the loop's default pool is used
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(RETRIEVAL_EXECUTOR, fn, *args)
+
+
+def answer_key(req: AskRequest, query: Optional[str] = None) -> str:
+    return answer_cache_key(
+        query=req.query if query is None else query,
+        mode=req.mode,
+        use_llm=req.use_llm,
+        top_k_passages=req.top_k_passages,
+        max_studies=req.max_studies,
+        model=OPENAI_MODEL if req.use_llm else "baseline",
+        corpus_hash=CORPUS_HASH,
+        context_token_budget=req.context_token_budget if req.use_llm else None,
+        filters=(
+            req.filters.key()
+            if req.filters is not None and not req.filters.is_empty()
+            else None
+        ),
+    )
+
+
+def cached_response(
+    req: AskRequest, key: str
+) -> Tuple[Optional[AskResponse], Optional[np.ndarray]]:
+    """
+    Cached answer for the request (exact, then semantic) and the query
+    embedding used for the semantic lookup, if one was computed
+    """
+    cached = answer_cache.get(key)
+    q_emb = None
+    if cached is None and semantic_cache is not None:
+        q_emb = retriever.dense.encode_query(req.query)
+        # Group = every key field but the query
+        cached = semantic_cache.get(q_emb, answer_key(req, query=""))
+        if cached is not None:
+            answer_cache.put(key, cached)
+    if cached is None:
+        return None, q_emb
+    # Same (or equivalent) question, echo this request's spelling of it
+    return AskResponse(**cached).model_copy(update={"query": req.query}), q_emb
+
+
+def remember_response(
+    req: AskRequest, key: str, resp: AskResponse, q_emb: Optional[np.ndarray]
+) -> None:
+    if resp.retrieval_degraded:
+        return  # next request gets a full retrieval
+    value = resp.model_dump()
+    answer_cache.put(key, value)
+    if semantic_cache is not None and q_emb is not None:
+        semantic_cache.put(q_emb, answer_key(req, query=""), value)
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(req: AskRequest):
+    key = answer_key(req)
+    resp = await ask_flights.do(key, lambda: cached_or_answer(req, key))
+    return resp.model_copy(update={"query": req.query})
+
+
+async def cached_or_answer(req: AskRequest, key: str) -> AskResponse:
+    resp, q_emb = await run_blocking(cached_response, req, key)
+    if resp is None:
+        resp = await answer(req)
+        await run_blocking(remember_response, req, key, resp, q_emb)
+    return resp
+
+
+async def answer(req: AskRequest) -> AskResponse:
+    rc = await run_blocking(retrieve, req)
+
+    if not req.use_llm:
+        return await run_blocking(baseline_response, req, rc)
+
+    ctx = await run_blocking(build_llm_context, req, rc)
+
     try:
-        answer_text = llm.generate_answer(
-            instruction=instruction,
+        answer_text = await get_llm().generate_answer(
+            instruction=build_instruction(req.mode),
             query=req.query,
             context_passages=ctx,
         )
     except Exception as e:
-        msg = str(e)
-        print("LLM backend error:", repr(e), flush=True)
-
-        if "quota" in msg.lower() or "ResourceExhausted" in msg:
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    "LLM backend is out of quota / rate-limited. "
-                    "Try again later or use baseline."
-                ),
-            )
-        raise HTTPException(
-            status_code=502,
-            detail=f"LLM backend error: {msg}",
-        )
-
-    citation_objs: List[CitationRef] = []
-    for c in ctx:
-        sid = c["study_id"]
-        idx = c["citation_index"]
-        s = next((s for s in studies if s.id == sid), None)
-        citation_objs.append(
-            CitationRef(
-                index=int(idx),
-                study_id=int(sid),
-                title=getattr(s, "title", None) if s else None,
-            )
-        )
+        raise llm_http_error(e)
 
     filtered_answer, renumbered_citations = filter_and_renumber_citations(
         answer_text,
-        citation_objs,
+        citation_refs([(c["citation_index"], c["study_id"]) for c in ctx]),
     )
 
     referenced_ids = {c.study_id for c in renumbered_citations}
@@ -378,11 +658,119 @@ def ask(req: AskRequest):
         query=req.query,
         backend="llm",
         citations=renumbered_citations,
-        studies=[build_study_dict(s) for s in studies if s and s.id in referenced_ids],
-        confidence=ConfidenceOut(value=conf_value, label=conf_label),
+        studies=[build_study_dict(s) for s in store.get_studies_by_ids(referenced_ids)],
+        confidence=confidence_out(rc),
+        retrieval_degraded=rc.degraded,
+    )
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """
+    /ask as Server-Sent Events
+
+    - "token" events carry {"delta": text} as the answer is generated
+      (citations already renumbered)
+    - a final "done" event carries the full AskResponse
+    - "error" carries {"status", "detail"} if the LLM call fails mid-stream
+    """
+    key = answer_key(req)
+    hit, q_emb = await run_blocking(cached_response, req, key)
+    if hit is not None:
+
+        async def replay():
+            yield sse_event("token", {"delta": hit.answer})
+            yield sse_event("done", hit.model_dump())
+
+        return StreamingResponse(
+            replay(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    rc = await run_blocking(retrieve, req)
+
+    async def events():
+        if not req.use_llm:
+            resp = await run_blocking(baseline_response, req, rc)
+            await run_blocking(remember_response, req, key, resp, q_emb)
+            yield sse_event("token", {"delta": resp.answer})
+            yield sse_event("done", resp.model_dump())
+            return
+
+        ctx = await run_blocking(build_llm_context, req, rc)
+        study_by_index = {c["citation_index"]: c["study_id"] for c in ctx}
+        citations = CitationStream(study_by_index.keys())
+        answer_parts: List[str] = []
+
+        try:
+            async for delta in get_llm().stream_answer(
+                instruction=build_instruction(req.mode),
+                query=req.query,
+                context_passages=ctx,
+            ):
+                text = citations.feed(delta)
+                if text:
+                    answer_parts.append(text)
+                    yield sse_event("token", {"delta": text})
+        except Exception as e:
+            err = llm_http_error(e)
+            yield sse_event("error", {"status": err.status_code, "detail": err.detail})
+            return
+
+        tail = citations.finish()
+        if tail:
+            answer_parts.append(tail)
+            yield sse_event("token", {"delta": tail})
+
+        renumbered_citations = citation_refs(
+            sorted(
+                (new, study_by_index[old]) for old, new in citations.index_map.items()
+            )
+        )
+        referenced_ids = {c.study_id for c in renumbered_citations}
+
+        resp = AskResponse(
+            answer="".join(answer_parts),
+            mode=req.mode,
+            query=req.query,
+            backend="llm",
+            citations=renumbered_citations,
+            studies=[
+                build_study_dict(s) for s in store.get_studies_by_ids(referenced_ids)
+            ],
+            confidence=confidence_out(rc),
+            retrieval_degraded=rc.degraded,
+        )
+        await run_blocking(remember_response, req, key, resp, q_emb)
+        yield sse_event("done", resp.model_dump())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @app.get("/health")
 def health():
     return {"ok": True}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "answers": answer_cache.stats(),
+        "semantic": semantic_cache.stats() if semantic_cache is not None else None,
+        "in_flight": ask_flights.stats(),
+        "query_batches": (
+            retriever.dense.batcher.stats()
+            if retriever.dense is not None and retriever.dense.batcher is not None
+            else None
+        ),
+        "query_embeddings": (
+            retriever.dense.query_cache.stats()
+            if retriever.dense is not None and retriever.dense.query_cache is not None
+            else None
+        ),
+    }
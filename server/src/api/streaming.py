@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, Iterable, List
+
+# A complete citation group, same grammar as CITATION_GROUP_PATTERN in main.py
+_GROUP = re.compile(r"\[([0-9]+(?:\s*,\s*[0-9]+)*)\]")
+# Anything that can still grow into a complete group
+_GROUP_PREFIX = re.compile(r"\[(?:[0-9]+(?:\s*,\s*[0-9]+)*(?:\s*(?:,\s*)?)?)?")
+
+
+class CitationStream:
+    """
+    Incremental version of filter_and_renumber_citations for streamed answers
+
+    Text is fed as it arrives; a "[" starts buffering until the group is
+    complete (e.g. "[1, 3]") or can no longer be one, so a group split across
+    deltas is never forwarded half-rewritten.
+    Valid citation indexes get new sequential numbers on first appearance,
+    unknown ones are dropped (and a group with none left is removed), and
+    whitespace is cleaned the same way as the non-streaming path
+    """
+
+    def __init__(self, valid_indexes: Iterable[int]) -> None:
+        self.valid_indexes = set(valid_indexes)
+        self.index_map: Dict[int, int] = {}  # old index -> new index
+
+        self._group: str | None = None  # buffered, possibly partial, group
+        self._pending_ws = ""  # whitespace held until we see what follows
+        self._started = False  # leading whitespace is dropped
+
+    def _emit_char(self, ch: str, out: List[str]) -> None:
+        if ch.isspace():
+            if self._started:
+                self._pending_ws += ch
+            return
+
+        if self._pending_ws:
+            # No space before "." / ","; runs of whitespace collapse to one space
+            if ch not in ".,":
+                out.append(" " if len(self._pending_ws) > 1 else self._pending_ws)
+            self._pending_ws = ""
+        out.append(ch)
+        self._started = True
+
+    def _render_group(self, group: str) -> str:
+        kept: List[int] = []
+        for part in group[1:-1].split(","):
+            old = int(part.strip())
+            if old not in self.valid_indexes:
+                continue
+            if old not in self.index_map:
+                self.index_map[old] = len(self.index_map) + 1
+            new = self.index_map[old]
+            if new not in kept:
+                kept.append(new)
+        if not kept:
+            return ""
+        return "[" + ", ".join(str(x) for x in kept) + "]"
+
+    def feed(self, delta: str) -> str:
+        """
+        Consume the next piece of model output, return the text safe to forward
+        """
+        out: List[str] = []
+        for ch in delta:
+            if self._group is None:
+                if ch == "[":
+                    self._group = ch
+                else:
+                    self._emit_char(ch, out)
+                continue
+
+            self._group += ch
+            if _GROUP.fullmatch(self._group):
+                rendered, self._group = self._render_group(self._group), None
+                for c in rendered:
+                    self._emit_char(c, out)
+            elif not _GROUP_PREFIX.fullmatch(self._group):
+                # Not a citation after all: "[" is plain text, rescan the rest
+                literal, self._group = self._group, None
+                self._emit_char("[", out)
+                out.append(self.feed(literal[1:]))
+        return "".join(out)
+
+    def finish(self) -> str:
+        """
+        End of stream: flush an unfinished group as plain text
+        Trailing whitespace is dropped
+        """
+        out: List[str] = []
+        while self._group is not None:
+            literal, self._group = self._group, None
+            self._emit_char("[", out)
+            out.append(self.feed(literal[1:]))
+        self._pending_ws = ""
+        return "".join(out)
+
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    One Server-Sent Events frame with a JSON payload
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from .models import Passage
+
+try:
+    from transformers import AutoTokenizer  # type: ignore
+except Exception:
+    AutoTokenizer = None
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Sentence end: . ! ? (optionally closed by a quote / bracket) then whitespace
+# and something that looks like the start of the next sentence
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])([\"'”’)\]]*)\s+(?=[A-Z0-9(\[\"“‘])")
+_WORD = re.compile(r"\S+")
+# What BERT's basic tokenizer splits a word into before word-piecing it
+_BASIC_PIECE = re.compile(r"[A-Za-z]+|[0-9]+|[^\sA-Za-z0-9]")
+
+# Tokenizer of the dense encoder (dense_retriever.DEFAULT_MODEL_NAME), which
+# reads at most 256 word pieces including [CLS] / [SEP]
+ENCODER_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+@dataclass(frozen=True)
+class ChunkConfig:
+    """
+    Sliding-window chunking settings
+
+    Sizes are in whitespace-delimited words, and every chunk is also kept to
+    max_pieces encoder word pieces (0 = unchecked) so the dense encoder never
+    truncates it: numeric-heavy text ("1.2 ± 0.3 kg", "p<0.05") and reference
+    lists run far past 256 pieces at 160 words
+    """
+
+    max_words: int = 160
+    overlap_words: int = 32
+    # A window at least this full is cut at a paragraph end rather than mid-paragraph
+    min_paragraph_words: int = 80
+    max_pieces: int = 254
+
+    def __post_init__(self) -> None:
+        if self.max_words <= 0:
+            raise ValueError("max_words must be positive")
+        if not 0 <= self.overlap_words < self.max_words:
+            raise ValueError("overlap_words must be in [0, max_words)")
+        if self.max_pieces < 0:
+            raise ValueError("max_pieces must be >= 0")
+
+    def key(self) -> str:
+        """
+        Short description mixed into index hashes, so changing it invalidates them
+        """
+        pieces = (
+            f",pieces={self.max_pieces}/{word_piece_counter()[0]}"
+            if self.max_pieces
+            else ""
+        )
+        return (
+            f"chunk:max={self.max_words},overlap={self.overlap_words},"
+            f"para={self.min_paragraph_words}{pieces}"
+        )
+
+
+DEFAULT_CHUNK_CONFIG = ChunkConfig()
+
+
+@lru_cache(maxsize=None)
+def estimate_word_pieces(word: str) -> int:
+    """
+    Word pieces of one whitespace-delimited word, estimated without the
+    tokenizer: punctuation is a piece each, digit runs about 2 digits a piece,
+    long words split into several pieces. Errs on the high side
+    """
+    n = 0
+    for m in _BASIC_PIECE.finditer(word):
+        run = m.group()
+        if run.isdigit():
+            n += (len(run) + 1) // 2
+        elif run.isascii() and run.isalpha():
+            n += 1 + max(0, len(run) - 6) // 4
+        else:
+            n += 1
+    return n
+
+
+@lru_cache(maxsize=1)
+def word_piece_counter() -> Tuple[str, Callable[[str], int]]:
+    """
+    ("wordpiece" | "estimate", word -> number of encoder word pieces)
+
+    The encoder's own tokenizer when transformers is installed (it comes with
+    sentence-transformers), estimate_word_pieces otherwise
+    """
+    if AutoTokenizer is not None:
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(ENCODER_TOKENIZER)
+        except Exception as e:
+            print(f"Encoder tokenizer unavailable ({e}), estimating word pieces")
+        else:
+            count = lru_cache(maxsize=None)(lambda w: len(tokenizer.tokenize(w)))
+            return "wordpiece", count
+    return "estimate", estimate_word_pieces
+
+
+@dataclass
+class _Unit:
+    start: int
+    end: int
+    n_words: int
+    n_pieces: int
+    paragraph_end: bool
+
+
+def _split_word(
+    text: str, start: int, end: int, max_pieces: int, count: Callable[[str], int]
+) -> List[Tuple[int, int, int]]:
+    # A single "word" over the piece limit (dot leaders, long URLs): halve it
+    n = count(text[start:end])
+    if n <= max_pieces or end - start <= 1:
+        return [(start, end, n)]
+    mid = (start + end) // 2
+    return _split_word(text, start, mid, max_pieces, count) + _split_word(
+        text, mid, end, max_pieces, count
+    )
+
+
+def _sentence_units(
+    text: str,
+    max_words: int,
+    max_pieces: int = 0,
+    count: Optional[Callable[[str], int]] = None,
+) -> List[_Unit]:
+    """
+    Split text into sentences (char spans); sentences longer than max_words
+    words or max_pieces word pieces are cut into pieces that fit
+    """
+    units: List[_Unit] = []
+    if max_pieces and count is None:
+        count = word_piece_counter()[1]
+
+    paragraph_starts = [0] + [m.end() for m in _PARAGRAPH_BREAK.finditer(text)]
+    paragraph_ends = [m.start() for m in _PARAGRAPH_BREAK.finditer(text)] + [len(text)]
+
+    for p_start, p_end in zip(paragraph_starts, paragraph_ends):
+        sentence_starts = [p_start] + [
+            m.end() for m in _SENTENCE_BREAK.finditer(text, p_start, p_end)
+        ]
+        # Closing quotes / brackets stay with the sentence they close
+        sentence_ends = [
+            m.end(1) for m in _SENTENCE_BREAK.finditer(text, p_start, p_end)
+        ] + [p_end]
+
+        paragraph_units: List[_Unit] = []
+        for s_start, s_end in zip(sentence_starts, sentence_ends):
+            if not max_pieces:
+                words = list(_WORD.finditer(text, s_start, s_end))
+                for i in range(0, len(words), max_words):
+                    piece = words[i : i + max_words]
+                    paragraph_units.append(
+                        _Unit(piece[0].start(), piece[-1].end(), len(piece), 0, False)
+                    )
+                continue
+
+            # Most sentences fit whole: one unit, no per-word spans needed
+            sentence = text[s_start:s_end]
+            words = sentence.split()
+            n_pieces = sum(map(count, words))
+            if words and len(words) <= max_words and n_pieces <= max_pieces:
+                lead = len(sentence) - len(sentence.lstrip())
+                trail = len(sentence) - len(sentence.rstrip())
+                paragraph_units.append(
+                    _Unit(s_start + lead, s_end - trail, len(words), n_pieces, False)
+                )
+                continue
+
+            # Greedy packing of words under both limits
+            current: Optional[_Unit] = None
+            for m in _WORD.finditer(text, s_start, s_end):
+                for w_start, w_end, n in _split_word(
+                    text, m.start(), m.end(), max_pieces, count
+                ):
+                    if (
+                        current is None
+                        or current.n_words + 1 > max_words
+                        or current.n_pieces + n > max_pieces
+                    ):
+                        current = _Unit(w_start, w_end, 0, 0, False)
+                        paragraph_units.append(current)
+                    current.end = w_end
+                    current.n_words += 1
+                    current.n_pieces += n
+
+        if paragraph_units:
+            paragraph_units[-1].paragraph_end = True
+            units.extend(paragraph_units)
+
+    return units
+
+
+def sentence_spans(text: str, max_words: int = 10_000) -> List[Tuple[int, int]]:
+    """
+    (char_start, char_end) of each sentence of text
+    """
+    return [(u.start, u.end) for u in _sentence_units(text, max_words)]
+
+
+def chunk_spans(
+    text: str,
+    config: ChunkConfig = DEFAULT_CHUNK_CONFIG,
+    count_pieces: Optional[Callable[[str], int]] = None,
+) -> List[Tuple[int, int]]:
+    """
+    (char_start, char_end) of each chunk of text, in order
+
+    Chunks are whole sentences, at most config.max_words words and
+    config.max_pieces word pieces (count_pieces, default word_piece_counter)
+    each, and consecutive chunks share about config.overlap_words words of
+    trailing sentences. A chunk that is already min_paragraph_words long stops
+    at the last paragraph end it contains, and the next chunk starts fresh there
+    """
+    units = _sentence_units(text, config.max_words, config.max_pieces, count_pieces)
+    spans: List[Tuple[int, int]] = []
+
+    first = 0
+    while first < len(units):
+        # Grow the window while it fits
+        last = first
+        n_words = units[first].n_words
+        n_pieces = units[first].n_pieces
+        while (
+            last + 1 < len(units)
+            and n_words + units[last + 1].n_words <= config.max_words
+            and (
+                not config.max_pieces
+                or n_pieces + units[last + 1].n_pieces <= config.max_pieces
+            )
+        ):
+            last += 1
+            n_words += units[last].n_words
+            n_pieces += units[last].n_pieces
+
+        # Prefer cutting at a paragraph end once the chunk is big enough
+        cut_at_paragraph = False
+        if last + 1 < len(units):
+            filled = 0
+            best = -1
+            for i in range(first, last + 1):
+                filled += units[i].n_words
+                if units[i].paragraph_end and filled >= config.min_paragraph_words:
+                    best = i
+            if best >= 0:
+                last, cut_at_paragraph = best, True
+
+        spans.append((units[first].start, units[last].end))
+        if last + 1 >= len(units):
+            break
+
+        if cut_at_paragraph:
+            first = last + 1
+            continue
+
+        # Step back over trailing sentences for the overlap, always moving forward
+        next_first = last + 1
+        overlap = 0
+        while (
+            next_first - 1 > first
+            and overlap + units[next_first - 1].n_words <= config.overlap_words
+        ):
+            next_first -= 1
+            overlap += units[next_first].n_words
+        first = next_first
+
+    return spans
+
+
+def chunk_passages(
+    passages: List[Passage], config: ChunkConfig = DEFAULT_CHUNK_CONFIG
+) -> List[Passage]:
+    """
+    Split every passage into chunk passages, numbered 1.. in order
+
+    Each chunk keeps its study and section, records its char offsets into the
+    original section text and gets a chunk_id "<study_id>:<section>:<n>"
+
+    chunk_id is positional, not derived from the chunk's content: it is the
+    same across loads of an unchanged corpus, but an edit early in a section
+    can shift every later chunk of it to a different <n> (and text)
+    """
+    chunks: List[Passage] = []
+    for p in passages:
+        for n, (start, end) in enumerate(chunk_spans(p.text, config)):
+            chunks.append(
+                Passage(
+                    id=len(chunks) + 1,
+                    study_id=p.study_id,
+                    section=p.section,
+                    text=p.text[start:end],
+                    chunk_id=f"{p.study_id}:{p.section}:{n}",
+                    chunk_index=n,
+                    char_start=start,
+                    char_end=end,
+                )
+            )
+    return chunks
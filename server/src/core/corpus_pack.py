@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    overload,
+)
+
+import numpy as np
+
+from .models import Passage, Study
+
+# Bump when the layout changes; older packs are refused, not migrated
+PACK_FORMAT_VERSION = 1
+PACK_MAGIC = b"INFPACK\0"
+_ALIGN = 64  # every array starts on a 64-byte boundary
+
+# Optional int fields of a Passage are stored with this sentinel for None
+_NO_INT = -1
+
+
+class StalePackError(ValueError):
+    """
+    Corpus pack is unreadable, of another format version or built from another corpus
+    """
+
+
+class _ArenaWriter:
+    """
+    Appends UTF-8 strings to one byte arena, returning (start, end) offsets
+    """
+
+    def __init__(self) -> None:
+        self.parts: List[bytes] = []
+        self.size = 0
+
+    def add(self, text: str) -> Tuple[int, int]:
+        data = text.encode("utf-8")
+        start = self.size
+        self.parts.append(data)
+        self.size += len(data)
+        return start, self.size
+
+    def column(self, values: Sequence[Optional[str]]) -> Dict[str, np.ndarray]:
+        """
+        Offsets (n, 2) of each value, plus a null mask if any value is None
+        """
+        spans = np.array([self.add(v or "") for v in values], dtype=np.int64).reshape(
+            -1, 2
+        )
+        out = {"spans": spans}
+        if any(v is None for v in values):
+            out["null"] = np.array([v is None for v in values], dtype=bool)
+        return out
+
+
+def _optional_ints(values: Sequence[Optional[int]]) -> np.ndarray:
+    return np.array([_NO_INT if v is None else v for v in values], dtype=np.int64)
+
+
+def write_corpus_pack(
+    path: Path,
+    studies: Sequence[Study],
+    passages: Sequence[Passage],
+    corpus_hash: str,
+) -> None:
+    """
+    Compile studies + passages into a single binary pack
+
+    Layout: magic, header length (uint64 LE), JSON header, then 64-byte aligned
+    arrays listed in the header. All strings (passage text, sections, chunk
+    ids, study metadata) live in one UTF-8 arena addressed by (start, end)
+    offset columns; numeric fields are plain columns. Nested study fields
+    (tags, population, outcomes) are stored as JSON strings
+
+    Written to a temp file and renamed into place, so readers never see a
+    half-written pack
+    """
+    arena = _ArenaWriter()
+    arrays: Dict[str, np.ndarray] = {}
+
+    def add_strings(name: str, values: Sequence[Optional[str]]) -> None:
+        for suffix, arr in arena.column(values).items():
+            arrays[f"{name}.{suffix}"] = arr
+
+    arrays["study.id"] = np.array([s.id for s in studies], dtype=np.int64)
+    arrays["study.year"] = np.array([s.year for s in studies], dtype=np.int64)
+    arrays["study.rating"] = np.array([s.rating for s in studies], dtype=np.float64)
+    for name in ("title", "authors", "doi", "journal", "training_status"):
+        add_strings(f"study.{name}", [getattr(s, name) for s in studies])
+    for name in ("tags", "population", "outcomes"):
+        add_strings(
+            f"study.{name}",
+            [json.dumps(getattr(s, name), ensure_ascii=False) for s in studies],
+        )
+
+    arrays["passage.id"] = np.array([p.id for p in passages], dtype=np.int64)
+    arrays["passage.study_id"] = np.array(
+        [p.study_id for p in passages], dtype=np.int64
+    )
+    arrays["passage.chunk_index"] = _optional_ints([p.chunk_index for p in passages])
+    arrays["passage.char_start"] = _optional_ints([p.char_start for p in passages])
+    arrays["passage.char_end"] = _optional_ints([p.char_end for p in passages])
+    add_strings("passage.section", [p.section for p in passages])
+    add_strings("passage.chunk_id", [p.chunk_id for p in passages])
+    add_strings("passage.text", [p.text for p in passages])
+
+    arrays["arena"] = np.frombuffer(b"".join(arena.parts), dtype=np.uint8)
+
+    # Offsets are relative to the data section, which starts after the header
+    table: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, arr in arrays.items():
+        offset = -(-offset // _ALIGN) * _ALIGN
+        table[name] = {
+            "dtype": arr.dtype.str,
+            "shape": list(arr.shape),
+            "offset": offset,
+        }
+        offset += arr.nbytes
+
+    header = json.dumps(
+        {
+            "version": PACK_FORMAT_VERSION,
+            "corpus_hash": corpus_hash,
+            "n_studies": len(studies),
+            "n_passages": len(passages),
+            "arrays": table,
+        }
+    ).encode("utf-8")
+    data_start = -(-(len(PACK_MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    with tmp.open("wb") as f:
+        f.write(PACK_MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, arr in arrays.items():
+            f.seek(data_start + table[name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    os.replace(tmp, path)
+
+
+def _read_header(path: Path) -> Tuple[Dict[str, Any], int]:
+    with Path(path).open("rb") as f:
+        if f.read(len(PACK_MAGIC)) != PACK_MAGIC:
+            raise StalePackError(f"{path} is not a corpus pack")
+        size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(size).decode("utf-8"))
+    data_start = -(-(len(PACK_MAGIC) + 8 + size) // _ALIGN) * _ALIGN
+    return header, data_start
+
+
+def read_pack_header(path: Path) -> Dict[str, Any]:
+    return _read_header(path)[0]
+
+
+class CorpusPack:
+    """
+    Read-only view of a pack written by write_corpus_pack
+
+    The file is memory-mapped, so opening it costs no parsing or copies and
+    every worker process shares the same page-cache pages. Studies are few
+    and decoded eagerly by studies(); passages() decodes each Passage on
+    first access
+    """
+
+    def __init__(self, path: Path, corpus_hash: Optional[str] = None) -> None:
+        self.path = Path(path)
+        self.header, data_start = _read_header(self.path)
+        if self.header.get("version") != PACK_FORMAT_VERSION:
+            raise StalePackError(
+                f"{self.path} has pack format v{self.header.get('version')}, "
+                f"expected v{PACK_FORMAT_VERSION}; recompile it"
+            )
+        if corpus_hash is not None and self.header.get("corpus_hash") != corpus_hash:
+            raise StalePackError(
+                f"{self.path} was compiled from another corpus version; recompile "
+                "it (python -m scripts.data.compile_corpus)"
+            )
+        self.corpus_hash: str = self.header["corpus_hash"]
+
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, meta in self.header["arrays"].items():
+            count = int(np.prod(meta["shape"], dtype=np.int64))
+            self.arrays[name] = np.frombuffer(
+                self._mm,
+                dtype=np.dtype(meta["dtype"]),
+                count=count,
+                offset=data_start + meta["offset"],
+            ).reshape(meta["shape"])
+        self.arena = self.arrays["arena"]
+        self._arena_start = data_start + self.header["arrays"]["arena"]["offset"]
+
+        # Flat memoryviews of the same pages: element reads return plain
+        # Python values, far cheaper than numpy scalar indexing per field
+        self.flat: Dict[str, memoryview] = {
+            name: memoryview(arr.reshape(-1)).cast("B").cast(arr.dtype.char)
+            for name, arr in self.arrays.items()
+        }
+
+    def string_reader(self, column: str) -> Callable[[int], Optional[str]]:
+        """
+        Fast reader of one string column: row index -> str (None if null)
+        """
+        null = self.flat.get(f"{column}.null")
+        spans = self.flat[f"{column}.spans"]
+        mm, base = self._mm, self._arena_start
+
+        # Slicing the mmap itself is the cheapest way to get the bytes out
+        def read(i: int) -> Optional[str]:
+            if null is not None and null[i]:
+                return None
+            return mm[base + spans[2 * i] : base + spans[2 * i + 1]].decode("utf-8")
+
+        return read
+
+    def string(self, column: str, i: int) -> Optional[str]:
+        return self.string_reader(column)(i)
+
+    def studies(self) -> List[Study]:
+        out: List[Study] = []
+        cols = self.flat
+        for i in range(int(self.header["n_studies"])):
+            out.append(
+                Study(
+                    id=cols["study.id"][i],
+                    title=self.string("study.title", i),
+                    authors=self.string("study.authors", i),
+                    year=cols["study.year"][i],
+                    doi=self.string("study.doi", i),
+                    journal=self.string("study.journal", i),
+                    rating=cols["study.rating"][i],
+                    tags=json.loads(self.string("study.tags", i)),
+                    training_status=self.string("study.training_status", i),
+                    population=json.loads(self.string("study.population", i)),
+                    outcomes=json.loads(self.string("study.outcomes", i)),
+                )
+            )
+        return out
+
+    def passages(self) -> "PackedPassages":
+        return PackedPassages(self)
+
+
+class PackedPassages(Sequence[Passage]):
+    """
+    Passages of a CorpusPack, decoded from the mapped arrays on first access
+    and then reused
+
+    ids / study_ids are the raw columns and sections() / texts() decode just
+    that column, for callers that only need those (see passage_ids & co.)
+    """
+
+    def __init__(self, pack: CorpusPack) -> None:
+        self.pack = pack
+        self.ids: np.ndarray = pack.arrays["passage.id"]
+        self.study_ids: np.ndarray = pack.arrays["passage.study_id"]
+        self._decoded: List[Optional[Passage]] = [None] * len(self.ids)
+        self._sections: Optional[List[str]] = None
+
+        cols = pack.flat
+        self._id = cols["passage.id"]
+        self._study_id = cols["passage.study_id"]
+        self._chunk_index = cols["passage.chunk_index"]
+        self._char_start = cols["passage.char_start"]
+        self._char_end = cols["passage.char_end"]
+        self._section = pack.string_reader("passage.section")
+        self._text = pack.string_reader("passage.text")
+        self._chunk_id = pack.string_reader("passage.chunk_id")
+
+    def __len__(self) -> int:
+        return len(self._decoded)
+
+    def _decode(self, i: int) -> Passage:
+        chunk_index = self._chunk_index[i]
+        char_start = self._char_start[i]
+        char_end = self._char_end[i]
+        return Passage(
+            id=self._id[i],
+            study_id=self._study_id[i],
+            section=self._section(i),
+            text=self._text(i),
+            chunk_id=self._chunk_id(i),
+            chunk_index=None if chunk_index == _NO_INT else chunk_index,
+            char_start=None if char_start == _NO_INT else char_start,
+            char_end=None if char_end == _NO_INT else char_end,
+        )
+
+    @overload
+    def __getitem__(self, i: int) -> Passage: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[Passage]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("passage index out of range")
+        passage = self._decoded[i]
+        if passage is None:
+            # Racing threads may both decode; either (equal) copy is kept
+            passage = self._decoded[i] = self._decode(i)
+        return passage
+
+    def __iter__(self) -> Iterator[Passage]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def section(self, i: int) -> str:
+        """
+        Passage section without decoding the whole Passage
+        """
+        return self._section(i)
+
+    def sections(self) -> List[str]:
+        """
+        Every passage's section (decoded once, they are short and repeat)
+        """
+        if self._sections is None:
+            self._sections = [self._section(i) for i in range(len(self))]
+        return self._sections
+
+    def texts(self) -> List[str]:
+        """
+        Every passage's text, without building Passage objects
+        """
+        return [self._text(i) for i in range(len(self))]
+
+    def text(self, i: int) -> str:
+        """
+        Passage text without decoding the whole Passage
+        """
+        return self._text(i)
+
+
+# Column access for any passage sequence: a PackedPassages answers from its
+# columns without decoding Passage objects, anything else is iterated
+def passage_ids(passages: Sequence[Passage]) -> np.ndarray:
+    if isinstance(passages, PackedPassages):
+        return passages.ids
+    return np.fromiter((p.id for p in passages), dtype=np.int64, count=len(passages))
+
+
+def passage_study_ids(passages: Sequence[Passage]) -> np.ndarray:
+    if isinstance(passages, PackedPassages):
+        return passages.study_ids
+    return np.fromiter(
+        (p.study_id for p in passages), dtype=np.int64, count=len(passages)
+    )
+
+
+def passage_sections(passages: Sequence[Passage]) -> List[str]:
+    if isinstance(passages, PackedPassages):
+        return passages.sections()
+    return [p.section for p in passages]
+
+
+def passage_texts(passages: Sequence[Passage]) -> List[str]:
+    if isinstance(passages, PackedPassages):
+        return passages.texts()
+    return [p.text for p in passages]
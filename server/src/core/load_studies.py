@@ -1,21 +1,28 @@
 from __future__ import annotations
 
+import hashlib
 import json
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from .models import Study, Passage
+from .chunking import ChunkConfig, DEFAULT_CHUNK_CONFIG, chunk_passages
 
 
-def load_studies_from_dir(studies_dir: Path) -> Tuple[List[Study], List[Passage]]:
+def load_studies_from_dir(
+    studies_dir: Path, chunk_config: Optional[ChunkConfig] = DEFAULT_CHUNK_CONFIG
+) -> Tuple[List[Study], List[Passage]]:
+    """
+    Load every study JSON, one passage per section
+
+    Sections are then split into bounded, overlapping chunks
+    (pass chunk_config=None to keep whole sections)
+    """
     studies: List[Study] = []
     passages: List[Passage] = []
     passage_id = 1
 
     for path in sorted(studies_dir.glob("*.json")):
-        # DEBUG: show which file we're reading
-        print(f"Loading JSON: {path}")
-
         with path.open("r", encoding="utf-8") as f:
             try:
                 data = json.load(f)
@@ -61,6 +68,9 @@ def load_studies_from_dir(studies_dir: Path) -> Tuple[List[Study], List[Passage]
             )
             passage_id += 1
 
+    if chunk_config is not None:
+        passages = chunk_passages(passages, chunk_config)
+
     # Check for duplicate Passage IDs
     ids = [p.id for p in passages]
     if len(ids) != len(set(ids)):
@@ -69,3 +79,23 @@ def load_studies_from_dir(studies_dir: Path) -> Tuple[List[Study], List[Passage]
         )
 
     return studies, passages
+
+
+def corpus_hash(
+    studies_dir: Path, chunk_config: Optional[ChunkConfig] = DEFAULT_CHUNK_CONFIG
+) -> str:
+    """
+    Content hash of the on-disk corpus (file names + bytes of every study JSON)
+    and of the chunking applied when loading it
+
+    Anything derived from the corpus (indexes, caches) stores this to detect staleness
+    """
+    h = hashlib.sha256()
+    h.update((chunk_config.key() if chunk_config else "chunk:none").encode("utf-8"))
+    h.update(b"\0")
+    for path in sorted(studies_dir.glob("*.json")):
+        h.update(path.name.encode("utf-8"))
+        h.update(b"\0")
+        h.update(path.read_bytes())
+        h.update(b"\0")
+    return h.hexdigest()
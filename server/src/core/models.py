@@ -23,3 +23,8 @@ class Passage:
     study_id: int
     section: str
     text: str
+    # Set for chunks of a longer section (see core/chunking.py)
+    chunk_id: Optional[str] = None  # "<study_id>:<section>:<n>", positional
+    chunk_index: Optional[int] = None
+    char_start: Optional[int] = None  # offsets into the full section text
+    char_end: Optional[int] = None
@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .models import Passage, Study
+from .text_utils import tokenize
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS studies (
+    id INTEGER PRIMARY KEY,
+    pos INTEGER NOT NULL,
+    title TEXT,
+    authors TEXT,
+    year INTEGER,
+    doi TEXT,
+    journal TEXT,
+    rating REAL,
+    training_status TEXT,
+    tags TEXT NOT NULL,
+    population TEXT NOT NULL,
+    outcomes TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS study_tags (
+    tag TEXT NOT NULL,
+    study_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, study_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS passages (
+    id INTEGER PRIMARY KEY,
+    study_id INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    text TEXT NOT NULL,
+    chunk_id TEXT,
+    chunk_index INTEGER,
+    char_start INTEGER,
+    char_end INTEGER
+);
+CREATE INDEX IF NOT EXISTS passages_by_study ON passages (study_id, id);
+CREATE INDEX IF NOT EXISTS passages_by_section ON passages (lower(section), id);
+CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5 (tokens);
+CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts_vocab
+    USING fts5vocab (passages_fts, row);
+"""
+
+PASSAGE_COLUMNS = (
+    "p.id, p.study_id, p.section, p.text, "
+    "p.chunk_id, p.chunk_index, p.char_start, p.char_end"
+)
+_STUDY_COLUMNS = (
+    "id, title, authors, year, doi, journal, rating, training_status, "
+    "tags, population, outcomes"
+)
+# Passages in corpus order: studies in load order, then passage id
+_PASSAGE_ORDER = "(SELECT pos FROM studies s WHERE s.id = p.study_id), p.id"
+
+
+def passage_from_row(row: Sequence) -> Passage:
+    return Passage(
+        id=row[0],
+        study_id=row[1],
+        section=row[2],
+        text=row[3],
+        chunk_id=row[4],
+        chunk_index=row[5],
+        char_start=row[6],
+        char_end=row[7],
+    )
+
+
+def _study_from_row(row: Sequence) -> Study:
+    return Study(
+        id=row[0],
+        title=row[1],
+        authors=row[2],
+        year=row[3],
+        doi=row[4],
+        journal=row[5],
+        rating=row[6],
+        training_status=row[7],
+        tags=json.loads(row[8]),
+        population=json.loads(row[9]),
+        outcomes=json.loads(row[10]),
+    )
+
+
+def fts_tokens(text: str) -> str:
+    """
+    What the FTS table indexes: the text as the sparse indexes tokenise it
+    (normalised, stopwords dropped), so all lexical legs agree on terms
+    """
+    return " ".join(tokenize(text))
+
+
+class SqliteStudyStore:
+    """
+    StudyStore in a single SQLite file: studies, passages (incl. chunk
+    offsets) and an FTS5 table over the passage text for bm25 search
+    (see retrieval/fts.py)
+
+    Opening it reads nothing up front and lookups are indexed queries
+    (get_all_passages still loads every passage). Corpus updates are
+    transactional upserts per study (upsert_study / delete_study) instead of
+    a full reload. Reads use one connection per thread (WAL lets them run next
+    to a writer); writes share one connection behind a lock
+
+    read_only=True opens an existing file without creating it or applying the
+    schema (FileNotFoundError if it is missing); writes then fail in SQLite
+    """
+
+    def __init__(self, path: Path, read_only: bool = False) -> None:
+        self.path = Path(path)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if read_only:
+            if not self.path.is_file():
+                raise FileNotFoundError(f"No SQLite corpus at {self.path}")
+            self._conn = self._connect(check_same_thread=False)
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = self._connect(check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        if self.read_only:
+            return sqlite3.connect(
+                self.path.resolve().as_uri() + "?mode=ro",
+                uri=True,
+                timeout=5.0,
+                check_same_thread=check_same_thread,
+            )
+        return sqlite3.connect(
+            str(self.path), timeout=5.0, check_same_thread=check_same_thread
+        )
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        return self._reader().execute(sql, params).fetchall()
+
+    # Writes
+    def _write_study(
+        self, conn: sqlite3.Connection, study: Study, passages: List[Passage]
+    ) -> None:
+        row = conn.execute("SELECT pos FROM studies WHERE id = ?", (study.id,))
+        found = row.fetchone()
+        pos = (
+            found[0]
+            if found
+            else conn.execute(
+                "SELECT COALESCE(MAX(pos) + 1, 0) FROM studies"
+            ).fetchone()[0]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO studies (id, pos, title, authors, year, doi,"
+            " journal, rating, training_status, tags, population, outcomes)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                study.id,
+                pos,
+                study.title,
+                study.authors,
+                study.year,
+                study.doi,
+                study.journal,
+                study.rating,
+                study.training_status,
+                json.dumps(study.tags, ensure_ascii=False),
+                json.dumps(study.population, ensure_ascii=False),
+                json.dumps(study.outcomes, ensure_ascii=False),
+            ),
+        )
+        conn.execute("DELETE FROM study_tags WHERE study_id = ?", (study.id,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO study_tags (tag, study_id) VALUES (?, ?)",
+            [(tag, study.id) for tag in study.tags],
+        )
+        self._delete_passages(conn, study.id)
+        self._write_passages(conn, passages)
+
+    @staticmethod
+    def _delete_passages(conn: sqlite3.Connection, study_id: int) -> None:
+        conn.execute(
+            "DELETE FROM passages_fts WHERE rowid IN"
+            " (SELECT id FROM passages WHERE study_id = ?)",
+            (study_id,),
+        )
+        conn.execute("DELETE FROM passages WHERE study_id = ?", (study_id,))
+
+    @staticmethod
+    def _write_passages(conn: sqlite3.Connection, passages: List[Passage]) -> None:
+        conn.executemany(
+            "DELETE FROM passages_fts WHERE rowid = ?", [(p.id,) for p in passages]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO passages (id, study_id, section, text, chunk_id,"
+            " chunk_index, char_start, char_end) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    p.id,
+                    p.study_id,
+                    p.section,
+                    p.text,
+                    p.chunk_id,
+                    p.chunk_index,
+                    p.char_start,
+                    p.char_end,
+                )
+                for p in passages
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO passages_fts (rowid, tokens) VALUES (?, ?)",
+            [(p.id, fts_tokens(p.text)) for p in passages],
+        )
+
+    def upsert_study(self, study: Study, passages: List[Passage]) -> None:
+        """
+        Insert or replace a study and all of its passages in one transaction
+        """
+        with self._lock, self._conn:
+            self._write_study(self._conn, study, passages)
+
+    def upsert_passages(self, passages: List[Passage]) -> None:
+        with self._lock, self._conn:
+            self._write_passages(self._conn, passages)
+
+    @classmethod
+    def _delete_study(cls, conn: sqlite3.Connection, study_id: int) -> None:
+        cls._delete_passages(conn, study_id)
+        conn.execute("DELETE FROM study_tags WHERE study_id = ?", (study_id,))
+        conn.execute("DELETE FROM studies WHERE id = ?", (study_id,))
+
+    def delete_study(self, study_id: int) -> None:
+        with self._lock, self._conn:
+            self._delete_study(self._conn, study_id)
+
+    def import_corpus(
+        self,
+        studies: Iterable[Study],
+        passages: Iterable[Passage],
+        corpus_hash: Optional[str] = None,
+    ) -> None:
+        """
+        Sync the store to a whole loaded corpus (e.g. StudyStore.from_dir) in
+        one transaction: its studies are upserted, studies it lacks are deleted
+        """
+        studies = list(studies)
+        by_study: Dict[int, List[Passage]] = {}
+        for p in passages:
+            by_study.setdefault(p.study_id, []).append(p)
+        keep = json.dumps([s.id for s in studies])
+        with self._lock, self._conn:
+            gone = self._conn.execute(
+                "SELECT id FROM studies WHERE id NOT IN (SELECT value FROM json_each(?))",
+                (keep,),
+            ).fetchall()
+            for (study_id,) in gone:
+                self._delete_study(self._conn, study_id)
+            for study in studies:
+                self._write_study(self._conn, study, by_study.get(study.id, []))
+            if corpus_hash is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('corpus_hash', ?)",
+                    (corpus_hash,),
+                )
+
+    @property
+    def corpus_hash(self) -> Optional[str]:
+        rows = self.query("SELECT value FROM meta WHERE key = 'corpus_hash'")
+        return rows[0][0] if rows else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Study methods (same interface as StudyStore)
+    @property
+    def studies(self) -> List[Study]:
+        return self.get_all_studies()
+
+    def get_all_studies(self) -> List[Study]:
+        rows = self.query(f"SELECT {_STUDY_COLUMNS} FROM studies ORDER BY pos")
+        return [_study_from_row(r) for r in rows]
+
+    def get_study_by_id(self, study_id: int) -> Optional[Study]:
+        rows = self.query(
+            f"SELECT {_STUDY_COLUMNS} FROM studies WHERE id = ?", (study_id,)
+        )
+        return _study_from_row(rows[0]) if rows else None
+
+    def get_studies_by_ids(self, study_ids: Collection[int]) -> List[Study]:
+        rows = self.query(
+            f"SELECT {_STUDY_COLUMNS} FROM studies"
+            " WHERE id IN (SELECT value FROM json_each(?)) ORDER BY pos",
+            (json.dumps(sorted(set(study_ids))),),
+        )
+        return [_study_from_row(r) for r in rows]
+
+    def get_study_ids_for_tag(self, tag: str) -> List[int]:
+        rows = self.query(
+            "SELECT t.study_id FROM study_tags t JOIN studies s ON s.id = t.study_id"
+            " WHERE t.tag = ? ORDER BY s.pos",
+            (tag,),
+        )
+        return [r[0] for r in rows]
+
+    def iter_studies(self) -> Iterable[Study]:
+        return iter(self.get_all_studies())
+
+    # Passage methods
+    @property
+    def passages(self) -> List[Passage]:
+        return self.get_all_passages()
+
+    def get_all_passages(self) -> List[Passage]:
+        """
+        Every passage in corpus order (loads them all; prefer iter_passages)
+        """
+        return list(self.iter_passages())
+
+    def iter_passages(self) -> Iterator[Passage]:
+        cur = self._reader().execute(
+            f"SELECT {PASSAGE_COLUMNS} FROM passages p ORDER BY {_PASSAGE_ORDER}"
+        )
+        for row in cur:
+            yield passage_from_row(row)
+
+    def get_passage_by_id(self, passage_id: int) -> Optional[Passage]:
+        rows = self.query(
+            f"SELECT {PASSAGE_COLUMNS} FROM passages p WHERE p.id = ?", (passage_id,)
+        )
+        return passage_from_row(rows[0]) if rows else None
+
+    def get_passage_rows_for_study(self, study_id: int) -> Sequence[int]:
+        """
+        Positions of the study's passages in get_all_passages() (usually a range)
+        """
+        rows = [
+            r[0]
+            for r in self.query(
+                "SELECT row FROM (SELECT p.study_id,"
+                f" ROW_NUMBER() OVER (ORDER BY {_PASSAGE_ORDER}) - 1 AS row"
+                " FROM passages p) WHERE study_id = ? ORDER BY row",
+                (study_id,),
+            )
+        ]
+        if rows and rows[-1] - rows[0] + 1 == len(rows):
+            return range(rows[0], rows[-1] + 1)
+        return rows
+
+    def get_passages_for_study(self, study_id: int) -> List[Passage]:
+        rows = self.query(
+            f"SELECT {PASSAGE_COLUMNS} FROM passages p WHERE p.study_id = ?"
+            " ORDER BY p.id",
+            (study_id,),
+        )
+        return [passage_from_row(r) for r in rows]
+
+    def get_passages_for_section(self, section: str) -> List[Passage]:
+        rows = self.query(
+            f"SELECT {PASSAGE_COLUMNS} FROM passages p WHERE lower(p.section) = ?"
+            f" ORDER BY {_PASSAGE_ORDER}",
+            (section.lower(),),
+        )
+        return [passage_from_row(r) for r in rows]
@@ -1,11 +1,20 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Collection, Dict, Iterable, List, Optional, Sequence
 
 from .models import Study, Passage
 from .load_studies import load_studies_from_dir
+from .corpus_pack import (
+    CorpusPack,
+    StalePackError,
+    passage_ids,
+    passage_sections,
+    passage_study_ids,
+    write_corpus_pack,
+)
+from .chunking import ChunkConfig, DEFAULT_CHUNK_CONFIG
 
 
 @dataclass
@@ -14,17 +23,87 @@ class StudyStore:
     Simple in memory store for studies and passages
 
     To add other implementations (DB-backed, API-backed) later
+
+    Secondary indexes (passage id, study, section, tag) are built once on
+    construction, so lookups don't scan the passage list; with a corpus pack
+    they are built from its columns without decoding passages
     """
 
     studies: List[Study]
-    passages: List[Passage]
+    passages: Sequence[Passage]  # a list, or PackedPassages from a corpus pack
     _study_by_id: Dict[int, Study]
+    chunk_config: Optional[ChunkConfig] = None
+
+    _study_pos: Dict[int, int] = field(init=False, repr=False)
+    _row_by_passage_id: Dict[int, int] = field(init=False, repr=False)
+    _rows_by_study: Dict[int, Sequence[int]] = field(init=False, repr=False)
+    _rows_by_section: Dict[str, List[int]] = field(init=False, repr=False)
+    _study_ids_by_tag: Dict[str, List[int]] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._study_pos = {s.id: i for i, s in enumerate(self.studies)}
+        self._study_ids_by_tag = {}
+        for s in self.studies:
+            for tag in dict.fromkeys(s.tags):
+                self._study_ids_by_tag.setdefault(tag, []).append(s.id)
+
+        # From the pack's columns when packed, no Passage gets decoded
+        ids = passage_ids(self.passages).tolist()
+        study_ids = passage_study_ids(self.passages).tolist()
+        sections = passage_sections(self.passages)
+
+        self._row_by_passage_id = {pid: row for row, pid in enumerate(ids)}
+
+        rows_by_study: Dict[int, List[int]] = {}
+        for row, sid in enumerate(study_ids):
+            rows_by_study.setdefault(sid, []).append(row)
+        # Loaders keep a study's passages together: store those as row ranges
+        self._rows_by_study = {
+            sid: (
+                range(rows[0], rows[-1] + 1)
+                if rows[-1] - rows[0] + 1 == len(rows)
+                else rows
+            )
+            for sid, rows in rows_by_study.items()
+        }
+
+        self._rows_by_section = {}
+        for row, section in enumerate(sections):
+            self._rows_by_section.setdefault((section or "").lower(), []).append(row)
 
     @classmethod
-    def from_dir(cls, studies_dir: Path) -> "StudyStore":
-        studies, passages = load_studies_from_dir(studies_dir)
+    def from_dir(
+        cls,
+        studies_dir: Path,
+        chunk_config: Optional[ChunkConfig] = DEFAULT_CHUNK_CONFIG,
+    ) -> "StudyStore":
+        studies, passages = load_studies_from_dir(studies_dir, chunk_config)
         study_by_id = {s.id: s for s in studies}
-        return cls(studies=studies, passages=passages, _study_by_id=study_by_id)
+        return cls(
+            studies=studies,
+            passages=passages,
+            _study_by_id=study_by_id,
+            chunk_config=chunk_config,
+        )
+
+    @classmethod
+    def from_pack(
+        cls, pack_path: Path, corpus_hash: Optional[str] = None
+    ) -> "StudyStore":
+        """
+        Open a compiled corpus pack (scripts/data/compile_corpus.py)
+
+        The pack is memory-mapped and passages are decoded on first access.
+        With corpus_hash set, a pack compiled from another corpus version
+        raises StalePackError
+        """
+        pack = CorpusPack(pack_path, corpus_hash=corpus_hash)
+        studies = pack.studies()
+        return cls(
+            studies=studies,
+            passages=pack.passages(),
+            _study_by_id={s.id: s for s in studies},
+        )
 
     # Study methods
     def get_all_studies(self) -> List[Study]:
@@ -33,15 +112,68 @@ class StudyStore:
     def get_study_by_id(self, study_id: int) -> Optional[Study]:
         return self._study_by_id.get(study_id)
 
+    def get_studies_by_ids(self, study_ids: Collection[int]) -> List[Study]:
+        """
+        Studies with these ids (unknown ids skipped), in corpus order
+        """
+        positions = sorted(
+            self._study_pos[sid] for sid in set(study_ids) if sid in self._study_pos
+        )
+        return [self.studies[i] for i in positions]
+
+    def get_study_ids_for_tag(self, tag: str) -> List[int]:
+        return list(self._study_ids_by_tag.get(tag, []))
+
     def iter_studies(self) -> Iterable[Study]:
         return iter(self.studies)
 
     # Passage methods
-    def get_all_passages(self) -> List[Passage]:
+    def get_all_passages(self) -> Sequence[Passage]:
         return self.passages
 
     def iter_passages(self) -> Iterable[Passage]:
         return iter(self.passages)
 
+    def get_passage_by_id(self, passage_id: int) -> Optional[Passage]:
+        row = self._row_by_passage_id.get(passage_id)
+        return None if row is None else self.passages[row]
+
+    def get_passage_rows_for_study(self, study_id: int) -> Sequence[int]:
+        """
+        Positions of the study's passages in self.passages (usually a range)
+        """
+        return self._rows_by_study.get(study_id, range(0))
+
     def get_passages_for_study(self, study_id: int) -> List[Passage]:
-        return [p for p in self.passages if p.study_id == study_id]
+        return [self.passages[i] for i in self.get_passage_rows_for_study(study_id)]
+
+    def get_passages_for_section(self, section: str) -> List[Passage]:
+        """
+        Passages of one section name (case-insensitive), in corpus order
+        """
+        rows = self._rows_by_section.get(section.lower(), [])
+        return [self.passages[i] for i in rows]
+
+
+def load_or_build_store(
+    pack_path: Path,
+    studies_dir: Path,
+    corpus_hash: str,
+    save: bool = True,
+) -> StudyStore:
+    """
+    Open the corpus pack if it is fresh, otherwise parse the study JSON (and
+    write the pack for next time)
+    """
+    try:
+        return StudyStore.from_pack(pack_path, corpus_hash=corpus_hash)
+    except (FileNotFoundError, StalePackError) as e:
+        print(f"Corpus pack not used ({e}), loading study JSON")
+
+    store = StudyStore.from_dir(studies_dir)
+    if save:
+        try:
+            write_corpus_pack(pack_path, store.studies, store.passages, corpus_hash)
+        except OSError as e:
+            print(f"Could not save corpus pack to {pack_path}: {e}")
+    return store
@@ -1,5 +1,5 @@
-from typing import Protocol
-from src.core.models import Study
+from typing import List, Optional, Protocol, Tuple
+from src.core.models import Passage, Study
 from src.retrieval.retriever import Retriever
 from .answerer import Answer, Mode
 
@@ -11,4 +11,5 @@ class AnswerGenerator(Protocol):
         query: str,
         retriever: Retriever,
         studies: list[Study],
+        results: Optional[List[Tuple[Passage, float]]] = None,
     ) -> Answer: ...
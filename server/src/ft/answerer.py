@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Literal, Tuple, Any
+from typing import Dict, List, Literal, Optional, Tuple, Any
+
+import numpy as np
 
 from src.core.models import Study, Passage
 from src.retrieval.indexer import TfIdfIndex
@@ -21,62 +23,6 @@ class Answer:
     confidence: str  # "high", "medium", "low"
 
 
-def _pick_studies_from_results(
-    results: List[Tuple[Passage, float]],
-    study_lookup: Dict[int, Study],
-    mode: Mode,
-    query_tokens: List[str],
-    max_studies: int = 3,
-) -> Tuple[List[Tuple[int, List[Passage]]], List[float]]:
-    """
-    Group passages by study_id
-    Returns list of (study_id, [passages_for_that_study]) sorted by best score
-    """
-
-    # Group passages and scores by study_id
-    grouped: Dict[int, List[Tuple[Passage, float]]] = {}
-    for passage, score in results:
-        grouped.setdefault(passage.study_id, []).append((passage, score))
-
-    # Compute an overall score for each study using the highest passage score
-    # Also sort the passage list within each study by score
-    scored_studies: List[Tuple[int, float, List[Passage]]] = []
-    for study_id, plist in grouped.items():
-        best_score = max(score for _p, score in plist)
-        sorted_passages = [p for p, _score in sorted(plist, key=lambda x: -x[1])]
-
-        study = study_lookup[study_id]
-
-        training_status = getattr(study, "training_status", "mixed")
-        # Weights for scoring
-        wt_mode = mode_training_weight(
-            mode, training_status
-        )  # beginner/intermediate studies
-        wt_rate = rating_weight(study.rating)  # rating
-        wt_recent = recency_weight(study.year)  # publication year
-        wt_tags = tag_weight(query_tokens, study.tags)  # study tags <> query match
-        wt_outcome = outcome_weight(
-            query=" ".join(query_tokens), outcomes=getattr(study, "outcomes", None)
-        )
-
-        final_score = best_score * wt_mode * wt_rate * wt_recent * wt_tags * wt_outcome
-
-        scored_studies.append((study_id, final_score, sorted_passages))
-
-    # Sort the outer list of studies by final score
-    scored_studies.sort(key=lambda x: -x[1])
-
-    # Take top max_studies and split into (chosen, scores)
-    picked: List[Tuple[int, List[Passage]]] = []
-    all_scores: List[float] = []
-
-    for study_id, score, passages in scored_studies[:max_studies]:
-        picked.append((study_id, passages))
-        all_scores.append(score)
-
-    return picked, all_scores
-
-
 def _make_citation_line(study: Study) -> str:
     journal = study.journal or ""
     doi = f" DOI: {study.doi}" if study.doi else ""
@@ -179,6 +125,169 @@ def tag_weight(query_tokens: List[str], study_tags: List[str]) -> float:
     return min(1.0 + matched * 0.1, 1.3)
 
 
+MODES: Tuple[Mode, ...] = ("beginner", "intermediate")
+
+
+class StudyFeatures:
+    """
+    Columnar copy of the study fields the answerer scores on, built once per
+    corpus
+
+    The query-independent weights (mode x training status, rating, recency)
+    are precomputed per study; tags and outcomes are stored as per-study
+    count / bit matrices so the query-dependent weights are a few array ops
+    over the candidate studies. Scores equal the scalar *_weight functions
+    above exactly
+    """
+
+    def __init__(self, studies: List[Study]) -> None:
+        self.studies = list(studies)
+        self.by_id: Dict[int, Study] = {s.id: s for s in self.studies}
+        n = len(self.studies)
+
+        ids = np.fromiter((s.id for s in self.studies), dtype=np.int64, count=n)
+        self.row_of_id = np.full(int(ids.max()) + 1 if n else 0, -1, dtype=np.int64)
+        self.row_of_id[ids] = np.arange(n, dtype=np.int64)
+
+        self.years = np.fromiter((s.year for s in self.studies), np.int64, count=n)
+        self.ratings = np.fromiter(
+            (s.rating for s in self.studies), np.float64, count=n
+        )
+
+        # Training status as a code into self.statuses
+        statuses = [getattr(s, "training_status", "mixed") for s in self.studies]
+        self.statuses = sorted(set(statuses))
+        code_of = {st: i for i, st in enumerate(self.statuses)}
+        self.status_codes = np.fromiter(
+            (code_of[st] for st in statuses), np.int64, count=n
+        )
+        self.mode_weights: Dict[str, np.ndarray] = {
+            mode: np.array(
+                [mode_training_weight(mode, st) for st in self.statuses],
+                dtype=np.float64,
+            )[self.status_codes]
+            for mode in MODES
+        }
+        self.rating_weights = np.array(
+            [rating_weight(r) for r in self.ratings.tolist()], dtype=np.float64
+        )
+        self.recency_weights = np.array(
+            [recency_weight(y) for y in self.years.tolist()], dtype=np.float64
+        )
+
+        # tag_counts[i, j]: how often study i lists self.tags[j]
+        self.tags = sorted({tag for s in self.studies for tag in s.tags})
+        tag_col = {tag: j for j, tag in enumerate(self.tags)}
+        self.tag_counts = np.zeros((n, len(self.tags)), dtype=np.int64)
+        for i, s in enumerate(self.studies):
+            for tag in s.tags:
+                self.tag_counts[i, tag_col[tag]] += 1
+        # Query token -> tag columns it matches (via TAG_SYNONYMS)
+        self.tag_cols_of_token: Dict[str, List[int]] = {}
+        for j, tag in enumerate(self.tags):
+            for syn in set(TAG_SYNONYMS.get(tag, [tag])):
+                self.tag_cols_of_token.setdefault(syn, []).append(j)
+
+        # Outcome bits in OUTCOME_KEYWORDS order
+        self.outcomes = list(OUTCOME_KEYWORDS)
+        self.outcome_primary = np.zeros((n, len(self.outcomes)), dtype=bool)
+        self.outcome_secondary = np.zeros((n, len(self.outcomes)), dtype=bool)
+        for i, s in enumerate(self.studies):
+            outcomes = getattr(s, "outcomes", None)
+            if not outcomes:
+                continue
+            primary = set(outcomes.get("primary", []))
+            secondary = set(outcomes.get("secondary", []))
+            for k, outcome in enumerate(self.outcomes):
+                self.outcome_primary[i, k] = outcome in primary
+                self.outcome_secondary[i, k] = outcome in secondary
+
+    def rows(self, study_ids: np.ndarray) -> np.ndarray:
+        known = (study_ids >= 0) & (study_ids < self.row_of_id.size)
+        rows = np.full(study_ids.shape, -1, dtype=np.int64)
+        rows[known] = self.row_of_id[study_ids[known]]
+        if (rows < 0).any():
+            raise KeyError(int(study_ids[rows < 0][0]))
+        return rows
+
+    def tag_weights(self, query_tokens: List[str], rows: np.ndarray) -> np.ndarray:
+        hit = np.zeros(len(self.tags), dtype=np.int64)
+        for tok in set(query_tokens):
+            hit[self.tag_cols_of_token.get(tok, [])] = 1
+        matched = self.tag_counts[rows] @ hit
+        return np.where(matched == 0, 1.0, np.minimum(1.0 + matched * 0.1, 1.3))
+
+    def outcome_weights(self, query_tokens: List[str], rows: np.ndarray) -> np.ndarray:
+        tokens = " ".join(tokenize(" ".join(query_tokens))).lower()
+        boost = np.ones(len(rows), dtype=np.float64)
+        # Added one outcome at a time, in the same order as outcome_weight
+        for k, outcome in enumerate(self.outcomes):
+            if any(word in tokens for word in OUTCOME_KEYWORDS[outcome]):
+                boost += np.where(
+                    self.outcome_primary[rows, k],
+                    0.3,
+                    np.where(self.outcome_secondary[rows, k], 0.1, 0.0),
+                )
+        return np.minimum(boost, 1.5)
+
+    def scores(
+        self,
+        rows: np.ndarray,
+        best_scores: np.ndarray,
+        mode: Mode,
+        query_tokens: List[str],
+    ) -> np.ndarray:
+        """
+        Final selection score of each candidate study (rows), given its best
+        passage score
+        """
+        return (
+            best_scores
+            * self.mode_weights[mode][rows]
+            * self.rating_weights[rows]
+            * self.recency_weights[rows]
+            * self.tag_weights(query_tokens, rows)
+            * self.outcome_weights(query_tokens, rows)
+        )
+
+
+def _pick_studies_from_results(
+    results: List[Tuple[Passage, float]],
+    features: StudyFeatures,
+    mode: Mode,
+    query_tokens: List[str],
+    max_studies: int = 3,
+) -> Tuple[List[Tuple[int, List[Passage]]], List[float]]:
+    """
+    Group passages by study_id
+    Returns list of (study_id, [passages_for_that_study]) sorted by best score
+    """
+    n = len(results)
+    study_ids = np.fromiter((p.study_id for p, _s in results), np.int64, count=n)
+    scores = np.fromiter((s for _p, s in results), np.float64, count=n)
+
+    # Candidate studies in order of first appearance, scored on their best passage
+    uniq, first, inverse = np.unique(study_ids, return_index=True, return_inverse=True)
+    best = np.full(len(uniq), -np.inf)
+    np.maximum.at(best, inverse, scores)
+    appearance = np.argsort(first, kind="stable")
+    uniq, best = uniq[appearance], best[appearance]
+
+    final = features.scores(features.rows(uniq), best, mode, query_tokens)
+
+    # Highest final score first, ties by first appearance
+    order = np.argsort(-final, kind="stable")[:max_studies]
+
+    # Passages of the picked studies only, each by score (ties in result order)
+    by_score = np.argsort(-scores, kind="stable")
+    picked: List[Tuple[int, List[Passage]]] = []
+    for study_id in uniq[order].tolist():
+        mine = by_score[study_ids[by_score] == study_id]
+        picked.append((study_id, [results[i][0] for i in mine.tolist()]))
+
+    return picked, final[order].tolist()
+
+
 def simplify_text_for_beginner(text: str) -> str:
     # Beginner version: remove jargon, shorten sentences
     replacements = {
@@ -238,6 +347,8 @@ def answer_query(
     studies: List[Study],
     top_k_passages: int = 10,
     max_studies: int = 3,
+    results: Optional[List[Tuple[Passage, float]]] = None,
+    study_features: Optional[StudyFeatures] = None,
 ) -> Answer:
     """
     Main entrypoint:
@@ -245,14 +356,20 @@ def answer_query(
     - Group passages by study
     - Assign citation numbers
     - Compose answer
+
+    Pass `results` (e.g. RetrievalContext.results) to reuse a search already
+    run for this query, and `study_features` (StudyFeatures(studies), built
+    once at load) to skip rebuilding the study columns per call
     """
 
-    # Build study lookup with study_id -> study
-    study_lookup = {s.id: s for s in studies}
+    if study_features is None:
+        study_features = StudyFeatures(studies)
+    study_lookup = study_features.by_id
 
     query_tokens = tokenize(query)
 
-    results = retriever.search(query, top_k=top_k_passages)
+    if results is None:
+        results = retriever.search(query, top_k=top_k_passages)
 
     if not results:
         answer_text = (
@@ -269,7 +386,7 @@ def answer_query(
 
     chosen, all_scores = _pick_studies_from_results(
         results,
-        study_lookup=study_lookup,
+        features=study_features,
         mode=mode,
         query_tokens=query_tokens,
         max_studies=max_studies,
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Protocol
+
+import numpy as np
+
+from src.core.chunking import sentence_spans
+
+# Default prompt context budget, in whitespace-delimited words
+DEFAULT_CONTEXT_TOKEN_BUDGET = 600
+
+GAP_MARKER = " … "
+
+
+class SupportsSimilarities(Protocol):
+    """
+    Scorer of arbitrary texts against a query, higher = more relevant
+    - TfIdfIndex (cosine), Bm25Index / Bm25FIndex / Fts5Index (BM25)
+    - DenseRetriever (embedding cosine)
+    """
+
+    def similarities(self, query: str, texts: List[str]) -> np.ndarray: ...
+
+
+def _can_score(scorer: Optional[Any]) -> bool:
+    # Any sparse backend may be handed in, only ones that can score texts are used
+    return callable(getattr(scorer, "similarities", None))
+
+
+@dataclass
+class _Sentence:
+    entry: int  # index into ctx
+    order: int  # position within its entry's text
+    text: str
+    n_tokens: int
+    score: float = 0.0
+
+
+def _split_entry(entry_idx: int, text: str) -> List[_Sentence]:
+    sentences: List[_Sentence] = []
+    seen = set()
+    for start, end in sentence_spans(text):
+        sentence = re.sub(r"\s+", " ", text[start:end]).strip()
+        # Overlapping chunks of the same section repeat sentences
+        if not sentence or sentence in seen:
+            continue
+        seen.add(sentence)
+        sentences.append(
+            _Sentence(entry_idx, len(sentences), sentence, len(sentence.split()))
+        )
+    return sentences
+
+
+def compress_context(
+    query: str,
+    ctx: List[Dict[str, Any]],
+    token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+    sparse: Optional[SupportsSimilarities] = None,
+    dense: Optional[SupportsSimilarities] = None,
+    dense_weight: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """
+    Keep only the query-relevant sentences of each context entry
+
+    Sentences are scored by the sparse index's similarities() (TF-IDF cosine
+    or BM25), blended with embedding cosine when a DenseRetriever is given;
+    a scorer without similarities() is skipped. Every entry keeps its best
+    sentence, so each citation_index still points at an excerpt of the same study;
+    the rest of token_budget goes to the highest-scoring sentences overall.
+    Kept sentences stay in reading order, skipped stretches become " … "
+
+    Returns new entries (same keys, compressed "text"); ctx is not modified
+    """
+    sentences = [
+        s for i, c in enumerate(ctx) for s in _split_entry(i, c.get("text", ""))
+    ]
+    if not sentences:
+        return [dict(c) for c in ctx]
+
+    texts = [s.text for s in sentences]
+    scores = np.zeros(len(sentences), dtype=np.float64)
+    if _can_score(sparse):
+        scores += sparse.similarities(query, texts)
+    if _can_score(dense) and getattr(dense, "enabled", False) and dense_weight > 0:
+        scores = (1.0 - dense_weight) * scores + dense_weight * dense.similarities(
+            query, texts
+        )
+    for s, score in zip(sentences, scores.tolist()):
+        s.score = score
+
+    # Best first, earlier sentences win ties (leads of sections read well)
+    ranked = sorted(sentences, key=lambda s: (-s.score, s.entry, s.order))
+
+    kept = set()
+    covered = set()
+    used = 0
+    for s in ranked:
+        if s.entry not in covered:
+            covered.add(s.entry)
+            kept.add((s.entry, s.order))
+            used += s.n_tokens
+    for s in ranked:
+        if (s.entry, s.order) in kept or used + s.n_tokens > token_budget:
+            continue
+        kept.add((s.entry, s.order))
+        used += s.n_tokens
+
+    compressed: List[Dict[str, Any]] = []
+    for i, c in enumerate(ctx):
+        parts: List[str] = []
+        previous = -1
+        for s in sentences:
+            if s.entry != i or (i, s.order) not in kept:
+                continue
+            if parts:
+                parts.append(" " if s.order == previous + 1 else GAP_MARKER)
+            elif s.order > 0:
+                parts.append(GAP_MARKER.lstrip())
+            parts.append(s.text)
+            previous = s.order
+        compressed.append({**c, "text": "".join(parts) if parts else c.get("text", "")})
+
+    return compressed
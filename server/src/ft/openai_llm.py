@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator
 
 from dotenv import load_dotenv
 
@@ -9,6 +9,94 @@ from src.ft.formatting import build_prompt
 
 load_dotenv()
 
+SYSTEM_INSTRUCTION = (
+    "You are an evidence-based fitness and nutrition assistant. "
+    "You must only answer using the provided study excerpts, and "
+    "always include inline citations like [1], [2] that match the "
+    "studies in the context."
+)
+
+# Connection pool of the shared async client (one per process)
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+
+_async_client: Optional[Any] = None
+
+
+def _api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError(
+            "OPENAI_API_KEY is not set. Export it in your environment "
+            "or add it to your server/.env file."
+        )
+    return api_key
+
+
+def _request_input(
+    instruction: str, query: str, context_passages: List[Dict[str, Any]]
+) -> List[Dict[str, str]]:
+    prompt = build_prompt(instruction, query, context_passages)
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_INSTRUCTION,
+        },
+        {
+            "role": "user",
+            "content": prompt,
+        },
+    ]
+
+
+def _response_text(response: Any) -> str:
+    text_chunks: list[str] = []
+
+    for item in response.output[0].content:
+        if hasattr(item, "text"):
+            text_chunks.append(item.text)
+        else:
+            text_chunks.append(str(item))
+
+    text = "".join(text_chunks)
+    return (text or "").strip()
+
+
+def get_async_client() -> Any:
+    """
+    Process-wide AsyncOpenAI client
+
+    Created on first use and kept for the life of the process, so its
+    keep-alive connection pool is reused by every request
+    """
+    global _async_client
+    if _async_client is None:
+        try:
+            import httpx
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        except ImportError as e:
+            raise RuntimeError(
+                "OpenAI dependency is missing. Add 'openai' to requirements.txt."
+            ) from e
+
+        _async_client = AsyncOpenAI(
+            api_key=_api_key(),
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                )
+            ),
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
 
 class OpenAIDomainLLM:
     """
@@ -31,14 +119,7 @@ class OpenAIDomainLLM:
                 "OpenAI dependency is missing. Add 'openai' to requirements.txt."
             ) from e
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError(
-                "OPENAI_API_KEY is not set. Export it in your environment "
-                "or add it to your server/.env file."
-            )
-
-        self.client = OpenAI(api_key=api_key)
+        self.client = OpenAI(api_key=_api_key())
         self.model_name = model
         self.max_new_tokens = max_new_tokens
         self.temperature = temperature
@@ -52,42 +133,82 @@ class OpenAIDomainLLM:
         temperature: float | None = None,
         top_p: float | None = None,
     ) -> str:
-        prompt = build_prompt(instruction, query, context_passages)
+        temp = self.temperature if temperature is None else temperature
+        tp = self.top_p if top_p is None else top_p
 
-        system_instruction = (
-            "You are an evidence-based fitness and nutrition assistant. "
-            "You must only answer using the provided study excerpts, and "
-            "always include inline citations like [1], [2] that match the "
-            "studies in the context."
+        response = self.client.responses.create(
+            model=self.model_name,
+            max_output_tokens=self.max_new_tokens,
+            temperature=temp,
+            top_p=tp,
+            input=_request_input(instruction, query, context_passages),
         )
+        return _response_text(response)
+
+
+class AsyncOpenAIDomainLLM:
+    """
+    Async variant of OpenAIDomainLLM for the API
+
+    All instances share the process-wide AsyncOpenAI client (get_async_client),
+    so awaiting a generation holds no thread and reuses pooled connections
+    """
 
+    def __init__(
+        self,
+        model: str = "gpt-4.1-mini",
+        max_new_tokens: int = 256,
+        temperature: float = 0.0,
+        top_p: float = 1.0,
+    ) -> None:
+        self.client = get_async_client()
+        self.model_name = model
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+
+    async def generate_answer(
+        self,
+        instruction: str,
+        query: str,
+        context_passages: List[Dict[str, Any]],
+        temperature: float | None = None,
+        top_p: float | None = None,
+    ) -> str:
         temp = self.temperature if temperature is None else temperature
         tp = self.top_p if top_p is None else top_p
 
-        response = self.client.responses.create(
+        response = await self.client.responses.create(
             model=self.model_name,
             max_output_tokens=self.max_new_tokens,
             temperature=temp,
             top_p=tp,
-            input=[
-                {
-                    "role": "system",
-                    "content": system_instruction,
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
+            input=_request_input(instruction, query, context_passages),
         )
+        return _response_text(response)
 
-        text_chunks: list[str] = []
-
-        for item in response.output[0].content:
-            if hasattr(item, "text"):
-                text_chunks.append(item.text)
-            else:
-                text_chunks.append(str(item))
+    async def stream_answer(
+        self,
+        instruction: str,
+        query: str,
+        context_passages: List[Dict[str, Any]],
+        temperature: float | None = None,
+        top_p: float | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yield the answer text piece by piece as the model produces it
+        """
+        temp = self.temperature if temperature is None else temperature
+        tp = self.top_p if top_p is None else top_p
 
-        text = "".join(text_chunks)
-        return (text or "").strip()
+        stream = await self.client.responses.create(
+            model=self.model_name,
+            max_output_tokens=self.max_new_tokens,
+            temperature=temp,
+            top_p=tp,
+            input=_request_input(instruction, query, context_passages),
+            stream=True,
+        )
+        async for event in stream:
+            if event.type == "response.output_text.delta" and event.delta:
+                yield event.delta
@@ -0,0 +1,469 @@
+from __future__ import annotations
+
+import heapq
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+from .index_store import StaleIndexError
+
+# Bump when the saved layout changes
+ANN_FORMAT_VERSION = 1
+
+
+class AnnIndex(Protocol):
+    """
+    Approximate nearest neighbour index over L2-normalised embedding rows
+    Scores are inner products (= cosine similarity)
+    """
+
+    kind: str
+
+    def build(self, vectors: np.ndarray) -> None: ...
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (row indexes, scores) of the best top_k rows, best first
+        """
+        ...
+
+    def save(self, path: Path, fingerprint: str) -> None: ...
+
+
+def _top_k(
+    rows: np.ndarray, scores: np.ndarray, top_k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Best top_k of (rows, scores), ties broken by row index
+    """
+    if len(rows) > top_k:
+        keep = np.argpartition(-scores, top_k - 1)[:top_k]
+        rows, scores = rows[keep], scores[keep]
+    order = np.lexsort((rows, -scores))
+    return rows[order], scores[order]
+
+
+def _write_npz(path: Path, meta: Dict, arrays: Dict[str, np.ndarray]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {"version": ANN_FORMAT_VERSION, **meta}
+    with path.open("wb") as f:
+        np.savez(
+            f,
+            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            **arrays,
+        )
+
+
+def _read_npz(
+    path: Path, kind: str, vectors: np.ndarray, fingerprint: Optional[str]
+) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    with np.load(path) as data:
+        meta = json.loads(bytes(data["meta"]).decode("utf-8"))
+        arrays = {k: data[k] for k in data.files if k != "meta"}
+
+    if meta.get("kind") != kind or meta.get("version") != ANN_FORMAT_VERSION:
+        raise StaleIndexError(f"{path} is not a v{ANN_FORMAT_VERSION} {kind} index")
+    if meta.get("n") != len(vectors) or meta.get("dim") != vectors.shape[1]:
+        raise StaleIndexError(f"{path} was built for a different embedding matrix")
+    if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+        raise StaleIndexError(f"{path} was built for other passages; rebuild it")
+    return meta, arrays
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 20,
+    seed: int = 0,
+    max_train: int = 100_000,
+) -> np.ndarray:
+    """
+    k-means on the unit sphere (cosine), returns (n_clusters, dim) unit centroids
+
+    Trains on a random sample of at most max_train rows
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = vectors
+    if n > max_train:
+        sample = vectors[np.sort(rng.choice(n, size=max_train, replace=False))]
+    sample = np.asarray(sample, dtype=np.float32)
+
+    centroids = sample[rng.choice(len(sample), size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=n_clusters)
+
+        # Re-seed empty clusters with random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = sample[rng.choice(len(sample), size=len(empty))]
+
+        centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-8)
+
+    return centroids.astype(np.float32)
+
+
+class IvfFlatIndex:
+    """
+    Inverted-file index: rows are bucketed under their closest k-means centroid,
+    a query scans only the nprobe buckets whose centroids score highest
+
+    nprobe trades recall for speed (nprobe = nlist is exact search)
+    """
+
+    kind = "ivf"
+
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        n_iter: int = 20,
+        seed: int = 0,
+    ) -> None:
+        self.nlist = nlist  # default: ~sqrt(n) lists, picked at build time
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+
+        self.vectors: np.ndarray | None = None
+        self.centroids: np.ndarray | None = None  # (nlist, dim)
+        self.list_indptr: np.ndarray | None = None  # (nlist + 1,) into list_rows
+        self.list_rows: np.ndarray | None = None  # (n,) row ids grouped by list
+
+    @property
+    def is_built(self) -> bool:
+        return self.centroids is not None
+
+    def build(self, vectors: np.ndarray) -> None:
+        n = len(vectors)
+        if n == 0:
+            raise ValueError("Cannot build an IVF index over zero vectors")
+        nlist = self.nlist or max(1, int(round(np.sqrt(n))))
+        nlist = min(nlist, n)
+
+        self.vectors = vectors
+        self.centroids = spherical_kmeans(
+            vectors, nlist, n_iter=self.n_iter, seed=self.seed
+        )
+
+        # Assign every row in batches to keep the (batch x nlist) score matrix small
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 65_536):
+            block = np.asarray(vectors[start : start + 65_536], dtype=np.float32)
+            assign[start : start + len(block)] = np.argmax(
+                block @ self.centroids.T, axis=1
+            )
+
+        self.list_rows = np.argsort(assign, kind="stable").astype(np.int64)
+        self.list_indptr = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=self.list_indptr[1:])
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.centroids is None or self.vectors is None:
+            raise ValueError("No IVF index built, call .build() first")
+
+        nlist = len(self.centroids)
+        nprobe = max(1, min(self.nprobe, nlist))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        rows = np.concatenate(
+            [
+                self.list_rows[self.list_indptr[c] : self.list_indptr[c + 1]]
+                for c in probe
+            ]
+        )
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        rows = np.sort(rows)  # sequential reads from (possibly memory-mapped) vectors
+        scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+        return _top_k(rows, scores, top_k)
+
+    def save(self, path: Path, fingerprint: str) -> None:
+        if self.centroids is None or self.vectors is None:
+            raise ValueError("No IVF index built, call .build() first")
+        _write_npz(
+            Path(path),
+            {
+                "kind": self.kind,
+                "n": int(len(self.vectors)),
+                "dim": int(self.vectors.shape[1]),
+                "fingerprint": fingerprint,
+                "nlist": int(len(self.centroids)),
+            },
+            {
+                "centroids": self.centroids,
+                "list_indptr": self.list_indptr,
+                "list_rows": self.list_rows,
+            },
+        )
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        vectors: np.ndarray,
+        fingerprint: Optional[str] = None,
+        nprobe: int = 8,
+    ) -> "IvfFlatIndex":
+        meta, arrays = _read_npz(Path(path), cls.kind, vectors, fingerprint)
+        index = cls(nlist=meta["nlist"], nprobe=nprobe)
+        index.vectors = vectors
+        index.centroids = arrays["centroids"]
+        index.list_indptr = arrays["list_indptr"]
+        index.list_rows = arrays["list_rows"]
+        return index
+
+
+class HnswIndex:
+    """
+    Hierarchical navigable small world graph (Malkov & Yashunin)
+
+    Every row is a node with links to up to M similar rows per layer (2M on layer 0);
+    a query greedily descends the sparse upper layers, then runs a beam search
+    of width ef_search on layer 0. Larger ef_search = better recall, slower queries
+    """
+
+    kind = "hnsw"
+
+    def __init__(
+        self,
+        M: int = 16,
+        ef_construction: int = 100,
+        ef_search: int = 64,
+        seed: int = 0,
+    ) -> None:
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.seed = seed
+
+        self.vectors: np.ndarray | None = None
+        self.entry_point: int = -1
+        self.max_level: int = -1
+        # layers[l] maps node -> neighbour array (layer 0 holds every node)
+        self.layers: List[Dict[int, np.ndarray]] = []
+
+    @property
+    def is_built(self) -> bool:
+        return self.entry_point >= 0
+
+    def _max_links(self, layer: int) -> int:
+        return 2 * self.M if layer == 0 else self.M
+
+    def _search_layer(
+        self, query: np.ndarray, entry_points: List[int], ef: int, layer: int
+    ) -> List[Tuple[float, int]]:
+        """
+        Beam search on one layer, returns up to ef (score, node) pairs, best first
+        """
+        links = self.layers[layer]
+        entry_scores = np.asarray(self.vectors[entry_points], dtype=np.float32) @ query
+
+        visited = set(entry_points)
+        candidates = [(-float(s), n) for s, n in zip(entry_scores, entry_points)]
+        heapq.heapify(candidates)
+        best = [(float(s), n) for s, n in zip(entry_scores, entry_points)]
+        heapq.heapify(best)
+        while len(best) > ef:
+            heapq.heappop(best)
+
+        while candidates:
+            neg_score, node = heapq.heappop(candidates)
+            if len(best) >= ef and -neg_score < best[0][0]:
+                break  # closest candidate is worse than everything we keep
+
+            fresh = [n for n in links.get(node, ()) if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            scores = np.asarray(self.vectors[fresh], dtype=np.float32) @ query
+
+            for n, s in zip(fresh, scores.tolist()):
+                if len(best) < ef or s > best[0][0]:
+                    heapq.heappush(candidates, (-s, n))
+                    heapq.heappush(best, (s, n))
+                    if len(best) > ef:
+                        heapq.heappop(best)
+
+        return sorted(best, reverse=True)
+
+    def _select_neighbours(
+        self, base: np.ndarray, candidates: np.ndarray, max_links: int
+    ) -> np.ndarray:
+        """
+        Pick up to max_links links for base among candidates (paper's heuristic)
+
+        A candidate is kept only if it is closer to base than to every link kept
+        so far, which spreads links across directions and keeps clusters connected;
+        the remaining slots are then filled with the closest skipped candidates
+        """
+        if len(candidates) <= max_links:
+            return candidates
+        vecs = np.asarray(self.vectors[candidates], dtype=np.float32)
+        scores = vecs @ base
+        order = np.argsort(-scores, kind="stable")
+        candidates, vecs, scores = candidates[order], vecs[order], scores[order]
+        pair = vecs @ vecs.T
+
+        kept: List[int] = []
+        skipped: List[int] = []
+        for i in range(len(candidates)):
+            if len(kept) == max_links:
+                break
+            if not kept or scores[i] > pair[i, kept].max():
+                kept.append(i)
+            else:
+                skipped.append(i)
+        kept.extend(skipped[: max_links - len(kept)])
+        return candidates[np.sort(np.asarray(kept))]
+
+    def build(self, vectors: np.ndarray) -> None:
+        n = len(vectors)
+        if n == 0:
+            raise ValueError("Cannot build an HNSW index over zero vectors")
+
+        self.vectors = vectors
+        rng = np.random.default_rng(self.seed)
+        level_mult = 1.0 / np.log(max(self.M, 2))
+        levels = np.floor(-np.log(rng.random(n) + 1e-12) * level_mult).astype(int)
+
+        self.layers = [{} for _ in range(int(levels.max()) + 1)]
+        self.entry_point, self.max_level = 0, int(levels[0])
+        for layer in range(self.max_level + 1):
+            self.layers[layer][0] = np.empty(0, dtype=np.int64)
+
+        for node in range(1, n):
+            self._insert(node, int(levels[node]))
+
+    def _insert(self, node: int, level: int) -> None:
+        query = np.asarray(self.vectors[node], dtype=np.float32)
+        entry = [self.entry_point]
+
+        # Greedy descent through layers above the node's own top layer
+        for layer in range(self.max_level, level, -1):
+            entry = [self._search_layer(query, entry, 1, layer)[0][1]]
+
+        for layer in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(query, entry, self.ef_construction, layer)
+            max_links = self._max_links(layer)
+            neighbours = self._select_neighbours(
+                query, np.asarray([n for _s, n in found], dtype=np.int64), self.M
+            )
+            self.layers[layer][node] = neighbours
+
+            # Link back, trimming neighbours that now have too many links
+            for other in neighbours.tolist():
+                linked = np.append(self.layers[layer][other], node)
+                if len(linked) > max_links:
+                    base = np.asarray(self.vectors[other], dtype=np.float32)
+                    linked = self._select_neighbours(base, linked, max_links)
+                self.layers[layer][other] = linked
+
+            entry = [n for _s, n in found]
+
+        for layer in range(self.max_level + 1, level + 1):
+            self.layers[layer][node] = np.empty(0, dtype=np.int64)
+        if level > self.max_level:
+            self.entry_point, self.max_level = node, level
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.is_built or self.vectors is None:
+            raise ValueError("No HNSW index built, call .build() first")
+
+        query = np.asarray(query, dtype=np.float32)
+        entry = [self.entry_point]
+        for layer in range(self.max_level, 0, -1):
+            entry = [self._search_layer(query, entry, 1, layer)[0][1]]
+
+        found = self._search_layer(query, entry, max(self.ef_search, top_k), 0)
+        rows = np.asarray([n for _s, n in found], dtype=np.int64)
+        scores = np.asarray([s for s, _n in found], dtype=np.float32)
+        return _top_k(rows, scores, top_k)
+
+    def save(self, path: Path, fingerprint: str) -> None:
+        if not self.is_built or self.vectors is None:
+            raise ValueError("No HNSW index built, call .build() first")
+
+        arrays: Dict[str, np.ndarray] = {}
+        for layer, links in enumerate(self.layers):
+            nodes = np.asarray(sorted(links), dtype=np.int64)
+            width = self._max_links(layer)
+            table = np.full((len(nodes), width), -1, dtype=np.int64)
+            for row, node in enumerate(nodes.tolist()):
+                nbrs = links[node]
+                table[row, : len(nbrs)] = nbrs
+            arrays[f"layer{layer}_nodes"] = nodes
+            arrays[f"layer{layer}_links"] = table
+
+        _write_npz(
+            Path(path),
+            {
+                "kind": self.kind,
+                "n": int(len(self.vectors)),
+                "dim": int(self.vectors.shape[1]),
+                "fingerprint": fingerprint,
+                "M": self.M,
+                "ef_construction": self.ef_construction,
+                "entry_point": self.entry_point,
+                "max_level": self.max_level,
+            },
+            arrays,
+        )
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        vectors: np.ndarray,
+        fingerprint: Optional[str] = None,
+        ef_search: int = 64,
+    ) -> "HnswIndex":
+        meta, arrays = _read_npz(Path(path), cls.kind, vectors, fingerprint)
+        index = cls(
+            M=meta["M"], ef_construction=meta["ef_construction"], ef_search=ef_search
+        )
+        index.vectors = vectors
+        index.entry_point = meta["entry_point"]
+        index.max_level = meta["max_level"]
+        index.layers = []
+        for layer in range(index.max_level + 1):
+            nodes = arrays[f"layer{layer}_nodes"].tolist()
+            table = arrays[f"layer{layer}_links"]
+            index.layers.append(
+                {node: row[row >= 0] for node, row in zip(nodes, table)}
+            )
+        return index
+
+
+def load_ann_index(
+    path: Path, vectors: np.ndarray, fingerprint: Optional[str] = None
+) -> IvfFlatIndex | HnswIndex:
+    """
+    Load whichever ANN index kind is stored at path
+    """
+    with np.load(path) as data:
+        kind = json.loads(bytes(data["meta"]).decode("utf-8")).get("kind")
+    if kind == IvfFlatIndex.kind:
+        return IvfFlatIndex.load(path, vectors, fingerprint)
+    if kind == HnswIndex.kind:
+        return HnswIndex.load(path, vectors, fingerprint)
+    raise StaleIndexError(f"{path} holds an unknown ANN index kind {kind!r}")
+
+
+def make_ann_index(kind: str) -> IvfFlatIndex | HnswIndex:
+    """
+    Unbuilt ANN index of the given kind ("ivf" / "hnsw") with default settings
+    """
+    if kind == IvfFlatIndex.kind:
+        return IvfFlatIndex()
+    if kind == HnswIndex.kind:
+        return HnswIndex()
+    raise ValueError(f"ANN kind must be 'ivf' or 'hnsw', got {kind!r}")
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.text_utils import tokenize
+from src.core.models import Passage, Study
+from .sparse import CsrMatrix, flatten_counts
+from .filters import FilterIndex, Filters, resolve_filters
+from .postings import PostingLists, top_k_maxscore
+
+
+def bm25_similarities(
+    query: str,
+    texts: List[str],
+    idf: Callable[[List[str]], Dict[str, float]],
+    k1: float = 1.2,
+    b: float = 0.75,
+) -> np.ndarray:
+    """
+    BM25 score of each text against the query, with term IDF from idf(tokens)
+    (tokens it leaves out score 0) and lengths normalised by the texts' own
+    average, so texts don't have to be indexed passages (e.g. single sentences)
+    """
+    out = np.zeros(len(texts), dtype=np.float64)
+    query_counts = Counter(tokenize(query))
+    if not query_counts or not texts:
+        return out
+    weights = idf(list(query_counts))
+    if not weights:
+        return out
+
+    text_counts = [Counter(tokenize(t)) for t in texts]
+    lengths = np.array([sum(c.values()) for c in text_counts], dtype=np.float64)
+    norms = k1 * (1.0 - b + b * lengths / max(float(lengths.mean()), 1e-8))
+    for i, counts in enumerate(text_counts):
+        for token, count in query_counts.items():
+            tf = counts.get(token, 0)
+            if tf and token in weights:
+                out[i] += count * weights[token] * tf * (k1 + 1.0) / (tf + norms[i])
+    return out
+
+
+class Bm25Index:
+    """
+    Okapi BM25 over Passage objects, a drop-in alternative to TfIdfIndex
+
+    score(q, d) = sum over query tokens of
+        idf(t) * tf(t, d) * (k1 + 1) / (tf(t, d) + k1 * (1 - b + b * len(d) / avg_len))
+
+    Per-term IDF and per-passage length normalisers are stored as arrays, and the
+    full per-(passage, token) impact is precomputed into the same CSR matrix and
+    weight-sorted posting lists that TfIdfIndex searches
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+
+        self.passages: List[Passage] = []
+        self.vocab: Dict[str, int] = {}  # token -> index map
+        self.doc_token_counts: List[Counter[str]] = []  # staged until build()
+        self.idf: np.ndarray | None = None  # (vocab,) IDF weight per token
+        self.doc_norms: np.ndarray | None = None  # (passages,) k1 * length factor
+        self.passage_vectors: CsrMatrix | None = None  # BM25 impact per token
+        self.postings: PostingLists | None = None  # token -> passages lists
+        self.filter_index: FilterIndex | None = None  # resolves SearchFilters
+
+    @property
+    def is_built(self) -> bool:
+        return self.postings is not None
+
+    def _passage_counts(self, passage: Passage) -> Counter[str]:
+        return Counter(tokenize(passage.text))
+
+    def _add_to_vocab(self, counts: Counter[str]) -> None:
+        for token in counts.keys():
+            if token not in self.vocab:
+                self.vocab[token] = len(self.vocab)
+
+    def add_passages(
+        self, passages: List[Passage], studies: Optional[List[Study]] = None
+    ) -> None:
+        self.passages.extend(passages)
+        self.filter_index = FilterIndex(self.passages, studies)
+        self._stage(passages)
+
+    def _stage(self, passages: List[Passage]) -> None:
+        for p in passages:
+            counts = self._passage_counts(p)
+            self.doc_token_counts.append(counts)
+            self._add_to_vocab(counts)
+
+    def _restage(self) -> None:
+        # Passages added after an earlier build: re-stage the already indexed ones
+        missing = len(self.passages) - len(self.doc_token_counts)
+        if missing > 0:
+            self.doc_token_counts = [
+                self._passage_counts(p) for p in self.passages[:missing]
+            ] + self.doc_token_counts
+
+    def _idf(self, df: np.ndarray, n_passages: int) -> np.ndarray:
+        # Lucene-style BM25 IDF, always positive
+        return np.log(1.0 + (n_passages - df + 0.5) / (df + 0.5))
+
+    def _term_frequencies(
+        self, n_passages: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (rows, cols, tf) for every stored (passage, token) pair, plus the
+        per-passage term frequency normaliser used in the BM25 saturation
+        """
+        rows, cols, counts = flatten_counts(self.doc_token_counts, self.vocab)
+        lengths = np.bincount(rows, weights=counts, minlength=n_passages)
+        avg_len = float(lengths.mean()) if n_passages else 0.0
+        doc_norms = self.k1 * (1.0 - self.b + self.b * lengths / max(avg_len, 1e-8))
+        return rows, cols, counts, doc_norms
+
+    def build(self) -> None:
+        """
+        Compute IDF, length normalisers and BM25 impacts for all passages
+        """
+        self._restage()
+
+        n_passages = len(self.doc_token_counts)
+        vocab_size = len(self.vocab)
+        if n_passages == 0 or vocab_size == 0:
+            raise ValueError(
+                "No documents or empty vocabulary, .add_passages(passages) first"
+            )
+
+        rows, cols, tf, doc_norms = self._term_frequencies(n_passages)
+
+        df = np.bincount(cols, minlength=vocab_size).astype(np.float64)
+        self.idf = self._idf(df, n_passages)
+        self.doc_norms = doc_norms.astype(np.float32)
+
+        impacts = self.idf[cols] * tf * (self.k1 + 1.0) / (tf + doc_norms[rows])
+
+        self.passage_vectors = CsrMatrix.from_coo(
+            rows, cols, impacts, shape=(n_passages, vocab_size)
+        )
+        self.postings = PostingLists.from_csr(self.passage_vectors)
+
+        # Raw counts are no longer needed once the impacts exist
+        self.doc_token_counts = []
+
+    def _idf_of(self, tokens: List[str]) -> Dict[str, float]:
+        if self.idf is None:
+            raise ValueError("No index built, call .build() first")
+        return {t: float(self.idf[self.vocab[t]]) for t in tokens if t in self.vocab}
+
+    def similarities(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        BM25 score of the query against each text, using this index's IDF
+        (texts don't have to be indexed passages, e.g. single sentences)
+        """
+        return bm25_similarities(query, texts, self._idf_of, k1=self.k1, b=self.b)
+
+    def search(
+        self, query: str, top_k: int = 10, filters: Optional[Filters] = None
+    ) -> List[Tuple[Passage, float]]:
+        """
+        Return top_k (passage, score) pairs for the query search, restricted
+        to the passages allowed by filters
+        """
+        if self.passage_vectors is None or self.postings is None:
+            raise ValueError("No index built, call .build() first")
+        allowed = resolve_filters(filters, self.filter_index, len(self.passages))
+
+        query_counts = Counter(tokenize(query))
+        term_ids = [self.vocab[t] for t in query_counts if t in self.vocab]
+        if not term_ids:
+            return []
+
+        # Repeated query tokens count once per occurrence
+        query_weights = [
+            float(count) for t, count in query_counts.items() if t in self.vocab
+        ]
+
+        top_index, scores = top_k_maxscore(
+            self.postings,
+            self.passage_vectors,
+            np.asarray(term_ids),
+            np.asarray(query_weights),
+            top_k,
+            allowed=allowed,
+        )
+
+        return [
+            (self.passages[i], float(score))
+            for i, score in zip(top_index, scores)
+            if score > 0
+        ]
+
+
+# Default BM25F field weights: body text dominates, metadata fields nudge
+DEFAULT_FIELD_WEIGHTS: Dict[str, float] = {
+    "text": 1.0,
+    "title": 2.0,
+    "tags": 1.5,
+    "section": 0.5,
+}
+
+# Length normalisation per field, short metadata fields are barely normalised
+DEFAULT_FIELD_B: Dict[str, float] = {
+    "text": 0.75,
+    "title": 0.3,
+    "tags": 0.0,
+    "section": 0.0,
+}
+
+
+class Bm25FIndex(Bm25Index):
+    """
+    BM25F: BM25 over several weighted fields per passage
+
+    Fields are the passage text, the study title, the study tags and the section name
+    Each field's term frequency is length-normalised on its own and weighted,
+    then the combined pseudo-frequency goes through a single BM25 saturation
+
+        tf~(t, d) = sum_f w_f * tf_f(t, d) / (1 - b_f + b_f * len_f(d) / avg_len_f)
+        score = sum over query tokens of idf(t) * tf~ * (k1 + 1) / (tf~ + k1)
+    """
+
+    FIELDS = ("text", "title", "tags", "section")
+
+    def __init__(
+        self,
+        studies: List[Study],
+        k1: float = 1.2,
+        field_weights: Optional[Dict[str, float]] = None,
+        field_b: Optional[Dict[str, float]] = None,
+    ) -> None:
+        super().__init__(k1=k1, b=0.0)
+        self.study_lookup: Dict[int, Study] = {s.id: s for s in studies}
+        self.field_weights = {**DEFAULT_FIELD_WEIGHTS, **(field_weights or {})}
+        self.field_b = {**DEFAULT_FIELD_B, **(field_b or {})}
+
+        # Per field staged counts, aligned with self.passages
+        self.field_token_counts: Dict[str, List[Counter[str]]] = {
+            f: [] for f in self.FIELDS
+        }
+        # Title / tag counts are per study, shared by all of its passages
+        self._study_field_cache: Dict[Tuple[int, str], Counter[str]] = {}
+
+    def _study_field(self, study_id: int, field: str) -> Counter[str]:
+        key = (study_id, field)
+        if key not in self._study_field_cache:
+            study = self.study_lookup.get(study_id)
+            if study is None:
+                text = ""
+            elif field == "title":
+                text = study.title
+            else:
+                text = " ".join(t.replace("_", " ") for t in study.tags)
+            self._study_field_cache[key] = Counter(tokenize(text))
+        return self._study_field_cache[key]
+
+    def _fields_for(self, passage: Passage) -> Dict[str, Counter[str]]:
+        return {
+            "text": Counter(tokenize(passage.text)),
+            "title": self._study_field(passage.study_id, "title"),
+            "tags": self._study_field(passage.study_id, "tags"),
+            "section": Counter(tokenize(passage.section.replace("_", " "))),
+        }
+
+    def add_passages(
+        self, passages: List[Passage], studies: Optional[List[Study]] = None
+    ) -> None:
+        # The studies given to the constructor serve the filters by default
+        if studies is None:
+            studies = list(self.study_lookup.values())
+        super().add_passages(passages, studies)
+
+    def _stage(self, passages: List[Passage]) -> None:
+        for p in passages:
+            for field, counts in self._fields_for(p).items():
+                self.field_token_counts[field].append(counts)
+                self._add_to_vocab(counts)
+
+    def _restage(self) -> None:
+        missing = len(self.passages) - len(self.field_token_counts["text"])
+        if missing > 0:
+            staged = [self._fields_for(p) for p in self.passages[:missing]]
+            for field in self.FIELDS:
+                self.field_token_counts[field] = [
+                    fields[field] for fields in staged
+                ] + self.field_token_counts[field]
+
+        # build() checks the passage count through doc_token_counts
+        self.doc_token_counts = self.field_token_counts["text"]
+
+    def _term_frequencies(
+        self, n_passages: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        vocab_size = len(self.vocab)
+        keys: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+
+        for field in self.FIELDS:
+            weight = self.field_weights.get(field, 0.0)
+            if weight <= 0.0:
+                continue
+
+            rows, cols, counts = flatten_counts(
+                self.field_token_counts[field], self.vocab
+            )
+            lengths = np.bincount(rows, weights=counts, minlength=n_passages)
+            avg_len = max(float(lengths.mean()), 1e-8)
+            b = self.field_b.get(field, 0.0)
+            field_norm = 1.0 - b + b * lengths / avg_len
+
+            keys.append(rows * vocab_size + cols)
+            values.append(weight * counts / field_norm[rows])
+
+        # Sum each (passage, token) pseudo-frequency across fields
+        all_keys = np.concatenate(keys)
+        pair_keys, inverse = np.unique(all_keys, return_inverse=True)
+        tf = np.bincount(inverse, weights=np.concatenate(values))
+
+        rows = pair_keys // vocab_size
+        cols = pair_keys % vocab_size
+        # Length normalisation already happened per field
+        doc_norms = np.full(n_passages, self.k1, dtype=np.float64)
+        return rows, cols, tf, doc_norms
+
+    def build(self) -> None:
+        super().build()
+        self.field_token_counts = {f: [] for f in self.FIELDS}
+        self._study_field_cache = {}
+
+    def similarities(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        BM25 score of the query against each text, scored as body text
+        (the text field's length normalisation, no field weights)
+        """
+        return bm25_similarities(
+            query, texts, self._idf_of, k1=self.k1, b=self.field_b["text"]
+        )
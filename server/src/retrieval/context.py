@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from src.core.models import Passage
+from .filters import Filters
+from .retriever import Retriever
+
+
+@dataclass
+class RetrievalContext:
+    """
+    One retrieval pass for a request, shared by everything that handles it
+    (answer composition, confidence, LLM context, logging) so the query is
+    searched - and, for dense retrieval, encoded - only once
+
+    results are as returned by the retriever; ranked is the post-processed
+    order callers may add (e.g. recency rerank), defaulting to results.
+    degraded is set when a hybrid search had to drop a leg that timed out
+    """
+
+    query: str
+    top_k: int
+    results: List[Tuple[Passage, float]]
+    ranked: Optional[List[Tuple[Passage, float]]] = None
+    confidence: Tuple[int, str] = (0, "low")
+    degraded: bool = False
+
+    def __post_init__(self) -> None:
+        if self.ranked is None:
+            self.ranked = self.results
+
+    @classmethod
+    def search(
+        cls,
+        retriever: Retriever,
+        query: str,
+        top_k: int = 10,
+        filters: Optional[Filters] = None,
+    ) -> "RetrievalContext":
+        search_detailed = getattr(retriever, "search_detailed", None)
+        if search_detailed is None:
+            return cls(
+                query=query,
+                top_k=top_k,
+                results=retriever.search(query, top_k, filters),
+            )
+        found = search_detailed(query, top_k, filters)
+        return cls(
+            query=query, top_k=top_k, results=found.results, degraded=found.degraded
+        )
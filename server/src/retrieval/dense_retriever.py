@@ -1,11 +1,26 @@
 from __future__ import annotations
 
-from typing import List, Tuple, Optional
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 
-from src.core.models import Passage
+from src.core.corpus_pack import passage_texts
+from src.core.models import Passage, Study
 from .retriever import Retriever
+from .embedding_cache import EmbeddingCache, QueryEmbeddingCache, text_key
+from .encode_batcher import QueryEncodeBatcher
+from .filters import FilterIndex, Filters, resolve_filters
+from .ann import AnnIndex, load_ann_index
+from .index_store import StaleIndexError
+from .quantization import (
+    DEFAULT_OVERSAMPLE,
+    STORAGE_MODES,
+    QuantizedVectors,
+    rescore,
+)
 
 try:
     from sentence_transformers import SentenceTransformer  # type: ignore
@@ -13,55 +28,283 @@ except Exception:
     SentenceTransformer = None
 
 
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
 class DenseRetriever(Retriever):
     """
     Dense (embedding-based) retriever over passages.
     If sentence-transformers isn't installed, this retriever disables itself (returns []).
+
+    With cache_dir set, passage embeddings are stored on disk keyed by the
+    passage text hash, so only new or changed passages are encoded
+
+    With an `ann` index (IvfFlatIndex / HnswIndex) search is approximate once the
+    corpus reaches ann_min_passages; smaller corpora keep the exact scan.
+    ann_path, if set, is where the built index is saved and reloaded from
+
+    storage="float16" | "int8" | "binary" scans a compressed in-memory copy of the
+    embeddings to pick top_k * oversample candidates, then rescores those exactly
+    against the full-precision vectors (memory-mapped from the cache when set)
+
+    Query embeddings are memoised in query_cache (an in-memory LRU of
+    query_cache_size entries unless a shared / persistent one is passed).
+    query_batch_size > 1 micro-batches concurrent query encodes (up to that
+    many, waiting at most query_batch_wait_ms) into one model call
+
+    search(filters=...) scores only the allowed rows. With an ANN index a
+    small allowed set is scanned exactly; a large one over-fetches from the
+    index and falls back to the exact scan if too few results survive
     """
 
     def __init__(
-        self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        cache_dir: Optional[Path] = None,
+        ann: Optional[AnnIndex] = None,
+        ann_path: Optional[Path] = None,
+        ann_min_passages: int = 5000,
+        storage: str = "float32",
+        oversample: Optional[int] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+        query_cache_size: int = 1024,
+        query_batch_size: int = 0,
+        query_batch_wait_ms: float = 2.0,
     ) -> None:
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"storage must be one of {STORAGE_MODES}, got {storage!r}")
+        if query_cache is not None and query_cache.model_name != model_name:
+            raise ValueError(
+                f"query_cache is for {query_cache.model_name!r}, not {model_name!r}"
+            )
+
+        self.model_name = model_name
         self.model: Optional[object] = None
         if SentenceTransformer is not None:
             self.model = SentenceTransformer(model_name)
 
-        self.passages: List[Passage] = []
-        self.embeddings: np.ndarray | None = None
+        self.cache: Optional[EmbeddingCache] = (
+            EmbeddingCache(cache_dir, model_name) if cache_dir is not None else None
+        )
+
+        self.ann = ann
+        self.ann_path = ann_path
+        self.ann_min_passages = ann_min_passages
+        self.ann_ready = False
+
+        self.storage = storage
+        self.oversample = oversample or DEFAULT_OVERSAMPLE.get(storage, 1)
+        self.quantized: QuantizedVectors | None = None
+
+        self.passages: Sequence[Passage] = []
+        self.embeddings: np.ndarray | None = None  # full precision
+        self.filter_index: FilterIndex | None = None  # resolves SearchFilters
+
+        if query_cache is None and query_cache_size > 0:
+            query_cache = QueryEmbeddingCache(model_name, max_entries=query_cache_size)
+        self.query_cache = query_cache
+
+        self.batcher: Optional[QueryEncodeBatcher] = None
+        if self.enabled and query_batch_size > 1:
+            self.batcher = QueryEncodeBatcher(
+                self._encode_passages,
+                max_batch=query_batch_size,
+                max_wait_ms=query_batch_wait_ms,
+            )
 
     @property
     def enabled(self) -> bool:
         return self.model is not None
 
-    def add_passages(self, passages: List[Passage]) -> None:
-        self.passages = list(passages)
+    def add_passages(
+        self, passages: Sequence[Passage], studies: Optional[Sequence[Study]] = None
+    ) -> None:
+        self.passages = passages  # not copied, a PackedPassages stays lazy
+        self.filter_index = FilterIndex(passages, studies)
+        self.ann_ready = False
+        self.quantized = None
 
         if not self.enabled:
             self.embeddings = None
             return
 
-        texts = [p.text for p in self.passages]
+        texts = passage_texts(self.passages)
         if not texts:
             self.embeddings = None
             return
 
+        if self.cache is not None:
+            self.embeddings = self.cache.get_or_encode(texts, self._encode_passages)
+        else:
+            self.embeddings = self._encode_passages(texts)
+
+        if self.storage != "float32":
+            self.quantized = QuantizedVectors.from_vectors(
+                self.embeddings, self.storage
+            )
+
+        self._prepare_ann()
+
+    def fingerprint(self) -> str:
+        """
+        Identifies (model, passage texts in order), stored with saved ANN indexes
+        """
+        h = hashlib.sha256(self.model_name.encode("utf-8"))
+        for text in passage_texts(self.passages):
+            h.update(text_key(text).encode("ascii"))
+        return h.hexdigest()
+
+    def _prepare_ann(self) -> None:
+        if self.ann is None or self.embeddings is None:
+            return
+        if len(self.passages) < self.ann_min_passages:
+            return  # exact search is cheap enough
+
+        fingerprint = self.fingerprint()
+        if self.ann_path is not None and Path(self.ann_path).exists():
+            try:
+                loaded = load_ann_index(self.ann_path, self.embeddings, fingerprint)
+            except (StaleIndexError, OSError, KeyError) as e:
+                print(f"Rebuilding ANN index at {self.ann_path}: {e}")
+            else:
+                if loaded.kind == self.ann.kind:
+                    # Keep the configured query-time knobs
+                    for knob in ("nprobe", "ef_search"):
+                        if hasattr(self.ann, knob):
+                            setattr(loaded, knob, getattr(self.ann, knob))
+                    self.ann = loaded
+                    self.ann_ready = True
+                    return
+
+        self.ann.build(self.embeddings)
+        self.ann_ready = True
+        if self.ann_path is not None:
+            try:
+                self.ann.save(self.ann_path, fingerprint)
+            except OSError as e:
+                print(f"Could not save ANN index to {self.ann_path}: {e}")
+
+    def _encode_passages(self, texts: List[str]) -> np.ndarray:
         emb = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
         norms = np.linalg.norm(emb, axis=1, keepdims=True) + 1e-8
-        self.embeddings = emb / norms
-
-    def search(self, query: str, top_k: int = 10) -> List[Tuple[Passage, float]]:
-        if (not self.enabled) or (not self.passages) or (self.embeddings is None):
-            return []
+        return emb / norms
 
+    def _encode_query(self, query: str) -> np.ndarray:
+        if self.batcher is not None:
+            return self.batcher.encode(query)
         q_emb = self.model.encode([query], convert_to_numpy=True)[0]
-        q_emb = q_emb / (np.linalg.norm(q_emb) + 1e-8)
+        return q_emb / (np.linalg.norm(q_emb) + 1e-8)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Unit-normalised query embedding (read-only when served from query_cache)
+        """
+        if self.query_cache is None:
+            return self._encode_query(query)
+        return self.query_cache.get_or_encode(query, self._encode_query)
+
+    async def encode_query_async(self, query: str) -> np.ndarray:
+        """
+        encode_query for the event loop: awaits the batcher instead of blocking
+        """
+        if self.query_cache is not None:
+            cached = self.query_cache.get(query)
+            if cached is not None:
+                return cached
+        if self.batcher is not None:
+            q_emb = await self.batcher.encode_async(query)
+        else:
+            q_emb = await asyncio.to_thread(self._encode_query, query)
+        if self.query_cache is not None:
+            q_emb = self.query_cache.put(query, q_emb)
+        return q_emb
+
+    def close(self) -> None:
+        """
+        Stop the query batcher's worker; a fresh batcher serves later encodes
+        """
+        if self.batcher is not None:
+            old = self.batcher
+            self.batcher = QueryEncodeBatcher(
+                old.encode_batch,
+                max_batch=old.max_batch,
+                max_wait_ms=old.max_wait * 1000.0,
+            )
+            old.close()
 
-        scores = np.dot(self.embeddings, q_emb)
+    def similarities(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        Cosine similarity between the query and each text (encodes the texts)
+        """
+        if not self.enabled or not texts:
+            return np.zeros(len(texts), dtype=np.float64)
+        emb = self._encode_passages([query] + list(texts))
+        return (emb[1:] @ emb[0]).astype(np.float64)
 
-        top_k = min(top_k, len(self.passages))
+    def search(
+        self, query: str, top_k: int = 10, filters: Optional[Filters] = None
+    ) -> List[Tuple[Passage, float]]:
+        if (not self.enabled) or (not self.passages) or (self.embeddings is None):
+            return []
+        allowed = resolve_filters(filters, self.filter_index, len(self.passages))
+        allowed_rows = None if allowed is None else np.flatnonzero(allowed)
+
+        top_k = min(
+            top_k, len(self.passages) if allowed_rows is None else len(allowed_rows)
+        )
         if top_k <= 0:
             return []
+
+        q_emb = self.encode_query(query)
+
+        if self.ann_ready:
+            found = self._ann_search(q_emb, top_k, allowed, allowed_rows)
+            if found is not None:
+                return found
+
+        if self.quantized is not None:
+            candidates = self.quantized.candidates(
+                q_emb, top_k * self.oversample, rows=allowed_rows
+            )
+            rows, exact = rescore(self.embeddings, q_emb, candidates, top_k)
+            return [(self.passages[i], float(s)) for i, s in zip(rows, exact)]
+
+        if allowed_rows is None:
+            scores = np.dot(self.embeddings, q_emb)
+        else:
+            scores = np.dot(np.asarray(self.embeddings[allowed_rows]), q_emb)
         top_k_idx = np.argpartition(-scores, top_k - 1)[:top_k]
         top_k_idx = top_k_idx[np.argsort(-scores[top_k_idx])]
+        rows = top_k_idx if allowed_rows is None else allowed_rows[top_k_idx]
+
+        return [(self.passages[i], float(s)) for i, s in zip(rows, scores[top_k_idx])]
+
+    def _ann_search(
+        self,
+        q_emb: np.ndarray,
+        top_k: int,
+        allowed: Optional[np.ndarray],
+        allowed_rows: Optional[np.ndarray],
+    ) -> Optional[List[Tuple[Passage, float]]]:
+        """
+        ANN results, or None when a filtered search is better served by the
+        exact scan over the allowed rows
+        """
+        q = q_emb.astype(np.float32)
+        if allowed is None:
+            rows, ann_scores = self.ann.search(q, top_k)
+            return [(self.passages[i], float(s)) for i, s in zip(rows, ann_scores)]
+        if len(allowed_rows) < self.ann_min_passages:
+            return None
 
-        return [(self.passages[i], float(scores[i])) for i in top_k_idx]
+        # Over-fetch in proportion to the filter's selectivity
+        n = len(self.passages)
+        fetch = min(n, 2 * top_k * -(-n // len(allowed_rows)))
+        rows, ann_scores = self.ann.search(q, fetch)
+        keep = allowed[rows]
+        if int(keep.sum()) < top_k:
+            return None
+        return [
+            (self.passages[i], float(s))
+            for i, s in zip(rows[keep][:top_k], ann_scores[keep][:top_k])
+        ]
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.core.text_utils import normalise
+
+KEYS_FILE = "keys.json"
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent passage-embedding store keyed by (model name, normalisation, sha256(text))
+
+    One directory per (model, normalisation) under cache_dir holding:
+    - embeddings-<digest>.npy: float32 matrix, one row per cached text
+    - keys.json: sha256 of the text behind each row (in row order) and the name
+      of the matching .npy; swapping keys.json is what publishes a new version
+
+    Only texts whose hash isn't cached yet go through the encoder.
+    Rows are kept in the order of the last requested text list, so an unchanged
+    corpus is served straight from a read-only memory map (no copy, no inference)
+    """
+
+    def __init__(
+        self, cache_dir: Path, model_name: str, normalize: bool = True
+    ) -> None:
+        self.model_name = model_name
+        self.normalize = normalize
+
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_")
+        self.path = Path(cache_dir) / f"{slug}-{'l2' if normalize else 'raw'}"
+
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> tuple[List[str], np.ndarray | None]:
+        keys_path = self.path / KEYS_FILE
+        if not keys_path.exists():
+            return [], None
+
+        try:
+            with keys_path.open("r", encoding="utf-8") as f:
+                meta = json.load(f)
+            embeddings = np.load(self.path / meta["file"], mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable embedding cache at {self.path}: {e}")
+            return [], None
+
+        keys = meta.get("keys", [])
+        if (
+            meta.get("model_name") != self.model_name
+            or meta.get("normalize") != self.normalize
+            or embeddings.ndim != 2
+            or embeddings.shape[0] != len(keys)
+        ):
+            return [], None
+        return keys, embeddings
+
+    def _write(self, keys: List[str], embeddings: np.ndarray) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+
+        digest = hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()[:16]
+        emb_name = f"embeddings-{digest}.npy"
+
+        tmp_emb = self.path / f"{emb_name}.tmp-{pid}"
+        with tmp_emb.open("wb") as f:
+            np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+        os.replace(tmp_emb, self.path / emb_name)
+
+        tmp_keys = self.path / f"{KEYS_FILE}.tmp-{pid}"
+        with tmp_keys.open("w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "model_name": self.model_name,
+                    "normalize": self.normalize,
+                    "dim": int(embeddings.shape[1]),
+                    "file": emb_name,
+                    "keys": keys,
+                },
+                f,
+            )
+
+        os.replace(tmp_keys, self.path / KEYS_FILE)
+
+        # Older versions are unreachable now (open memory maps stay valid)
+        for old in self.path.glob("embeddings-*.npy"):
+            if old.name != emb_name:
+                old.unlink(missing_ok=True)
+
+    def get_or_encode(
+        self,
+        texts: List[str],
+        encode: Callable[[List[str]], np.ndarray],
+    ) -> np.ndarray:
+        """
+        Embeddings for texts (row i <-> texts[i]), encoding only uncached ones
+
+        `encode` must return float vectors already normalised the way this cache
+        is keyed (see `normalize`)
+        """
+        wanted = [text_key(t) for t in texts]
+        cached_keys, cached = self._load()
+
+        # Fast path: cache rows already start with exactly these texts
+        if cached is not None and cached_keys[: len(wanted)] == wanted:
+            self.hits += len(wanted)
+            return cached[: len(wanted)]
+
+        row_of: Dict[str, int] = {k: i for i, k in enumerate(cached_keys)}
+
+        # Encode each new text once, even if it appears several times
+        new_keys: List[str] = []
+        new_texts: List[str] = []
+        seen_new = set()
+        for key, text in zip(wanted, texts):
+            if key not in row_of and key not in seen_new:
+                seen_new.add(key)
+                new_keys.append(key)
+                new_texts.append(text)
+
+        self.misses += len(new_texts)
+        self.hits += len(wanted) - len(new_texts)
+
+        if new_texts:
+            new_emb = np.asarray(encode(new_texts), dtype=np.float32)
+        else:
+            dim = cached.shape[1] if cached is not None else 0
+            new_emb = np.empty((0, dim), dtype=np.float32)
+
+        if cached is None:
+            pool = new_emb
+        else:
+            pool = np.concatenate([np.asarray(cached), new_emb])
+        pool_row: Dict[str, int] = {k: i for i, k in enumerate(cached_keys + new_keys)}
+
+        # Requested texts first (in order), then every other cached row, so the
+        # next start with the same corpus takes the fast path
+        first_rows: List[int] = []
+        first_keys: List[str] = []
+        placed = set()
+        for key in wanted:
+            if key not in placed:
+                placed.add(key)
+                first_rows.append(pool_row[key])
+                first_keys.append(key)
+        rest_keys = [k for k in cached_keys + new_keys if k not in placed]
+        rest_rows = [pool_row[k] for k in rest_keys]
+
+        ordered = pool[np.asarray(first_rows + rest_rows, dtype=np.int64)]
+        try:
+            self._write(first_keys + rest_keys, ordered)
+        except OSError as e:
+            print(f"Could not write embedding cache to {self.path}: {e}")
+        else:
+            # Serve from the memory map just written, not the in-memory copy
+            written_keys, written = self._load()
+            if written is not None and written_keys[: len(wanted)] == wanted:
+                return written[: len(wanted)]
+
+        if len(first_keys) == len(wanted):
+            return ordered[: len(wanted)]
+        # Duplicate texts in the request: expand to one row per text
+        first_pos = {k: i for i, k in enumerate(first_keys)}
+        return ordered[np.asarray([first_pos[k] for k in wanted], dtype=np.int64)]
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU of query embeddings keyed by (model name, normalised query)
+
+    With `path` set, entries are loaded from that .npz on creation and written
+    back by save(), so repeated eval runs skip encoding the same queries.
+    A file written for another model is ignored
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 4096,
+        path: Optional[Path] = None,
+    ) -> None:
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.path = Path(path) if path is not None else None
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with np.load(self.path) as data:
+                if str(data["model_name"]) != self.model_name:
+                    return
+                keys = data["keys"].tolist()
+                embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable query embedding cache at {self.path}: {e}")
+            return
+        for key, emb in zip(keys[-self.max_entries :], embeddings[-self.max_entries :]):
+            self._entries[key] = emb
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            keys = list(self._entries)
+            embeddings = (
+                np.stack(list(self._entries.values()))
+                if keys
+                else np.empty((0, 0), dtype=np.float32)
+            )
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.tmp-{os.getpid()}")
+        with tmp.open("wb") as f:
+            np.savez(
+                f,
+                model_name=np.array(self.model_name),
+                keys=np.array(keys, dtype=np.str_),
+                embeddings=embeddings,
+            )
+        os.replace(tmp, self.path)
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        key = normalise(query)
+        with self._lock:
+            emb = self._entries.get(key)
+            if emb is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return emb
+
+    def put(self, query: str, emb: np.ndarray) -> np.ndarray:
+        emb = np.array(emb, dtype=np.float32)
+        emb.setflags(write=False)  # shared between callers
+        key = normalise(query)
+        with self._lock:
+            self._entries[key] = emb
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return emb
+
+    def get_or_encode(
+        self, query: str, encode: Callable[[str], np.ndarray]
+    ) -> np.ndarray:
+        emb = self.get(query)
+        if emb is None:
+            emb = self.put(query, encode(query))
+        return emb
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
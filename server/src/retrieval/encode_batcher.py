@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_STOP = object()
+
+
+class QueryEncodeBatcher:
+    """
+    Micro-batches concurrent query encodes into one encoder call
+
+    Callers submit a text and get a Future; a worker thread collects up to
+    max_batch texts, waiting at most max_wait_ms after the first one, encodes
+    them with a single encode_batch(texts) call and resolves every future.
+    encode() blocks (for threadpool handlers), encode_async() awaits (for the
+    event loop). A failed batch fails each of its futures, later batches run
+    normally
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], np.ndarray],
+        max_batch: int = 32,
+        max_wait_ms: float = 2.0,
+    ) -> None:
+        if max_batch <= 0:
+            raise ValueError("max_batch must be positive")
+        self.encode_batch = encode_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, text: str) -> "Future[np.ndarray]":
+        future: "Future[np.ndarray]" = Future()
+        # Under the lock, so nothing is queued behind close()'s stop marker
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("QueryEncodeBatcher is closed")
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="query-encode-batcher", daemon=True
+                )
+                self._worker.start()
+            self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+
+    async def encode_async(self, text: str) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(
+        self, first: Tuple[str, Future]
+    ) -> Tuple[List[Tuple[str, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch, stop = self._collect(first)
+
+            # Callers that gave up (cancelled) don't need encoding
+            batch = [(t, f) for t, f in batch if f.set_running_or_notify_cancel()]
+            if batch:
+                try:
+                    embeddings = self.encode_batch([t for t, _f in batch])
+                except Exception as e:
+                    for _t, f in batch:
+                        f.set_exception(e)
+                else:
+                    for (_t, f), emb in zip(batch, embeddings):
+                        f.set_result(emb)
+                with self._lock:
+                    self.batches += 1
+                    self.items += len(batch)
+            if stop:
+                return
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+            self._queue.put(_STOP)
+        if worker is not None:
+            worker.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch": self.items / self.batches if self.batches else 0.0,
+            }
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.core.corpus_pack import passage_sections, passage_study_ids
+from src.core.models import Passage, Study
+
+
+@dataclass
+class SearchFilters:
+    """
+    Metadata restrictions for a search
+
+    Fields combine with AND; a list matches any of its values.
+    None (or an empty list) leaves that field unrestricted
+    """
+
+    training_status: Optional[List[str]] = None
+    year_min: Optional[int] = None
+    year_max: Optional[int] = None
+    tags: Optional[List[str]] = None
+    sections: Optional[List[str]] = None  # passage section, case-insensitive
+    study_ids: Optional[List[int]] = None
+
+    def is_empty(self) -> bool:
+        return not any(v is not None and v != [] for v in asdict(self).values())
+
+    def key(self) -> tuple:
+        return tuple(
+            tuple(sorted(v)) if isinstance(v, list) else v
+            for v in asdict(self).values()
+        )
+
+
+# What search(filters=...) accepts: a spec, or a boolean mask over the passages
+Filters = Union[SearchFilters, np.ndarray]
+
+
+class FilterIndex:
+    """
+    Per-field boolean masks over a passage list, built once
+
+    Categorical fields (training status, tags, section, study id) keep one mask
+    per value; year is a per-passage array compared at query time. Resolving a
+    SearchFilters is a handful of vectorised ORs / ANDs, and recent results are
+    memoised
+
+    Training status, tags and year come from the studies; an index built
+    without them (studies=None) raises ValueError on those filters instead of
+    matching nothing
+    """
+
+    _MEMO_SIZE = 64
+
+    def __init__(
+        self, passages: Sequence[Passage], studies: Optional[Iterable[Study]] = None
+    ) -> None:
+        self.n = len(passages)
+        self.has_studies = studies is not None
+        study_by_id: Dict[int, Study] = {s.id: s for s in studies or []}
+
+        # Columns only, so packed passages are never decoded here
+        study_ids = passage_study_ids(passages)
+        year_of = {sid: s.year or -1 for sid, s in study_by_id.items()}
+        self.years = np.fromiter(
+            (year_of.get(sid, -1) for sid in study_ids.tolist()),
+            dtype=np.int64,
+            count=self.n,
+        )
+
+        self.by_study: Dict[int, np.ndarray] = self._masks(study_ids.tolist())
+        self.by_section: Dict[str, np.ndarray] = self._masks(
+            [(section or "").lower() for section in passage_sections(passages)]
+        )
+
+        # Study-level fields: one mask per study, combined per value
+        status_of = {s.id: s.training_status for s in study_by_id.values()}
+        self.by_training_status: Dict[str, np.ndarray] = {}
+        self.by_tag: Dict[str, np.ndarray] = {}
+        for sid, mask in self.by_study.items():
+            study = study_by_id.get(sid)
+            if study is None:
+                continue
+            self._or_into(self.by_training_status, status_of[sid], mask)
+            for tag in set(study.tags):
+                self._or_into(self.by_tag, tag, mask)
+
+        self._memo: Dict[tuple, np.ndarray] = {}
+        self._memo_lock = threading.Lock()
+
+    def _masks(self, values: List) -> Dict:
+        rows: Dict = {}
+        for i, v in enumerate(values):
+            rows.setdefault(v, []).append(i)
+        out = {}
+        for v, idx in rows.items():
+            mask = np.zeros(self.n, dtype=bool)
+            mask[idx] = True
+            out[v] = mask
+        return out
+
+    @staticmethod
+    def _or_into(masks: Dict[str, np.ndarray], value: str, mask: np.ndarray) -> None:
+        if value in masks:
+            masks[value] = masks[value] | mask
+        else:
+            masks[value] = mask.copy()
+
+    def _any_of(self, masks: Dict, values: Iterable) -> np.ndarray:
+        out = np.zeros(self.n, dtype=bool)
+        for v in values:
+            m = masks.get(v)
+            if m is not None:
+                out |= m
+        return out
+
+    def mask(self, filters: SearchFilters) -> Optional[np.ndarray]:
+        """
+        Allowed passages as a boolean mask (None = no restriction)
+        """
+        if filters.is_empty():
+            return None
+        if not self.has_studies and (
+            filters.training_status
+            or filters.tags
+            or filters.year_min is not None
+            or filters.year_max is not None
+        ):
+            raise ValueError(
+                "training_status / tags / year filters need the studies "
+                "(pass studies to add_passages)"
+            )
+        key = filters.key()
+        with self._memo_lock:
+            cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+
+        out = np.ones(self.n, dtype=bool)
+        if filters.training_status:
+            out &= self._any_of(self.by_training_status, filters.training_status)
+        if filters.tags:
+            out &= self._any_of(self.by_tag, filters.tags)
+        if filters.sections:
+            out &= self._any_of(self.by_section, (s.lower() for s in filters.sections))
+        if filters.study_ids:
+            out &= self._any_of(self.by_study, filters.study_ids)
+        if filters.year_min is not None:
+            out &= self.years >= filters.year_min
+        if filters.year_max is not None:
+            out &= self.years <= filters.year_max
+
+        out.setflags(write=False)
+        with self._memo_lock:
+            if len(self._memo) >= self._MEMO_SIZE:
+                self._memo.pop(next(iter(self._memo)))
+            self._memo[key] = out
+        return out
+
+
+def resolve_filters(
+    filters: Optional[Filters], filter_index: Optional[FilterIndex], n: int
+) -> Optional[np.ndarray]:
+    """
+    Boolean mask of allowed passages for search(filters=...), None = all allowed
+    """
+    if filters is None:
+        return None
+    if isinstance(filters, SearchFilters):
+        if filters.is_empty():
+            return None
+        if filter_index is None:
+            raise ValueError(
+                "SearchFilters need a FilterIndex over the passages "
+                "(pass studies to add_passages, or a boolean mask instead)"
+            )
+        if filter_index.n != n:
+            raise ValueError("FilterIndex was built for a different passage list")
+        return filter_index.mask(filters)
+
+    mask = np.asarray(filters, dtype=bool)
+    if mask.shape != (n,):
+        raise ValueError(f"filter mask must have shape ({n},), got {mask.shape}")
+    return mask
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.models import Passage, Study
+from src.core.sqlite_store import (
+    PASSAGE_COLUMNS,
+    SqliteStudyStore,
+    fts_tokens,
+    passage_from_row,
+)
+from .bm25 import bm25_similarities
+from .filters import FilterIndex, Filters, resolve_filters
+
+
+# Parameters of SQLite's bm25(), used for similarities() as well
+K1 = 1.2
+B = 0.75
+
+
+class Fts5Index:
+    """
+    Sparse index served by the FTS5 table of a SqliteStudyStore, ranked by
+    SQLite's bm25() (k1=1.2, b=0.75, the Bm25Index defaults)
+
+    Postings stay in the SQLite file: every search is one indexed query and
+    nothing is built in memory. Usable as HybridRetriever(sparse=Fts5Index(store))
+
+    add_passages only records the passages results refer to (and the order
+    filter masks use) and never writes to the store: passages it doesn't hold
+    raise ValueError (load them with store.import_corpus / upsert_study first);
+    build is a no-op. Hits the store holds but add_passages didn't get come
+    back read from the store; HybridRetriever fuses only the passages it was
+    given, so for it the store is a snapshot (restart after changing it)
+    """
+
+    def __init__(self, store: SqliteStudyStore) -> None:
+        self.store = store
+        self.passages: List[Passage] = []
+        self._row_by_id: Dict[int, int] = {}
+        self.filter_index: FilterIndex | None = None  # resolves SearchFilters
+
+    @property
+    def is_built(self) -> bool:
+        return True
+
+    def add_passages(
+        self, passages: List[Passage], studies: Optional[List[Study]] = None
+    ) -> None:
+        ids = [p.id for p in passages]
+        stored = {
+            r[0]
+            for r in self.store.query(
+                "SELECT id FROM passages WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(ids),),
+            )
+        }
+        missing = [p.id for p in passages if p.id not in stored]
+        if missing:
+            raise ValueError(
+                f"{len(missing)} passages are not in {self.store.path} "
+                f"(e.g. id {missing[0]}); import them into the store first"
+            )
+
+        for p in passages:
+            self._row_by_id[p.id] = len(self.passages)
+            self.passages.append(p)
+        self.filter_index = FilterIndex(self.passages, studies)
+
+    def build(self) -> None:
+        pass
+
+    def _idf_of(self, tokens: List[str]) -> Dict[str, float]:
+        # Document frequencies from the FTS vocabulary, Bm25Index's IDF formula
+        n_passages = self.store.query("SELECT COUNT(*) FROM passages_fts")[0][0]
+        rows = self.store.query(
+            "SELECT term, doc FROM passages_fts_vocab"
+            " WHERE term IN (SELECT value FROM json_each(?))",
+            (json.dumps(tokens),),
+        )
+        return {
+            term: float(np.log(1.0 + (n_passages - df + 0.5) / (df + 0.5)))
+            for term, df in rows
+        }
+
+    def similarities(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        BM25 score of the query against each text, with IDF from the store's
+        FTS vocabulary (texts don't have to be stored passages)
+        """
+        return bm25_similarities(query, texts, self._idf_of, k1=K1, b=B)
+
+    def search(
+        self, query: str, top_k: int = 10, filters: Optional[Filters] = None
+    ) -> List[Tuple[Passage, float]]:
+        """
+        Return top_k (passage, score) pairs for the query search, restricted
+        to the passages allowed by filters (score = -bm25, higher is better)
+        """
+        terms = list(dict.fromkeys(fts_tokens(query).split()))
+        if not terms or top_k <= 0:
+            return []
+        # Tokens are [a-z0-9]+ only, quoting keeps FTS5 from reading operators
+        match = " OR ".join(f'"{t}"' for t in terms)
+
+        # Rank rowids first; passage rows are read for the top_k only
+        sql = (
+            "SELECT rowid, -bm25(passages_fts) AS score FROM passages_fts"
+            " WHERE passages_fts MATCH ?"
+        )
+        params: list = [match]
+
+        allowed = resolve_filters(filters, self.filter_index, len(self.passages))
+        if allowed is not None:
+            ids = [self.passages[i].id for i in np.flatnonzero(allowed).tolist()]
+            if not ids:
+                return []
+            sql += " AND rowid IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(ids))
+
+        sql += " ORDER BY score DESC, rowid LIMIT ?"
+        params.append(top_k)
+        ranked = self.store.query(sql, params)
+
+        # Hand back the caller's own Passage objects when it registered them
+        unknown = [pid for pid, _s in ranked if pid not in self._row_by_id]
+        fetched: Dict[int, Passage] = {}
+        if unknown:
+            rows = self.store.query(
+                f"SELECT {PASSAGE_COLUMNS} FROM passages p"
+                " WHERE p.id IN (SELECT value FROM json_each(?))",
+                (json.dumps(unknown),),
+            )
+            fetched = {row[0]: passage_from_row(row) for row in rows}
+
+        results: List[Tuple[Passage, float]] = []
+        for pid, score in ranked:
+            row_index = self._row_by_id.get(pid)
+            passage = (
+                self.passages[row_index] if row_index is not None else fetched.get(pid)
+            )
+            if passage is not None:
+                results.append((passage, float(score)))
+        return results
@@ -1,10 +1,20 @@
 from __future__ import annotations
 
+import time
+from concurrent.futures import Executor, Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import List, Tuple, Dict, Optional
 
-from src.core.models import Passage
-from .retriever import Retriever
+import numpy as np
+
+from src.core.corpus_pack import passage_ids
+from src.core.models import Passage, Study
+from .retriever import Retriever, SparseIndex
+from .filters import FilterIndex, Filters, resolve_filters
 from .indexer import TfIdfIndex
+from .embedding_cache import QueryEmbeddingCache
+from .ann import AnnIndex
 
 try:
     from .dense_retriever import DenseRetriever  # type: ignore
@@ -12,44 +22,185 @@ except Exception:
     DenseRetriever = None  # type: ignore
 
 
+FUSION_MODES = ("minmax", "rrf", "zscore")
+DEFAULT_RRF_K = 60
+
+
+@dataclass
+class HybridSearchResult:
+    """
+    Fused results plus which legs contributed
+
+    degraded is set when a leg missed its timeout (named in missed_legs) and
+    the results come from the other leg only
+    """
+
+    results: List[Tuple[Passage, float]]
+    degraded: bool = False
+    missed_legs: List[str] = field(default_factory=list)
+
+
 class HybridRetriever(Retriever):
     """
     Hybrid retriever that combines sparse (TF-IDF) and dense (embeddings) scores.
     If dense retriever is unavailable, it falls back to TF-IDF only.
+
+    The sparse leg defaults to TfIdfIndex, any SparseIndex (e.g. Bm25Index) can be
+    passed instead; tfidf_weight then weights that index
+    embedding_cache_dir is handed to DenseRetriever to persist passage embeddings,
+    dense_storage picks its in-memory embedding format (float32/float16/int8/binary),
+    query_cache (a QueryEmbeddingCache) lets several retrievers share query encodings,
+    query_batch_size / query_batch_wait_ms turn on dense query micro-batching,
+    dense_ann / dense_ann_path give it an ANN index (and where to save it)
+
+    With an `executor`, search runs the sparse and dense legs concurrently on it
+    (both spend most of their time outside the GIL) and waits at most
+    sparse_timeout / dense_timeout seconds (None = no limit, timed from the
+    start of the search) for each; a leg that misses is dropped and the result
+    flagged as degraded (see search_detailed). Use an executor whose threads
+    never wait on hybrid searches themselves, or the legs can starve
+
+    fusion picks how leg scores are combined (each weighted by its leg weight):
+    - "minmax": scores min-max normalised over each leg's top 2*top_k (default;
+      fused scores stay in [0, 1], which the API's confidence expects)
+    - "rrf": reciprocal rank fusion, 1 / (rrf_k + rank); needs only each
+      leg's top_k and ignores score scales entirely
+    - "zscore": scores standardised by each leg's mean / std, so one outlier
+      doesn't squash the rest the way min-max does
+
+    add_passages(passages, studies) builds one FilterIndex that both legs
+    share; search(filters=...) resolves it to a passage mask once and each leg
+    ranks only the allowed passages, so filtered searches still fill top_k
     """
 
     def __init__(
         self,
         tfidf_weight: float = 0.5,
         dense_weight: float = 0.5,
+        sparse: Optional[SparseIndex] = None,
+        embedding_cache_dir: Optional[Path] = None,
+        dense_storage: str = "float32",
+        dense_ann: Optional[AnnIndex] = None,
+        dense_ann_path: Optional[Path] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+        query_batch_size: int = 0,
+        query_batch_wait_ms: float = 2.0,
+        executor: Optional[Executor] = None,
+        sparse_timeout: Optional[float] = None,
+        dense_timeout: Optional[float] = None,
+        fusion: str = "minmax",
+        rrf_k: int = DEFAULT_RRF_K,
     ) -> None:
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"fusion must be one of {FUSION_MODES}, got {fusion!r}")
         self.tfidf_weight = tfidf_weight
         self.dense_weight = dense_weight
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+
+        self.executor = executor
+        self.sparse_timeout = sparse_timeout
+        self.dense_timeout = dense_timeout
 
-        self.tfidf = TfIdfIndex()
-        self.dense = DenseRetriever() if DenseRetriever is not None else None
+        self.tfidf: SparseIndex = sparse if sparse is not None else TfIdfIndex()
+        self.dense = (
+            DenseRetriever(
+                cache_dir=embedding_cache_dir,
+                storage=dense_storage,
+                ann=dense_ann,
+                ann_path=dense_ann_path,
+                query_cache=query_cache,
+                query_batch_size=query_batch_size,
+                query_batch_wait_ms=query_batch_wait_ms,
+            )
+            if DenseRetriever is not None
+            else None
+        )
         self.passages: List[Passage] = []
+        self._rows_of_id: Optional[np.ndarray] = None
+        self._rows_source: Optional[List[Passage]] = None
+        self.filter_index: Optional[FilterIndex] = None
 
-    def add_passages(self, passages: List[Passage]) -> None:
+    def add_passages(
+        self, passages: List[Passage], studies: Optional[List[Study]] = None
+    ) -> None:
         self.passages = passages
-        self.tfidf.add_passages(passages)
-        self.tfidf.build()
+        self._id_rows()  # id -> row table used by fusion
+        self.filter_index = FilterIndex(passages, studies)
+
+        # A sparse index that is already built over these passages (e.g. loaded
+        # from disk) is reused as is
+        # (compared by id columns, packed passages stay undecoded)
+        indexed = getattr(self.tfidf, "passages", [])
+        if len(indexed) != len(passages) or not np.array_equal(
+            passage_ids(indexed), passage_ids(passages)
+        ):
+            self.tfidf.add_passages(passages, studies)
+            self.tfidf.build()
+        elif not getattr(self.tfidf, "is_built", False):
+            self.tfidf.build()
 
         if self.dense is not None:
-            self.dense.add_passages(passages)
+            self.dense.add_passages(passages, studies)
 
-    def _normalise_scores(self, scores: Dict[int, float]) -> Dict[int, float]:
-        if not scores:
-            return {}
+        # Legs see the same passage order, so they share the masks (a reused
+        # sparse index gets its study-level filters from here)
+        self.tfidf.filter_index = self.filter_index
+        if self.dense is not None:
+            self.dense.filter_index = self.filter_index
 
-        vals = list(scores.values())
-        s_min = min(vals)
-        s_max = max(vals)
+    def _id_rows(self) -> np.ndarray:
+        """
+        passage id -> row in self.passages (-1 if absent), rebuilt only when
+        self.passages is replaced
+        """
+        if self._rows_of_id is None or self._rows_source is not self.passages:
+            ids = passage_ids(self.passages)
+            table = np.full(int(ids.max()) + 1 if ids.size else 0, -1, dtype=np.int64)
+            table[ids] = np.arange(ids.size, dtype=np.int64)
+            self._rows_of_id = table
+            self._rows_source = self.passages
+        return self._rows_of_id
 
+    @staticmethod
+    def _minmax(values: np.ndarray) -> np.ndarray:
+        s_min = values.min()
+        s_max = values.max()
         if s_max == s_min:
-            return {k: 0.5 for k in scores.keys()}
+            return np.full(values.shape, 0.5)
+        return (values - s_min) / (s_max - s_min)
+
+    def _leg_rows(
+        self, results: List[Tuple[Passage, float]]
+    ) -> Tuple[np.ndarray, np.ndarray, float]:
+        """
+        Rows and fusion-ready scores of one leg's results (normalised over
+        everything the leg returned), plus the score of a candidate the leg
+        did not return
+        """
+        if not results:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), 0.0
+        n = len(results)
+        ids = np.fromiter((p.id for p, _s in results), dtype=np.int64, count=n)
+        missing = 0.0
+        if self.fusion == "rrf":
+            norm = 1.0 / (self.rrf_k + np.arange(1, n + 1, dtype=np.float64))
+        else:
+            scores = np.fromiter((s for _p, s in results), dtype=np.float64, count=n)
+            if self.fusion == "zscore":
+                std = scores.std()
+                norm = (scores - scores.mean()) / std if std > 0 else np.zeros(n)
+                # Not returned = no better than the leg's worst result
+                missing = float(norm.min())
+            else:
+                norm = self._minmax(scores)
 
-        return {k: (v - s_min) / (s_max - s_min) for k, v in scores.items()}
+        table = self._id_rows()
+        rows = np.full(n, -1, dtype=np.int64)
+        known = (ids >= 0) & (ids < table.size)
+        rows[known] = table[ids[known]]
+        keep = rows >= 0
+        return rows[keep], norm[keep], missing
 
     def _effective_weights(self) -> tuple[float, float]:
         """
@@ -65,48 +216,127 @@ class HybridRetriever(Retriever):
             return 0.5, 0.5
         return self.tfidf_weight / total, self.dense_weight / total
 
-    def search(self, query: str, top_k: int = 10) -> List[Tuple[Passage, float]]:
-        if not self.passages:
-            return []
+    def search(
+        self, query: str, top_k: int = 10, filters: Optional[Filters] = None
+    ) -> List[Tuple[Passage, float]]:
+        return self.search_detailed(query, top_k, filters).results
 
-        k_each = min(top_k * 2, len(self.passages))
+    def search_detailed(
+        self, query: str, top_k: int = 10, filters: Optional[Filters] = None
+    ) -> HybridSearchResult:
+        if not self.passages:
+            return HybridSearchResult([])
 
-        sparse_results = self.tfidf.search(query, top_k=k_each)
+        # Resolved once, both legs get the mask
+        allowed = resolve_filters(filters, self.filter_index, len(self.passages))
+        n_allowed = len(self.passages) if allowed is None else int(allowed.sum())
+        if n_allowed == 0:
+            return HybridSearchResult([])
 
-        if self.dense is not None:
-            dense_results = self.dense.search(
-                query, top_k=k_each
-            )  # returns [] if disabled
-        else:
-            dense_results = []
+        # Rank fusion needs no over-fetch to normalise against
+        k_each = min(top_k if self.fusion == "rrf" else top_k * 2, n_allowed)
+        w_sp, w_de = self._effective_weights()
 
-        sparse_scores: Dict[int, float] = {p.id: s for (p, s) in sparse_results}
-        dense_scores: Dict[int, float] = {p.id: s for (p, s) in dense_results}
+        # No dense leg (or no weight on it): nothing to run alongside the sparse one
+        if self.executor is None or self.dense is None or w_de == 0.0:
+            sparse_results = self.tfidf.search(query, k_each, allowed)
+            if self.dense is not None:
+                dense_results = self.dense.search(
+                    query, k_each, allowed
+                )  # returns [] if disabled
+            else:
+                dense_results = []
+            return HybridSearchResult(
+                self._fuse(sparse_results, dense_results, w_sp, w_de, top_k)
+            )
 
-        sparse_norm = self._normalise_scores(sparse_scores)
-        dense_norm = self._normalise_scores(dense_scores)
+        start = time.monotonic()
+        legs = {
+            "sparse": (
+                self.executor.submit(self.tfidf.search, query, k_each, allowed),
+                self.sparse_timeout,
+            ),
+            "dense": (
+                self.executor.submit(self.dense.search, query, k_each, allowed),
+                self.dense_timeout,
+            ),
+        }
+        results: Dict[str, List[Tuple[Passage, float]]] = {}
+        missed: List[str] = []
+        for name, (future, timeout) in legs.items():
+            results[name] = self._leg_result(name, future, timeout, start, missed)
 
-        w_sp, w_de = self._effective_weights()
+        if "dense" in missed:
+            w_sp, w_de = 1.0, 0.0
+        if "sparse" in missed:
+            w_sp, w_de = 0.0, 1.0
+        return HybridSearchResult(
+            self._fuse(results["sparse"], results["dense"], w_sp, w_de, top_k),
+            degraded=bool(missed),
+            missed_legs=missed,
+        )
 
-        fused_scores: Dict[int, float] = {}
-        for p in self.passages:
-            pid = p.id
-            if pid not in sparse_norm and pid not in dense_norm:
-                continue
+    @staticmethod
+    def _leg_result(
+        name: str,
+        future: Future,
+        timeout: Optional[float],
+        start: float,
+        missed: List[str],
+    ) -> List[Tuple[Passage, float]]:
+        remaining = (
+            None if timeout is None else max(0.0, start + timeout - time.monotonic())
+        )
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeout:
+            future.cancel()  # no-op once running; the result is just ignored
+            print(
+                f"Hybrid search: {name} leg missed its {timeout * 1000:.0f} ms budget"
+            )
+            missed.append(name)
+            return []
 
-            s_sp = sparse_norm.get(pid, 0.0)
-            s_de = dense_norm.get(pid, 0.0)
-            fused = w_sp * s_sp + w_de * s_de
+    def _fuse(
+        self,
+        sparse_results: List[Tuple[Passage, float]],
+        dense_results: List[Tuple[Passage, float]],
+        w_sp: float,
+        w_de: float,
+        top_k: int,
+    ) -> List[Tuple[Passage, float]]:
+        """
+        Weighted sum of normalised leg scores (see `fusion`) over the union of
+        the candidates; ties keep corpus order. Cost depends on the candidate
+        count only, not on the corpus size
+        """
+        if top_k <= 0:
+            return []
+        sp_rows, sp_norm, sp_missing = self._leg_rows(sparse_results)
+        de_rows, de_norm, de_missing = self._leg_rows(dense_results)
 
-            if fused > 0.0:
-                fused_scores[pid] = fused
+        rows = np.union1d(sp_rows, de_rows)  # sorted = corpus order
+        s_sp = np.full(rows.size, sp_missing, dtype=np.float64)
+        s_sp[np.searchsorted(rows, sp_rows)] = sp_norm
+        s_de = np.full(rows.size, de_missing, dtype=np.float64)
+        s_de[np.searchsorted(rows, de_rows)] = de_norm
 
-        if not fused_scores:
+        fused = w_sp * s_sp + w_de * s_de
+        if self.fusion != "zscore":  # z-scores are legitimately negative
+            positive = fused > 0.0
+            rows, fused = rows[positive], fused[positive]
+        if not rows.size:
             return []
 
-        sorted_ids = sorted(fused_scores.keys(), key=lambda pid: -fused_scores[pid])
-        top_ids = sorted_ids[:top_k]
-
-        by_id = {p.id: p for p in self.passages}
+        if rows.size > top_k:
+            # Keep everything tied with the k-th best so the tie-break below
+            # sees all of them
+            kth = np.partition(fused, rows.size - top_k)[rows.size - top_k]
+            best = fused >= kth
+            rows, fused = rows[best], fused[best]
 
-        return [(by_id[pid], fused_scores[pid]) for pid in top_ids]
+        order = np.lexsort((rows, -fused))[:top_k]
+        return [
+            (self.passages[r], f)
+            for r, f in zip(rows[order].tolist(), fused[order].tolist())
+        ]
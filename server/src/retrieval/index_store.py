@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Bump when the on-disk layout changes; older files are refused, not migrated
+INDEX_FORMAT_VERSION = 1
+
+HEADER_FILE = "header.json"
+VOCAB_FILE = "vocab.json"
+
+
+class StaleIndexError(ValueError):
+    """
+    On-disk index does not match the corpus / passages it is loaded against
+    """
+
+
+def save_index_dir(
+    path: Path,
+    kind: str,
+    corpus_hash: str,
+    vocab: Dict[str, int],
+    passage_ids: List[int],
+    arrays: Dict[str, np.ndarray],
+    extra: Dict[str, Any] | None = None,
+) -> None:
+    """
+    Write an index directory: header.json + vocab.json + one .npy per array
+
+    Files are written to a sibling temp dir first and swapped in at the end,
+    so readers never see a half-written index
+    """
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    tokens = [""] * len(vocab)
+    for token, j in vocab.items():
+        tokens[j] = token
+    with (tmp / VOCAB_FILE).open("w", encoding="utf-8") as f:
+        json.dump(tokens, f, ensure_ascii=False)
+
+    np.save(tmp / "passage_ids.npy", np.asarray(passage_ids, dtype=np.int64))
+    for name, arr in arrays.items():
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(arr))
+
+    header = {
+        "kind": kind,
+        "version": INDEX_FORMAT_VERSION,
+        "corpus_hash": corpus_hash,
+        "n_passages": len(passage_ids),
+        "vocab_size": len(vocab),
+        "arrays": sorted(arrays.keys()),
+        **(extra or {}),
+    }
+    with (tmp / HEADER_FILE).open("w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+
+    if path.exists():
+        shutil.rmtree(path)
+    tmp.rename(path)
+
+
+def read_index_header(path: Path) -> Dict[str, Any]:
+    with (Path(path) / HEADER_FILE).open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_index_dir(
+    path: Path,
+    kind: str,
+    passage_ids: List[int],
+    corpus_hash: str | None = None,
+    mmap: bool = True,
+) -> Tuple[Dict[str, Any], Dict[str, int], Dict[str, np.ndarray]]:
+    """
+    Open an index directory written by save_index_dir
+
+    Returns (header, vocab, arrays); with mmap=True arrays are read-only
+    memory maps, so opening costs no copies and pages are shared across processes
+    Raises StaleIndexError if the index was built for another corpus or passage list
+    """
+    path = Path(path)
+    header = read_index_header(path)
+
+    if header.get("kind") != kind:
+        raise StaleIndexError(
+            f"{path} holds a {header.get('kind')!r} index, not {kind!r}"
+        )
+    if header.get("version") != INDEX_FORMAT_VERSION:
+        raise StaleIndexError(
+            f"{path} has index format v{header.get('version')}, "
+            f"expected v{INDEX_FORMAT_VERSION}; rebuild it"
+        )
+    if corpus_hash is not None and header.get("corpus_hash") != corpus_hash:
+        raise StaleIndexError(
+            f"{path} was built for another corpus version; rebuild it "
+            "(python -m scripts.retrieval.build_index)"
+        )
+
+    mmap_mode = "r" if mmap else None
+    stored_ids = np.load(path / "passage_ids.npy", mmap_mode=mmap_mode)
+    if len(stored_ids) != len(passage_ids) or not np.array_equal(
+        stored_ids, np.asarray(passage_ids, dtype=np.int64)
+    ):
+        raise StaleIndexError(f"{path} passage ids do not match the loaded passages")
+
+    with (path / VOCAB_FILE).open("r", encoding="utf-8") as f:
+        tokens = json.load(f)
+    vocab = {token: j for j, token in enumerate(tokens)}
+
+    arrays = {
+        name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode)
+        for name in header["arrays"]
+    }
+    return header, vocab, arrays
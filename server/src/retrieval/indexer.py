@@ -2,13 +2,19 @@ from __future__ import annotations
 
 from collections import Counter
 from math import log
-from typing import Dict, List, Tuple
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 
 from src.core.text_utils import tokenize
-from src.core.models import Passage
+from src.core.corpus_pack import passage_ids
+from src.core.models import Passage, Study
 from .retriever import Retriever
+from .sparse import CsrMatrix, flatten_counts
+from .filters import FilterIndex, Filters, resolve_filters
+from .postings import PostingLists, top_k_maxscore
+from .index_store import StaleIndexError, load_index_dir, save_index_dir
 
 
 class TfIdfIndex:
@@ -26,10 +32,21 @@ class TfIdfIndex:
         self.doc_token_counts: List[Counter[str]] = (
             []
         )  # token counts grouped by passage
-        self.passage_vectors: np.ndarray | None = None  # matrix of TF-IDF vectors
+        self.passage_vectors: CsrMatrix | None = None  # sparse matrix of TF-IDF vectors
+        self.postings: PostingLists | None = None  # token -> passages lists
+        self.filter_index: FilterIndex | None = None  # resolves SearchFilters
 
-    def add_passages(self, passages: List[Passage]) -> None:
+    @property
+    def is_built(self) -> bool:
+        return self.postings is not None
+
+    def add_passages(
+        self, passages: List[Passage], studies: Optional[List[Study]] = None
+    ) -> None:
+        if not isinstance(self.passages, list):  # loaded over a PackedPassages
+            self.passages = list(self.passages)
         self.passages.extend(passages)
+        self.filter_index = FilterIndex(self.passages, studies)
 
         # Store Passage
         for p in passages:
@@ -54,6 +71,13 @@ class TfIdfIndex:
         Meaningful specific words (“creatine”, “hypertrophy”)
             good TF and high IDF = high TF-IDF weight.
         """
+        # Passages added after an earlier build: re-stage the already indexed ones
+        missing = len(self.passages) - len(self.doc_token_counts)
+        if missing > 0:
+            self.doc_token_counts = [
+                Counter(tokenize(p.text)) for p in self.passages[:missing]
+            ] + self.doc_token_counts
+
         n_passages = len(self.doc_token_counts)  # number of passages
         vocab_size = len(self.vocab)  # number of unique tokens
         if n_passages == 0 or vocab_size == 0:
@@ -61,70 +85,206 @@ class TfIdfIndex:
                 "No documents or empty vocabulary, .add_passages(passages) first"
             )
 
-        df = np.zeros(vocab_size)
-        for counts in self.doc_token_counts:  # loop through each passage
-            for token in counts.keys():
-                word = self.vocab[token]
-                df[
-                    word
-                ] += 1  # df corresponds to in how many documents each token in our vocab appears
+        # Flatten every (passage, token, count) triple into parallel arrays
+        rows, cols, term_counts = flatten_counts(self.doc_token_counts, self.vocab)
+
+        # df corresponds to in how many documents each token in our vocab appears
+        df = np.bincount(cols, minlength=vocab_size).astype(np.float64)
 
         # Weighting using df to find word frequency (how common or rare across passages)
         self.idf = np.log((1.0 + n_passages) / (1.0 + df)) + 1.0
 
-        # TF IDF matrix
-        self.passage_vectors = np.zeros((n_passages, vocab_size))
-        for i, counts in enumerate(self.doc_token_counts):  # loop through each passage
-            length = sum(counts.values())  # total counted words
-            if length == 0:
-                continue
-            for token, count in counts.items():
-                j = self.vocab[token]
-                tf = count / length  # term frequency
-                self.passage_vectors[i, j] = tf * self.idf[j]  # vector: tf x idf
+        # TF IDF values: term frequency x idf
+        lengths = np.bincount(rows, weights=term_counts, minlength=n_passages)
+        values = term_counts / lengths[rows] * self.idf[cols]
 
         # L2 normalise doc vectors for cosine similarity (dot product)
-        norms = np.linalg.norm(self.passage_vectors, axis=1, keepdims=True) + 1e-8
-        self.passage_vectors = self.passage_vectors / norms
+        norms = np.sqrt(np.bincount(rows, weights=values**2, minlength=n_passages))
+        values = values / (norms[rows] + 1e-8)
 
-    def search(self, query: str, top_k: int = 5) -> List[Tuple[Passage, float]]:
+        self.passage_vectors = CsrMatrix.from_coo(
+            rows, cols, values, shape=(n_passages, vocab_size)
+        )
+
+        # Term -> passages lists used at query time
+        self.postings = PostingLists.from_csr(self.passage_vectors)
+
+        # Raw counts are no longer needed once the vectors exist
+        self.doc_token_counts = []
+
+    def save(self, path: Path, corpus_hash: str) -> None:
         """
-        Return top_k (passage, score) pairs for the query search
+        Write the built index (vocab, IDF, CSR + posting arrays, passage ids) to disk
         """
-        if self.passage_vectors is None or self.idf is None:
+        if self.passage_vectors is None or self.postings is None or self.idf is None:
             raise ValueError("No vectors build, call .build() first")
 
-        tokens = tokenize(query)
-        if not tokens:
-            return []
+        save_index_dir(
+            path,
+            kind="tfidf",
+            corpus_hash=corpus_hash,
+            vocab=self.vocab,
+            passage_ids=passage_ids(self.passages),
+            arrays={
+                "idf": self.idf,
+                "csr_indptr": self.passage_vectors.indptr,
+                "csr_indices": self.passage_vectors.indices,
+                "csr_data": self.passage_vectors.data,
+                "post_indptr": self.postings.indptr,
+                "post_doc_ids": self.postings.doc_ids,
+                "post_weights": self.postings.weights,
+                "post_max_weight": self.postings.max_weight,
+            },
+        )
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        passages: List[Passage],
+        corpus_hash: Optional[str] = None,
+        mmap: bool = True,
+    ) -> "TfIdfIndex":
+        """
+        Open an index written by .save() for the same passages
+
+        With mmap=True the arrays are memory-mapped (zero-copy, shared between
+        processes) instead of read into memory
+        Raises StaleIndexError if corpus_hash or the passage ids don't match
+        """
+        header, vocab, arrays = load_index_dir(
+            path,
+            kind="tfidf",
+            passage_ids=passage_ids(passages),
+            corpus_hash=corpus_hash,
+            mmap=mmap,
+        )
 
-        vocab_size = len(self.vocab)
-        query_vector = np.zeros(vocab_size)  # TF-IDF vector for the query
-        query_counts = Counter(tokens)
+        index = cls()
+        index.passages = passages  # kept as given, a PackedPassages stays lazy
+        index.vocab = vocab
+        index.idf = arrays["idf"]
+        index.passage_vectors = CsrMatrix(
+            indptr=arrays["csr_indptr"],
+            indices=arrays["csr_indices"],
+            data=arrays["csr_data"],
+            shape=(header["n_passages"], header["vocab_size"]),
+        )
+        index.postings = PostingLists(
+            indptr=arrays["post_indptr"],
+            doc_ids=arrays["post_doc_ids"],
+            weights=arrays["post_weights"],
+            max_weight=arrays["post_max_weight"],
+        )
+        return index
+
+    def _query_vector(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sparse L2-normalised TF-IDF vector of text: (term ids, weights)
+        Tokens outside the vocabulary are dropped
+        """
+        query_counts = Counter(tokenize(text))
         query_length = sum(query_counts.values())
         if query_length == 0:
-            return []
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
 
+        # Sparse TF-IDF vector for the query: only the tokens it actually contains
+        term_ids: List[int] = []
+        term_weights: List[float] = []
         for token, count in query_counts.items():
             if token not in self.vocab:  # searchword not in vocab
                 continue
             j = self.vocab[token]
             tf = count / query_length
-            query_vector[j] = tf * self.idf[j]
+            term_ids.append(j)
+            term_weights.append(tf * self.idf[j])
+
+        if not term_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
 
         # Normalise query vector
-        query_vector = query_vector / (np.linalg.norm(query_vector) + 1e-8)
-        scores = (
-            self.passage_vectors @ query_vector
-        )  # single similarity score per passage using matrix multiplication
+        query_weights = np.asarray(term_weights)
+        query_weights = query_weights / (np.linalg.norm(query_weights) + 1e-8)
+        return np.asarray(term_ids, dtype=np.int64), query_weights
+
+    def similarities(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        Cosine similarity between the query and each text, using this index's IDF
+        (texts don't have to be indexed passages, e.g. single sentences)
+        """
+        if self.idf is None:
+            raise ValueError("No vectors build, call .build() first")
+
+        q_ids, q_weights = self._query_vector(query)
+        out = np.zeros(len(texts), dtype=np.float64)
+        if len(q_ids) == 0:
+            return out
+
+        q_lookup = dict(zip(q_ids.tolist(), q_weights.tolist()))
+        for i, text in enumerate(texts):
+            t_ids, t_weights = self._query_vector(text)
+            out[i] = sum(
+                q_lookup.get(j, 0.0) * w for j, w in zip(t_ids.tolist(), t_weights)
+            )
+        return out
+
+    def search(
+        self, query: str, top_k: int = 5, filters: Optional[Filters] = None
+    ) -> List[Tuple[Passage, float]]:
+        """
+        Return top_k (passage, score) pairs for the query search, restricted
+        to the passages allowed by filters
+        """
+        if self.passage_vectors is None or self.postings is None or self.idf is None:
+            raise ValueError("No vectors build, call .build() first")
+        allowed = resolve_filters(filters, self.filter_index, len(self.passages))
+
+        term_ids, query_weights = self._query_vector(query)
+        if len(term_ids) == 0:
+            return []
+
+        # Walk the posting lists of the query terms only
+        top_index, scores = top_k_maxscore(
+            self.postings,
+            self.passage_vectors,
+            term_ids,
+            query_weights,
+            top_k,
+            allowed=allowed,
+        )
 
-        # Get indexes of top scores
-        top_index = np.argsort(-scores)[:top_k]
         results: List[Tuple[Passage, float]] = []  # (passage, score) pairs
-        for i in top_index:
-            score = float(scores[i])
+        for i, score in zip(top_index, scores):
             if score <= 0:
                 continue
-            results.append((self.passages[i], score))
+            results.append((self.passages[i], float(score)))
 
         return results
+
+
+def load_or_build_tfidf(
+    index_dir: Path,
+    passages: List[Passage],
+    corpus_hash: str,
+    save: bool = True,
+) -> TfIdfIndex:
+    """
+    Open the on-disk index if it is fresh, otherwise build it (and save it for next time)
+    """
+    if index_dir.exists():
+        try:
+            return TfIdfIndex.load(index_dir, passages, corpus_hash=corpus_hash)
+        except (StaleIndexError, OSError, KeyError) as e:
+            print(f"Rebuilding TF-IDF index: {e}")
+
+    index = TfIdfIndex()
+    index.add_passages(passages)
+    index.build()
+
+    if save:
+        try:
+            index.save(index_dir, corpus_hash)
+        except OSError as e:
+            print(f"Could not save TF-IDF index to {index_dir}: {e}")
+
+    return index
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .sparse import CsrMatrix
+
+# Relative slack on pruning thresholds so float rounding never drops a true top-k hit
+_PRUNE_SLACK = 1.0 - 1e-9
+
+
+@dataclass
+class PostingLists:
+    """
+    Inverted index: for every token, the passages containing it
+
+    Each token's list is sorted by weight (highest first) so the best passages
+    for a term are always at the front, and max_weight gives a per-term upper bound
+    """
+
+    indptr: np.ndarray  # (n_terms + 1,) int64, term t lives in [indptr[t], indptr[t+1])
+    doc_ids: np.ndarray  # (nnz,) int32 passage index per posting
+    weights: np.ndarray  # (nnz,) float32 weight per posting
+    max_weight: np.ndarray  # (n_terms,) float32 best weight per term (0 if unused)
+
+    @classmethod
+    def from_csr(cls, matrix: CsrMatrix) -> "PostingLists":
+        n_terms = matrix.shape[1]
+        rows = matrix.row_ids()
+
+        # Group by term, heaviest weight first, ties by passage index
+        order = np.lexsort((rows, -matrix.data, matrix.indices))
+        terms = matrix.indices[order]
+
+        indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=n_terms), out=indptr[1:])
+
+        weights = matrix.data[order]
+        max_weight = np.zeros(n_terms, dtype=np.float32)
+        non_empty = indptr[:-1] < indptr[1:]
+        max_weight[non_empty] = weights[indptr[:-1][non_empty]]
+
+        return cls(
+            indptr=indptr,
+            doc_ids=rows[order],
+            weights=weights,
+            max_weight=max_weight,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return int(
+            self.indptr.nbytes
+            + self.doc_ids.nbytes
+            + self.weights.nbytes
+            + self.max_weight.nbytes
+        )
+
+    def postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+
+def top_k_maxscore(
+    postings: PostingLists,
+    matrix: CsrMatrix,
+    term_ids: np.ndarray,
+    query_weights: np.ndarray,
+    top_k: int,
+    allowed: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact top_k passages for score(d) = sum_t query_weights[t] * w(d, t)
+
+    MaxScore-style safe early termination over weight-sorted posting lists:
+    - terms are visited in order of their upper bound (query weight x max weight)
+    - `threshold` is a lower bound on the k-th best score seen so far
+    - a passage not yet seen can only enter the top_k if its remaining upper bound
+      reaches the threshold, so list tails (and whole low-impact terms) are skipped
+    Surviving candidates are then rescored exactly against the forward matrix
+
+    `allowed` (boolean mask over passages) restricts the search: postings of
+    other passages are dropped before they become candidates, so a selective
+    filter shrinks the candidate set and the rescoring work
+
+    Returns (passage indexes, scores), best first, ties by passage index
+    """
+    empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    if top_k <= 0 or len(term_ids) == 0:
+        return empty
+
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    query_weights = np.asarray(query_weights, dtype=np.float64)
+
+    upper = query_weights * postings.max_weight[term_ids]
+    order = np.argsort(-upper, kind="stable")
+    visit_terms = term_ids[order]
+    visit_weights = query_weights[order]
+
+    # remaining[i] = best score a passage could still collect from terms i..end
+    remaining = np.zeros(len(order) + 1, dtype=np.float64)
+    remaining[:-1] = np.cumsum(upper[order][::-1])[::-1]
+
+    # Seed: the k-th heaviest posting of any single term already guarantees k
+    # passages (not with a filter: those postings may all be disallowed)
+    threshold = 0.0
+    if allowed is None:
+        for term, q in zip(visit_terms, visit_weights):
+            start, end = postings.indptr[term], postings.indptr[term + 1]
+            if end - start >= top_k:
+                threshold = max(
+                    threshold, q * float(postings.weights[start + top_k - 1])
+                )
+
+    n_terms = len(visit_terms)
+    cand_docs = np.empty(0, dtype=np.int64)
+    cand_scores = np.empty(0, dtype=np.float64)
+    # counted[c, i]: visit term i is already included in cand_scores[c]
+    counted = np.zeros((0, n_terms), dtype=bool)
+
+    for i, (term, q) in enumerate(zip(visit_terms, visit_weights)):
+        bar = threshold * _PRUNE_SLACK
+        if remaining[i] < bar:
+            break  # no unseen passage can reach the top_k anymore
+
+        docs, weights = postings.postings(term)
+
+        # Keep only the head of the list that could still lift an unseen passage
+        if bar > 0.0 and q > 0.0:
+            min_weight = (bar - remaining[i + 1]) / q
+            n_keep = len(weights) - np.searchsorted(
+                weights[::-1], min_weight, side="left"
+            )
+            docs, weights = docs[:n_keep], weights[:n_keep]
+
+        if allowed is not None:
+            keep = allowed[docs]
+            docs, weights = docs[keep], weights[keep]
+
+        if len(docs) == 0:
+            continue
+
+        # Partial scores are lower bounds of the full score
+        n_old = len(cand_docs)
+        merged_docs = np.concatenate([cand_docs, docs])
+        merged_scores = np.concatenate([cand_scores, q * weights.astype(np.float64)])
+        cand_docs, inverse = np.unique(merged_docs, return_inverse=True)
+        cand_scores = np.bincount(inverse, weights=merged_scores)
+
+        merged_counted = np.zeros((len(cand_docs), n_terms), dtype=bool)
+        merged_counted[inverse[:n_old]] = counted
+        merged_counted[inverse[n_old:], i] = True
+        counted = merged_counted
+
+        if len(cand_scores) >= top_k:
+            kth = float(np.partition(cand_scores, -top_k)[-top_k])
+            threshold = max(threshold, kth)
+
+    if len(cand_docs) == 0:
+        return empty
+
+    # Exact rescoring: fill in the uncounted (passage, term) weights one term at a
+    # time, dropping candidates whose best case (partial + uncounted bounds) misses
+    # the bar before paying for the next round of lookups
+    visit_upper = upper[order]
+    for i in range(n_terms + 1):
+        best_case = cand_scores + (~counted) @ visit_upper
+        keep = best_case >= threshold * _PRUNE_SLACK
+        cand_docs, cand_scores = cand_docs[keep], cand_scores[keep]
+        counted = counted[keep]
+        if i == n_terms:
+            break
+
+        todo = np.flatnonzero(~counted[:, i])
+        if len(todo) == 0:
+            continue
+        cand_scores[todo] += visit_weights[i] * _term_weights(
+            postings, matrix, int(visit_terms[i]), cand_docs[todo]
+        )
+        counted[todo, i] = True
+
+        if len(cand_scores) >= top_k:
+            kth = float(np.partition(cand_scores, -top_k)[-top_k])
+            threshold = max(threshold, kth)
+
+    ranked = np.lexsort((cand_docs, -cand_scores))[:top_k]
+    return cand_docs[ranked], cand_scores[ranked]
+
+
+def _term_weights(
+    postings: PostingLists, matrix: CsrMatrix, term: int, docs: np.ndarray
+) -> np.ndarray:
+    """
+    w(d, term) for each of the (sorted) passage indexes in docs
+
+    Short posting lists are matched against docs in one pass,
+    long ones are probed per passage through the forward matrix
+    """
+    term_docs, term_weights = postings.postings(term)
+    if len(term_docs) > 8 * len(docs):
+        return matrix.lookup(docs, term)
+
+    out = np.zeros(len(docs), dtype=np.float64)
+    pos = np.searchsorted(docs, term_docs)
+    hit = pos < len(docs)
+    hit[hit] = docs[pos[hit]] == term_docs[hit]
+    out[pos[hit]] = term_weights[hit]
+    return out
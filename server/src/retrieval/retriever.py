@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import Protocol, List, Tuple
+from typing import Protocol, List, Optional, Tuple
 
-from src.core.models import Passage
+from src.core.models import Passage, Study
+from .filters import Filters
 
 
 class Retriever(Protocol):
@@ -14,6 +15,27 @@ class Retriever(Protocol):
     - Dense embedding retriever
     - Hybrid retriever
 
+    filters (a SearchFilters or a boolean mask over the passages) restricts
+    the search to matching passages before the top_k is taken
     """
 
-    def search(self, query: str, top_k: int = 10) -> List[Tuple[Passage, float]]: ...
+    def search(
+        self, query: str, top_k: int = 10, filters: Optional[Filters] = None
+    ) -> List[Tuple[Passage, float]]: ...
+
+
+class SparseIndex(Retriever, Protocol):
+    """
+    Lexical index that is filled and built before searching
+    - TF-IDF index
+    - BM25 / BM25F index
+
+    add_passages also builds the FilterIndex for search(filters=...); studies
+    (covering every passage added so far) enable the study-level filters
+    """
+
+    def add_passages(
+        self, passages: List[Passage], studies: Optional[List[Study]] = None
+    ) -> None: ...
+
+    def build(self) -> None: ...
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+@dataclass
+class CsrMatrix:
+    """
+    Minimal compressed sparse row matrix (rows = passages, cols = vocab tokens)
+
+    Only what the sparse retrievers need: build from (row, col, value) triples,
+    multiply by a query vector, and look up single entries
+    Column indices inside each row are kept sorted
+    """
+
+    indptr: np.ndarray  # (n_rows + 1,) int64, row i lives in [indptr[i], indptr[i+1])
+    indices: np.ndarray  # (nnz,) int32 column index per stored value
+    data: np.ndarray  # (nnz,) float32 stored values
+    shape: Tuple[int, int]
+
+    @classmethod
+    def from_coo(
+        cls,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        values: np.ndarray,
+        shape: Tuple[int, int],
+    ) -> "CsrMatrix":
+        """
+        Build from unsorted (row, col, value) triples; (row, col) pairs must be unique
+        """
+        n_rows, n_cols = shape
+        order = np.lexsort((cols, rows))  # sort by row, then col
+        rows = np.asarray(rows, dtype=np.int64)[order]
+
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+
+        return cls(
+            indptr=indptr,
+            indices=np.asarray(cols, dtype=np.int32)[order],
+            data=np.asarray(values, dtype=np.float32)[order],
+            shape=(n_rows, n_cols),
+        )
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indices.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.indptr.nbytes + self.indices.nbytes + self.data.nbytes)
+
+    def row_ids(self) -> np.ndarray:
+        """
+        Row index for every stored value (expands indptr)
+        """
+        return np.repeat(np.arange(self.shape[0], dtype=np.int32), np.diff(self.indptr))
+
+    def row_sums(self, values: np.ndarray) -> np.ndarray:
+        """
+        Sum a per-stored-value array within each row (float64 result)
+        """
+        out = np.zeros(self.shape[0], dtype=np.float64)
+        if values.shape[0] == 0:
+            return out
+
+        starts = self.indptr[:-1]
+        non_empty = starts < self.indptr[1:]
+        # reduceat needs in-range starts, empty rows are masked back to 0 below
+        sums = np.add.reduceat(
+            values.astype(np.float64, copy=False),
+            np.minimum(starts, values.shape[0] - 1),
+        )
+        out[non_empty] = sums[non_empty]
+        return out
+
+    def dot(self, vector: np.ndarray) -> np.ndarray:
+        """
+        Matrix @ dense vector, accumulated in float64
+        """
+        return self.row_sums(self.data * vector[self.indices])
+
+    def lookup(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Value at (rows[i], cols[i]) for each requested pair, 0 where nothing is stored
+
+        Vectorised binary search over the sorted column indices of every row
+        """
+        rows, cols = np.broadcast_arrays(
+            np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        )
+        out = np.zeros(rows.shape[0], dtype=np.float64)
+        if rows.shape[0] == 0 or self.nnz == 0:
+            return out
+
+        row_end = self.indptr[rows + 1]
+        lo = self.indptr[rows]
+        hi = row_end
+
+        # lower_bound on every pair at once
+        active = lo < hi
+        while active.any():
+            mid = (lo + hi) // 2
+            go_right = active & (self.indices[np.minimum(mid, self.nnz - 1)] < cols)
+            lo = np.where(go_right, mid + 1, lo)
+            hi = np.where(active & ~go_right, mid, hi)
+            active = lo < hi
+
+        found = lo < row_end
+        found[found] = self.indices[lo[found]] == cols[found]
+        out[found] = self.data[lo[found]]
+        return out
+
+
+def flatten_counts(
+    doc_counts: List[Counter[str]], vocab: Dict[str, int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flatten per-document token counts into (row, col, count) arrays
+    """
+    terms_per_doc = np.fromiter(
+        (len(counts) for counts in doc_counts), dtype=np.int64, count=len(doc_counts)
+    )
+    nnz = int(terms_per_doc.sum())
+    rows = np.repeat(np.arange(len(doc_counts), dtype=np.int64), terms_per_doc)
+    cols = np.fromiter(
+        (vocab[token] for counts in doc_counts for token in counts),
+        dtype=np.int64,
+        count=nnz,
+    )
+    term_counts = np.fromiter(
+        (count for counts in doc_counts for count in counts.values()),
+        dtype=np.float64,
+        count=nnz,
+    )
+    return rows, cols, term_counts
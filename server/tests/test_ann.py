@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from src.retrieval.ann import HnswIndex, IvfFlatIndex, load_ann_index, make_ann_index
+from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.index_store import StaleIndexError
+
+
+def _unit_rows(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _exact(vectors, q, k):
+    return np.argsort(-(vectors @ q), kind="stable")[:k]
+
+
+def test_ivf_probing_every_list_is_exact():
+    vectors = _unit_rows(400, 16)
+    index = IvfFlatIndex(nlist=10)
+    index.build(vectors)
+    index.nprobe = 10
+
+    for q in _unit_rows(20, 16, seed=1):
+        rows, scores = index.search(q, 5)
+        assert rows.tolist() == _exact(vectors, q, 5).tolist()
+        assert np.allclose(scores, vectors[rows] @ q)
+
+
+def test_hnsw_recall_and_round_trip(tmp_path):
+    vectors = _unit_rows(500, 16)
+    index = HnswIndex(M=8, ef_construction=64, ef_search=64)
+    index.build(vectors)
+
+    queries = _unit_rows(20, 16, seed=2)
+    hits = sum(
+        len(set(index.search(q, 10)[0].tolist()) & set(_exact(vectors, q, 10).tolist()))
+        for q in queries
+    )
+    assert hits / (10 * len(queries)) >= 0.9
+
+    path = tmp_path / "hnsw.npz"
+    index.save(path, fingerprint="abc")
+    loaded = load_ann_index(path, vectors, fingerprint="abc")
+    for q in queries:
+        assert loaded.search(q, 10)[0].tolist() == index.search(q, 10)[0].tolist()
+
+    with pytest.raises(StaleIndexError):
+        load_ann_index(path, vectors, fingerprint="other")
+
+
+def test_hybrid_hands_ann_index_to_dense_leg(tmp_path):
+    ann = make_ann_index("hnsw")
+    assert isinstance(ann, HnswIndex)
+    with pytest.raises(ValueError):
+        make_ann_index("lsh")
+
+    r = HybridRetriever(dense_ann=ann, dense_ann_path=tmp_path / "ann.npz")
+    if r.dense is None:
+        pytest.skip("dense retriever unavailable")
+    assert r.dense.ann is ann and r.dense.ann_path == tmp_path / "ann.npz"
@@ -0,0 +1,83 @@
+import time
+
+import numpy as np
+
+from src.api.answer_cache import (
+    AnswerCache,
+    SemanticAnswerCache,
+    SqliteAnswerStore,
+    answer_cache_key,
+)
+
+
+def _key(query, **overrides):
+    params = dict(
+        mode="beginner",
+        use_llm=True,
+        top_k_passages=10,
+        max_studies=3,
+        model="m",
+        corpus_hash="c1",
+    )
+    params.update(overrides)
+    return answer_cache_key(query, **params)
+
+
+def test_key_normalises_query_but_not_params():
+    assert _key("Is creatine safe?") == _key("  is CREATINE safe ")
+    assert _key("Is creatine safe?") != _key("Is creatine safe?", mode="intermediate")
+    assert _key("Is creatine safe?") != _key("Is creatine safe?", corpus_hash="c2")
+
+
+def test_lru_eviction_and_ttl():
+    cache = AnswerCache("c1", max_entries=2, ttl_seconds=60)
+    cache.put("a", {"answer": "A"})
+    cache.put("b", {"answer": "B"})
+    assert cache.get("a") == {"answer": "A"}
+    cache.put("c", {"answer": "C"})  # evicts b, the least recently used
+
+    assert cache.get("b") is None
+    assert cache.get("c") == {"answer": "C"}
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 2, 2)
+
+
+def test_sqlite_tier_shared_and_invalidated_by_corpus_change(tmp_path):
+    path = tmp_path / "answers.sqlite"
+    first = AnswerCache("c1", store=SqliteAnswerStore(path))
+    first.put("k", {"answer": "A"})
+
+    # Another worker sees the entry through the shared store
+    second = AnswerCache("c1", store=SqliteAnswerStore(path))
+    assert second.get("k") == {"answer": "A"}
+    assert second.stats()["store_hits"] == 1
+
+    # Reload against a new corpus purges the old answers
+    third = AnswerCache("c2", store=SqliteAnswerStore(path))
+    third.set_namespace("c1")
+    assert third.get("k") is None
+
+
+def _unit(*xs):
+    v = np.array(xs, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_semantic_cache_threshold_group_and_lru():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=2)
+    cache.put(_unit(1, 0, 0), "beginner", {"answer": "A"})
+    cache.put(_unit(0, 1, 0), "beginner", {"answer": "B"})
+
+    assert cache.get(_unit(1, 0.1, 0), "beginner") == {"answer": "A"}  # paraphrase
+    assert cache.get(_unit(1, 1, 0), "beginner") is None  # cos 0.71 < 0.9
+    assert cache.get(_unit(1, 0, 0), "intermediate") is None  # other mode
+
+    cache.put(_unit(0, 0, 1), "beginner", {"answer": "C"})  # evicts B
+    assert cache.get(_unit(0, 1, 0), "beginner") is None
+    assert cache.get(_unit(1, 0, 0), "beginner") == {"answer": "A"}
+    assert cache.stats()["evictions"] == 1
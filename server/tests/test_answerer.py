@@ -1,4 +1,15 @@
-from src.ft.answerer import answer_query
+import numpy as np
+
+from src.core.text_utils import tokenize
+from src.ft.answerer import (
+    StudyFeatures,
+    answer_query,
+    mode_training_weight,
+    outcome_weight,
+    rating_weight,
+    recency_weight,
+    tag_weight,
+)
 from src.retrieval.indexer import TfIdfIndex
 from src.core.models import Study, Passage
 
@@ -35,3 +46,75 @@ def test_answer_returns_citations():
     assert "Creatine increases strength" in ans.answer_text
     assert len(ans.references) == 1
     assert ans.references[0]["index"] == 1
+
+
+class _NoSearch:
+    def search(self, query, top_k=10):
+        raise AssertionError("precomputed results should be reused")
+
+
+def test_answer_reuses_precomputed_results():
+    study = Study(
+        id=1,
+        title="Test",
+        authors="A B",
+        year=2020,
+        doi=None,
+        journal=None,
+        rating=4.0,
+        tags=[],
+    )
+    passage = Passage(
+        id=1, study_id=1, section="abstract", text="Creatine increases strength."
+    )
+
+    ans = answer_query(
+        mode="beginner",
+        query="creatine strength",
+        retriever=_NoSearch(),
+        studies=[study],
+        results=[(passage, 0.8)],
+    )
+
+    assert "Creatine increases strength" in ans.answer_text
+    assert [r["study_id"] for r in ans.references] == [1]
+
+
+def test_study_features_match_scalar_weights():
+    studies = [
+        Study(
+            id=sid,
+            title=f"S{sid}",
+            authors="A B",
+            year=year,
+            doi=None,
+            journal=None,
+            rating=rating,
+            tags=tags,
+            training_status=status,
+            outcomes=outcomes,
+        )
+        for sid, year, rating, tags, status, outcomes in [
+            (3, 2025, 4.5, ["creatine", "strength"], "untrained", {}),
+            (7, 2019, 3.0, ["hypertrophy"], "trained", {"primary": ["hypertrophy"]}),
+            (9, 2010, 5.0, ["hiit"], "mixed", {"secondary": ["strength", "vo2"]}),
+        ]
+    ]
+    features = StudyFeatures(studies)
+    tokens = tokenize("creatine for strength and hypertrophy")
+    rows = features.rows(np.array([9, 3, 7]))
+
+    for mode in ("beginner", "intermediate"):
+        scores = features.scores(rows, np.array([0.5, 0.7, 0.9]), mode, tokens)
+        for study, best, score in zip(
+            [studies[2], studies[0], studies[1]], [0.5, 0.7, 0.9], scores
+        ):
+            expected = (
+                best
+                * mode_training_weight(mode, study.training_status)
+                * rating_weight(study.rating)
+                * recency_weight(study.year)
+                * tag_weight(tokens, study.tags)
+                * outcome_weight(" ".join(tokens), study.outcomes)
+            )
+            assert score == expected
@@ -0,0 +1,78 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.core.load_studies import corpus_hash
+from src.core.sqlite_store import SqliteStudyStore
+from src.core.store import StudyStore
+from src.retrieval.fts import Fts5Index
+
+STUDIES_DIR = Path(__file__).resolve().parent.parent / "data" / "studies"
+
+
+class FakeLLM:
+    def __init__(self):
+        self.contexts = []
+
+    async def generate_answer(self, instruction, query, context_passages):
+        self.contexts.append(context_passages)
+        return "Creatine helps [1]."
+
+
+@pytest.fixture(scope="module")
+def api_on_corpus_db(tmp_path_factory):
+    if not STUDIES_DIR.exists():
+        pytest.skip("no study corpus")
+    db_path = tmp_path_factory.mktemp("db") / "corpus.sqlite"
+    store = StudyStore.from_dir(STUDIES_DIR)
+    SqliteStudyStore(db_path).import_corpus(
+        store.studies, store.passages, corpus_hash(STUDIES_DIR)
+    )
+
+    mp = pytest.MonkeyPatch()
+    mp.setenv("CORPUS_DB", str(db_path))
+    mp.setenv("ANSWER_CACHE_DB", "")
+    mp.setenv("SEMANTIC_CACHE_SIZE", "0")
+    sys.modules.pop("src.api.main", None)
+    main = importlib.import_module("src.api.main")
+    try:
+        yield main
+    finally:
+        sys.modules.pop("src.api.main", None)
+        mp.undo()
+
+
+def test_ask_with_llm_compresses_context_on_fts_leg(api_on_corpus_db, monkeypatch):
+    main = api_on_corpus_db
+    assert isinstance(main.retriever.tfidf, Fts5Index)
+    assert main.corpus_db.read_only  # the API never writes to CORPUS_DB
+    llm = FakeLLM()
+    monkeypatch.setattr(main, "get_llm", lambda: llm)
+    scored = []
+    similarities = Fts5Index.similarities
+
+    def spy(self, query, texts):
+        scores = similarities(self, query, texts)
+        scored.append(scores)
+        return scores
+
+    monkeypatch.setattr(Fts5Index, "similarities", spy)
+
+    resp = TestClient(main.app).post(
+        "/ask",
+        json={
+            "query": "does creatine increase strength",
+            "use_llm": True,
+            "context_token_budget": 60,
+        },
+    )
+
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["backend"] == "llm"
+    # Sentences were ranked by the FTS leg's BM25, not left unscored
+    assert scored and scored[0].max() > 0
+    ctx = llm.contexts[0]
+    assert ctx and sum(len(c["text"].split()) for c in ctx) <= 60 + 3 * len(ctx)
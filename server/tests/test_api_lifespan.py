@@ -0,0 +1,43 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+STUDIES_DIR = Path(__file__).resolve().parent.parent / "data" / "studies"
+
+
+@pytest.fixture(scope="module")
+def main():
+    if not STUDIES_DIR.exists():
+        pytest.skip("no study corpus")
+    mp = pytest.MonkeyPatch()
+    mp.setenv("CORPUS_DB", "")
+    mp.setenv("ANSWER_CACHE_DB", "")
+    mp.setenv("SEMANTIC_CACHE_SIZE", "0")
+    sys.modules.pop("src.api.main", None)
+    try:
+        yield importlib.import_module("src.api.main")
+    finally:
+        sys.modules.pop("src.api.main", None)
+        mp.undo()
+
+
+def test_app_serves_across_repeated_lifespans(main):
+    pools = []
+    for i in range(2):
+        with TestClient(main.app) as client:
+            pools.append(main.RETRIEVAL_EXECUTOR)
+            assert main.retriever.executor is main.SEARCH_LEG_EXECUTOR is not None
+            main._llm = object()  # as built by get_llm on an LLM request
+            resp = client.post(
+                "/ask", json={"query": f"creatine strength {i}", "use_llm": False}
+            )
+            assert resp.status_code == 200, resp.text
+
+        # Nothing from the closed lifespan is handed to the next one
+        assert main._llm is None
+        assert main.RETRIEVAL_EXECUTOR is None and main.retriever.executor is None
+
+    assert pools[0] is not pools[1]
@@ -0,0 +1,76 @@
+from math import log
+
+import pytest
+
+from src.retrieval.bm25 import Bm25Index, Bm25FIndex
+from src.core.models import Study, Passage
+
+
+def _passages():
+    return [
+        Passage(
+            id=1, study_id=1, section="abstract", text="Creatine increases strength."
+        ),
+        Passage(id=2, study_id=2, section="abstract", text="Running improves cardio."),
+        Passage(
+            id=3,
+            study_id=2,
+            section="results",
+            text="Running running running and some creatine.",
+        ),
+    ]
+
+
+def test_bm25_matches_formula():
+    idx = Bm25Index(k1=1.2, b=0.75)
+    idx.add_passages(_passages())
+    idx.build()
+
+    results = idx.search("creatine strength", top_k=3)
+    assert [p.id for p, _s in results] == [1, 3]
+
+    # Passage 1: 3 tokens, tf=1 for both query tokens; lengths 3, 3 and 5
+    n, avg_len = 3, 11 / 3
+    norm = 1.2 * (1 - 0.75 + 0.75 * 3 / avg_len)
+    idf_creatine = log(1 + (n - 2 + 0.5) / (2 + 0.5))
+    idf_strength = log(1 + (n - 1 + 0.5) / (1 + 0.5))
+    expected = (idf_creatine + idf_strength) * 2.2 / (1 + norm)
+    assert results[0][1] == pytest.approx(expected, rel=1e-5)
+
+
+def test_bm25f_uses_study_fields():
+    studies = [
+        Study(
+            id=1,
+            title="Creatine loading",
+            authors="A",
+            year=2020,
+            doi=None,
+            journal=None,
+            rating=4.0,
+            tags=["supplements"],
+        ),
+        Study(
+            id=2,
+            title="Endurance running",
+            authors="B",
+            year=2021,
+            doi=None,
+            journal=None,
+            rating=4.0,
+            tags=["creatine_timing"],
+        ),
+    ]
+    passages = [
+        Passage(id=1, study_id=1, section="methods", text="Participants lifted."),
+        Passage(id=2, study_id=2, section="methods", text="Participants ran."),
+    ]
+
+    idx = Bm25FIndex(studies)
+    idx.add_passages(passages)
+    idx.build()
+
+    # Neither passage text mentions these tokens, only titles / tags / sections do
+    assert [p.id for p, _s in idx.search("creatine loading")][0] == 1
+    assert [p.id for p, _s in idx.search("timing")] == [2]
+    assert len(idx.search("methods")) == 2
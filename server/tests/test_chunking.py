@@ -0,0 +1,85 @@
+import pytest
+
+from src.core.chunking import (
+    ChunkConfig,
+    chunk_passages,
+    chunk_spans,
+    estimate_word_pieces,
+    word_piece_counter,
+)
+from src.core.models import Passage
+
+
+def _sentences(n, words=10, start=0):
+    return " ".join(
+        " ".join(f"W{start + i}x{j}" for j in range(words - 1)) + f" end{start + i}."
+        for i in range(n)
+    )
+
+
+def test_chunks_are_bounded_overlapping_sentences():
+    text = _sentences(30)
+    config = ChunkConfig(max_words=50, overlap_words=20, min_paragraph_words=25)
+    spans = chunk_spans(text, config)
+
+    assert len(spans) > 1
+    for (start, end), (next_start, _next_end) in zip(spans, spans[1:]):
+        assert len(text[start:end].split()) <= 50
+        assert text[start:end].endswith(".")  # cut on a sentence end
+        assert start < next_start < end  # overlap, and always moving forward
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+
+
+def test_paragraph_end_is_preferred_cut():
+    text = _sentences(4) + "\n\n" + _sentences(4, start=10)
+    config = ChunkConfig(max_words=60, overlap_words=10, min_paragraph_words=30)
+    spans = chunk_spans(text, config)
+
+    assert text[spans[0][0] : spans[0][1]] == _sentences(4)
+    assert text[spans[1][0] : spans[1][1]] == _sentences(4, start=10)
+
+
+def test_chunk_passages_keeps_source_mapping():
+    text = _sentences(12)
+    section = Passage(id=7, study_id=3, section="results", text=text)
+    chunks = chunk_passages([section], ChunkConfig(max_words=40, overlap_words=10))
+
+    assert [c.id for c in chunks] == list(range(1, len(chunks) + 1))
+    for n, c in enumerate(chunks):
+        assert c.chunk_id == f"3:results:{n}"
+        assert (c.study_id, c.section, c.chunk_index) == (3, "results", n)
+        assert text[c.char_start : c.char_end] == c.text
+
+
+def _pieces(text, count):
+    return sum(count(w) for w in text.split())
+
+
+def test_chunks_stay_within_encoder_word_pieces():
+    # 160 words of this run far past 256 word pieces
+    stats = " ".join(
+        f"Lean mass rose by {i}.2 ± 0.3 kg (p<0.05; 95% CI 0.{i}–1.9)."
+        for i in range(60)
+    )
+    leaders = "Contents" + "." * 3000 + "87 References"
+    config = ChunkConfig()
+    count = estimate_word_pieces
+
+    for text in (stats, leaders):
+        spans = chunk_spans(text, config, count_pieces=count)
+        for start, end in spans:
+            assert _pieces(text[start:end], count) <= config.max_pieces
+            assert len(text[start:end].split()) <= config.max_words
+        assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    assert len(chunk_spans(stats, ChunkConfig(max_pieces=0), count)) < len(
+        chunk_spans(stats, config, count)
+    )
+
+
+def test_chunks_fit_the_real_encoder_tokenizer():
+    name, count = word_piece_counter()
+    if name != "wordpiece":
+        pytest.skip("encoder tokenizer not installed")
+    text = " ".join(f"VO2max {i}.7 ± 1.{i} mL·kg−1·min−1 (p<0.001)." for i in range(80))
+    for start, end in chunk_spans(text):
+        assert _pieces(text[start:end], count) <= ChunkConfig().max_pieces
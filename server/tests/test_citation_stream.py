@@ -0,0 +1,70 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.api.streaming import CitationStream
+
+STUDIES_DIR = Path(__file__).resolve().parent.parent / "data" / "studies"
+
+ANSWER = "Creatine helps [2] and [1, 3]. Unknown [9] is dropped , and [2,2] dedupes [1"
+
+
+def _stream(text, step):
+    return _stream_with(text, [1, 2, 3], step)
+
+
+def _stream_with(text, valid, step=3):
+    stream = CitationStream(valid)
+    parts = [stream.feed(text[i : i + step]) for i in range(0, len(text), step)]
+    parts.append(stream.finish())
+    return "".join(parts), stream.index_map
+
+
+def test_renumbers_on_first_appearance_whatever_the_chunking():
+    expected = "Creatine helps [1] and [2, 3]. Unknown is dropped, and [1] dedupes [1"
+    for step in (1, 2, 3, 7, len(ANSWER)):
+        text, index_map = _stream(ANSWER, step)
+        assert text == expected
+        assert index_map == {2: 1, 1: 2, 3: 3}
+
+
+def test_partial_group_is_held_back():
+    stream = CitationStream([1, 3])
+    assert stream.feed("See [1, ") == "See"
+    assert stream.feed("3] and [") == " [1, 2] and"
+    assert stream.feed("x]") == " [x]"
+
+
+@pytest.fixture(scope="module")
+def main():
+    if not STUDIES_DIR.exists():
+        pytest.skip("no study corpus")
+    mp = pytest.MonkeyPatch()
+    mp.setenv("CORPUS_DB", "")
+    mp.setenv("ANSWER_CACHE_DB", "")
+    sys.modules.pop("src.api.main", None)
+    try:
+        yield importlib.import_module("src.api.main")
+    finally:
+        sys.modules.pop("src.api.main", None)
+        mp.undo()
+
+
+@pytest.mark.parametrize(
+    "answer, valid",
+    [
+        (ANSWER, [1, 2, 3]),
+        # No valid citation at all: unknown groups still go, on both paths
+        ("Creatine helps [9] and  [4, 5] .", [1, 2]),
+        ("Creatine helps [9].", []),
+    ],
+)
+def test_stream_and_batch_give_the_same_text(main, answer, valid):
+    refs = [main.CitationRef(index=i, study_id=10 + i, title=None) for i in valid]
+    batch_text, batch_refs = main.filter_and_renumber_citations(answer, refs)
+    stream_text, index_map = _stream_with(answer, valid)
+
+    assert stream_text == batch_text
+    assert {c.index for c in batch_refs} == set(index_map.values())
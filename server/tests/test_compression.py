@@ -0,0 +1,88 @@
+import pytest
+
+from src.core.models import Passage, Study
+from src.ft.compression import compress_context
+from src.retrieval.bm25 import Bm25FIndex, Bm25Index
+from src.retrieval.indexer import TfIdfIndex
+
+
+def test_compression_keeps_citations_and_budget():
+    filler = " ".join(
+        f"Filler sentence number {i} about nothing much." for i in range(40)
+    )
+    ctx = [
+        {
+            "study_id": 11,
+            "citation_index": 1,
+            "section": "results",
+            "text": filler + " Creatine increased strength in untrained lifters.",
+        },
+        {
+            "study_id": 22,
+            "citation_index": 2,
+            "section": "discussion",
+            "text": "Protein intake supports hypertrophy. " + filler,
+        },
+    ]
+    index = TfIdfIndex()
+    index.add_passages(
+        [
+            Passage(
+                id=i + 1, study_id=c["study_id"], section=c["section"], text=c["text"]
+            )
+            for i, c in enumerate(ctx)
+        ]
+    )
+    index.build()
+
+    out = compress_context("creatine strength", ctx, token_budget=20, sparse=index)
+
+    assert [(c["study_id"], c["citation_index"], c["section"]) for c in out] == [
+        (11, 1, "results"),
+        (22, 2, "discussion"),
+    ]
+    assert "Creatine increased strength in untrained lifters." in out[0]["text"]
+    assert out[1]["text"]  # every cited study keeps an excerpt
+    assert sum(len(c["text"].split()) for c in out) < 30
+    assert ctx[0]["text"].startswith("Filler")  # input untouched
+
+
+@pytest.mark.parametrize(
+    "make_index",
+    [
+        TfIdfIndex,
+        Bm25Index,
+        lambda: Bm25FIndex(
+            [
+                Study(
+                    id=1,
+                    title="Study",
+                    authors="A",
+                    year=2020,
+                    doi=None,
+                    journal=None,
+                    rating=4.0,
+                    tags=[],
+                )
+            ]
+        ),
+        object,  # no similarities(): skipped, never raises
+    ],
+)
+def test_compression_accepts_any_sparse_backend(make_index):
+    text = (
+        "Sleep was not measured. Creatine raised bench press strength. "
+        "Participants were students."
+    )
+    ctx = [{"study_id": 1, "citation_index": 1, "section": "results", "text": text}]
+    index = make_index()
+    if hasattr(index, "build"):
+        index.add_passages([Passage(id=1, study_id=1, section="results", text=text)])
+        index.build()
+
+    out = compress_context("creatine strength", ctx, token_budget=1, sparse=index)
+
+    expected = "Sleep was not measured."  # unscored: earliest sentence wins
+    if hasattr(index, "similarities"):
+        expected = "… Creatine raised bench press strength."
+    assert out[0]["text"] == expected
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from src.core.corpus_pack import StalePackError, write_corpus_pack
+from src.core.load_studies import corpus_hash
+from src.core.store import StudyStore, load_or_build_store
+from src.retrieval.filters import SearchFilters
+from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.indexer import TfIdfIndex
+
+
+def _write_studies(studies_dir):
+    studies_dir.mkdir()
+    for sid, doi in [(1, "10.1/x"), (2, None)]:
+        data = {
+            "id": sid,
+            "title": f"Study {sid} – créatine",
+            "authors": "A B",
+            "year": 2020 + sid,
+            "doi": doi,
+            "rating": 4.5,
+            "tags": ["creatine", "strength"],
+            "population": {"training_status": "trained", "n": 20},
+            "outcomes": {"primary": ["strength"]},
+            "sections": {
+                "abstract": "Creatine increased strength. " * 80,
+                "results": "Lean mass rose by 1.2 kg.",
+            },
+        }
+        (studies_dir / f"{sid}.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+def test_pack_round_trips_and_decodes_lazily(tmp_path):
+    studies_dir = tmp_path / "studies"
+    _write_studies(studies_dir)
+    store = StudyStore.from_dir(studies_dir)
+    digest = corpus_hash(studies_dir)
+
+    pack_path = tmp_path / "corpus.pack"
+    write_corpus_pack(pack_path, store.studies, store.passages, digest)
+    packed = StudyStore.from_pack(pack_path, corpus_hash=digest)
+
+    assert packed.studies == store.studies
+    assert packed.passages[-1] == store.passages[-1]
+    assert packed.passages._decoded[0] is None  # nothing decoded up front
+    assert list(packed.passages) == list(store.passages)
+    assert packed.passages[0] is packed.passages[0]
+    assert packed.get_study_by_id(2).doi is None
+
+    with pytest.raises(StalePackError):
+        StudyStore.from_pack(pack_path, corpus_hash="other")
+
+
+def test_missing_or_stale_pack_is_written_on_load(tmp_path):
+    studies_dir = tmp_path / "studies"
+    _write_studies(studies_dir)
+    digest = corpus_hash(studies_dir)
+    pack_path = tmp_path / "index" / "corpus.pack"
+    pack_path.parent.mkdir()
+
+    built = load_or_build_store(pack_path, studies_dir, digest)
+    assert isinstance(built.passages, list) and pack_path.exists()
+
+    # Next start maps the pack it left behind
+    packed = load_or_build_store(pack_path, studies_dir, digest)
+    assert packed.passages._decoded[0] is None
+    assert list(packed.passages) == list(built.passages)
+
+    # A pack for another corpus version is replaced
+    rebuilt = load_or_build_store(pack_path, studies_dir, "other")
+    assert isinstance(rebuilt.passages, list)
+    assert StudyStore.from_pack(pack_path, corpus_hash="other").studies == (
+        built.studies
+    )
+
+
+def test_startup_consumers_read_pack_columns_only(tmp_path):
+    studies_dir = tmp_path / "studies"
+    _write_studies(studies_dir)
+    store = StudyStore.from_dir(studies_dir)
+    digest = corpus_hash(studies_dir)
+    index = TfIdfIndex()
+    index.add_passages(store.passages)
+    index.build()
+    index.save(tmp_path / "tfidf", digest)
+
+    pack_path = tmp_path / "corpus.pack"
+    write_corpus_pack(pack_path, store.studies, store.passages, digest)
+    packed = StudyStore.from_pack(pack_path, corpus_hash=digest)
+
+    # What the API does at boot, with a fresh saved TF-IDF index
+    r = HybridRetriever(sparse=TfIdfIndex.load(tmp_path / "tfidf", packed.passages))
+    r.add_passages(packed.passages, studies=packed.studies)
+    assert all(p is None for p in packed.passages._decoded)
+
+    # Search decodes the hits only
+    results = r.search("lean mass", top_k=1, filters=SearchFilters(study_ids=[2]))
+    assert results[0][0] == store.passages[-1]
+    assert sum(p is not None for p in packed.passages._decoded) < len(packed.passages)
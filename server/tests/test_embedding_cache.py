@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.retrieval.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+
+
+def test_embedding_cache_only_encodes_new_texts(tmp_path):
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    cache = EmbeddingCache(tmp_path, "test/model")
+    first = cache.get_or_encode(["creatine", "protein"], encode)
+    assert calls == [["creatine", "protein"]]
+
+    # Unchanged corpus: served from the memory map, no encoding
+    again = EmbeddingCache(tmp_path, "test/model").get_or_encode(
+        ["creatine", "protein"], encode
+    )
+    assert isinstance(again, np.memmap)
+    assert np.array_equal(first, again)
+    assert len(calls) == 1
+
+    # Changed corpus: only the new text is encoded, rows follow the request order
+    updated = cache.get_or_encode(["sleep", "creatine"], encode)
+    assert calls[-1] == ["sleep"]
+    assert updated.tolist() == [[5.0, 1.0], [8.0, 1.0]]
+
+    # Other model names don't share entries
+    EmbeddingCache(tmp_path, "other/model").get_or_encode(["creatine"], encode)
+    assert calls[-1] == ["creatine"]
+
+
+def test_query_cache_lru_and_persistence(tmp_path):
+    calls = []
+
+    def encode(query):
+        calls.append(query)
+        return np.array([len(query), 1.0], dtype=np.float32)
+
+    path = tmp_path / "queries.npz"
+    cache = QueryEmbeddingCache("test/model", max_entries=2, path=path)
+    cache.get_or_encode("Is creatine safe?", encode)
+    cache.get_or_encode("is creatine safe", encode)  # same normalised key
+    cache.get_or_encode("protein timing", encode)
+    cache.get_or_encode("deload weeks", encode)  # evicts the creatine query
+    assert calls == ["Is creatine safe?", "protein timing", "deload weeks"]
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 3, "evictions": 1}
+    cache.save()
+
+    reloaded = QueryEmbeddingCache("test/model", path=path)
+    reloaded.get_or_encode("protein timing", encode)
+    assert reloaded.stats()["hits"] == 1 and len(calls) == 3
+
+    # Another model never reuses these encodings
+    assert QueryEmbeddingCache("other/model", path=path).stats()["entries"] == 0
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.retrieval.encode_batcher import QueryEncodeBatcher
+
+
+def _encode(texts):
+    time.sleep(0.01)  # fixed per-call cost, like a model forward pass
+    return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_concurrent_encodes_share_batches():
+    batcher = QueryEncodeBatcher(_encode, max_batch=8, max_wait_ms=20)
+    texts = [f"query {'x' * i}" for i in range(16)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(batcher.encode, texts))
+    batcher.close()
+
+    assert [r[0] for r in results] == [len(t) for t in texts]
+    stats = batcher.stats()
+    assert stats["items"] == 16 and stats["batches"] <= 4
+
+
+def test_async_callers_and_failed_batch():
+    calls = []
+
+    def flaky(texts):
+        calls.append(list(texts))
+        if len(calls) == 1:
+            raise RuntimeError("encoder crashed")
+        return _encode(texts)
+
+    async def main():
+        batcher = QueryEncodeBatcher(flaky, max_batch=4, max_wait_ms=20)
+        first = await asyncio.gather(
+            batcher.encode_async("a"), batcher.encode_async("b"), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in first)
+        # The next batch is unaffected
+        second = await asyncio.gather(
+            batcher.encode_async("cc"), batcher.encode_async("d")
+        )
+        assert [r[0] for r in second] == [2, 1]
+        batcher.close()
+        with pytest.raises(RuntimeError):
+            batcher.submit("late")
+
+    asyncio.run(main())
+
+
+class _Model:
+    def __init__(self, _name):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return _encode(texts)
+
+
+def test_dense_async_and_sync_queries_share_batches(monkeypatch):
+    import src.retrieval.dense_retriever as dense_retriever
+
+    monkeypatch.setattr(dense_retriever, "SentenceTransformer", _Model)
+    dense = dense_retriever.DenseRetriever(query_batch_size=8, query_batch_wait_ms=50)
+    sync_texts = [f"sync {'x' * i}" for i in range(4)]
+    async_texts = [f"async {'y' * i}" for i in range(4)]
+
+    async def main():
+        # Threadpool callers block on the batcher while the loop awaits it
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            sync = [
+                loop.run_in_executor(pool, dense.encode_query, t) for t in sync_texts
+            ]
+            return await asyncio.gather(
+                *sync, *(dense.encode_query_async(t) for t in async_texts)
+            )
+
+    results = asyncio.run(main())
+    stats = dense.batcher.stats()
+    dense.close()
+
+    expected = _encode(sync_texts + async_texts)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    np.testing.assert_allclose(np.stack(results), expected, rtol=1e-5)
+    assert stats["items"] == 8 and stats["batches"] < 8
+    # Both paths fill the same query cache: repeats don't reach the model
+    calls = len(dense.model.calls)
+    again = asyncio.run(dense.encode_query_async(sync_texts[0]))
+    np.testing.assert_allclose(again, results[0])
+    dense.encode_query(async_texts[0])
+    assert len(dense.model.calls) == calls
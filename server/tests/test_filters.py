@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from src.core.models import Passage, Study
+from src.retrieval.bm25 import Bm25FIndex, Bm25Index
+from src.retrieval.filters import FilterIndex, SearchFilters
+from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.indexer import TfIdfIndex
+
+STUDIES = [
+    Study(
+        id=sid,
+        title=f"Study {sid}",
+        authors="A B",
+        year=year,
+        doi=None,
+        journal=None,
+        rating=4.0,
+        tags=tags,
+        training_status=status,
+    )
+    for sid, year, tags, status in [
+        (1, 2012, ["creatine"], "trained"),
+        (2, 2018, ["creatine", "hypertrophy"], "untrained"),
+        (3, 2021, ["hypertrophy"], "trained"),
+    ]
+]
+
+PASSAGES = [
+    Passage(id=i + 1, study_id=sid, section=section, text=text)
+    for i, (sid, section, text) in enumerate(
+        [
+            (1, "abstract", "creatine supplementation increased strength"),
+            (1, "results", "creatine and strength gains in trained lifters"),
+            (2, "abstract", "creatine improved muscle strength and size"),
+            (2, "discussion", "hypertrophy followed creatine loading"),
+            (3, "abstract", "training volume drives hypertrophy and strength"),
+            (3, "Results", "strength rose with higher volume"),
+        ]
+    )
+]
+
+
+def test_filter_index_masks_combine_fields():
+    fi = FilterIndex(PASSAGES, STUDIES)
+
+    def allowed(**kw):
+        return np.flatnonzero(fi.mask(SearchFilters(**kw))).tolist()
+
+    assert fi.mask(SearchFilters()) is None
+    assert allowed(year_min=2015) == [2, 3, 4, 5]
+    assert allowed(tags=["creatine"], training_status=["trained"]) == [0, 1]
+    assert allowed(sections=["RESULTS", "discussion"]) == [1, 3, 5]
+    assert allowed(study_ids=[3], year_max=2020) == []
+
+
+def test_study_filters_without_studies_raise():
+    fi = FilterIndex(PASSAGES)
+
+    # Passage-level fields still work
+    sections = fi.mask(SearchFilters(sections=["results"]))
+    assert np.flatnonzero(sections).tolist() == [1, 5]
+    for kw in ({"year_min": 2015}, {"tags": ["creatine"]}, {"training_status": ["x"]}):
+        with pytest.raises(ValueError, match="studies"):
+            fi.mask(SearchFilters(**kw))
+
+
+@pytest.mark.parametrize(
+    "make_index", [TfIdfIndex, Bm25Index, lambda: Bm25FIndex(STUDIES)]
+)
+def test_filtered_sparse_search_equals_post_filtering(make_index):
+    idx = make_index()
+    idx.add_passages(PASSAGES, studies=STUDIES)
+    idx.build()
+
+    filters = SearchFilters(year_min=2015)
+    full = idx.search("creatine strength", top_k=len(PASSAGES))
+    expected = [(p, s) for p, s in full if p.study_id != 1][:2]
+
+    assert idx.search("creatine strength", top_k=2, filters=filters) == expected
+
+
+def test_hybrid_filters_restrict_results():
+    r = HybridRetriever()
+    r.dense = None  # sparse-only, no model needed
+    r.add_passages(PASSAGES, studies=STUDIES)
+
+    filters = SearchFilters(tags=["hypertrophy"])
+    results = r.search("creatine", top_k=2, filters=filters)
+    # Study 1 outscores both, unfiltered it would take the top slot
+    assert results and {p.study_id for p, _s in results} == {2}
+    assert r.search("creatine", top_k=1)[0][0].study_id == 1
+
+    mask = np.zeros(len(PASSAGES), dtype=bool)
+    assert r.search("creatine", filters=mask) == []
+    with pytest.raises(ValueError):
+        r.search("creatine", filters=np.ones(3, dtype=bool))
+
+
+def test_sparse_index_without_studies_rejects_study_filters():
+    idx = TfIdfIndex()
+    idx.add_passages(PASSAGES)
+    idx.build()
+
+    with pytest.raises(ValueError, match="studies"):
+        idx.search("creatine", filters=SearchFilters(year_min=2015))
+    found = idx.search("creatine", filters=SearchFilters(study_ids=[2]))
+    assert found and {p.study_id for p, _s in found} == {2}
@@ -0,0 +1,97 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.core.models import Passage
+from src.retrieval.hybrid_retriever import HybridRetriever
+
+
+class _Leg:
+    def __init__(self, scores, delay, barrier=None):
+        self.scores = scores  # passage id -> score
+        self.delay = delay
+        self.barrier = barrier  # passes only once both legs are running
+        self.enabled = True
+
+    def search(self, query, top_k=10, filters=None):
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+        time.sleep(self.delay)
+        ranked = sorted(self.scores.items(), key=lambda kv: -kv[1])[:top_k]
+        return [(PASSAGES[pid], score) for pid, score in ranked]
+
+
+PASSAGES = [Passage(id=i, study_id=i, section="s", text=f"p{i}") for i in range(6)]
+
+
+def _retriever(dense_delay, barrier=None, **kwargs):
+    r = HybridRetriever(tfidf_weight=0.5, dense_weight=0.5, **kwargs)
+    r.tfidf = _Leg({0: 0.9, 1: 0.5, 2: 0.1}, delay=0.05, barrier=barrier)
+    r.dense = _Leg({2: 0.8, 3: 0.6, 4: 0.2}, delay=dense_delay, barrier=barrier)
+    r.passages = PASSAGES
+    return r
+
+
+def test_parallel_legs_match_sequential_and_overlap():
+    sequential = _retriever(0.05).search_detailed("q", top_k=4)
+    # Each leg waits for the other to start, which run one after the other can't do
+    both_running = threading.Barrier(2)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        r = _retriever(0.05, barrier=both_running, executor=pool)
+        parallel = r.search_detailed("q", top_k=4)
+
+    assert parallel == sequential and not parallel.degraded
+    assert not both_running.broken
+
+
+def test_executor_without_dense_leg_runs_sparse_only():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        r = _retriever(0.05, executor=pool)
+        r.dense = None
+        found = r.search_detailed("q", top_k=4)
+
+    assert not found.degraded
+    assert [p.id for p, _s in found.results] == [0, 1]  # sparse ranking only
+
+
+def test_slow_dense_leg_falls_back_to_sparse_only():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        r = _retriever(0.5, executor=pool, dense_timeout=0.1)
+        found = r.search_detailed("q", top_k=4)
+
+    assert found.degraded and found.missed_legs == ["dense"]
+    assert [p.id for p, _s in found.results] == [0, 1]  # sparse ranking only
+
+
+def test_fusion_ties_keep_corpus_order():
+    r = HybridRetriever(tfidf_weight=0.5, dense_weight=0.5)
+    r.passages = PASSAGES
+    sparse = [(PASSAGES[4], 1.0), (PASSAGES[1], 1.0), (PASSAGES[3], 0.0)]
+    dense = [(PASSAGES[5], 2.0), (PASSAGES[2], 1.0)]
+
+    fused = r._fuse(sparse, dense, 0.5, 0.5, top_k=3)
+    # 1, 4 and 5 all fuse to 0.5; 2 scores 0 on dense and is dropped
+    assert [(p.id, s) for p, s in fused] == [(1, 0.5), (4, 0.5), (5, 0.5)]
+
+
+def test_rrf_and_zscore_fusion():
+    sparse = [(PASSAGES[0], 9.0), (PASSAGES[1], 8.0), (PASSAGES[2], 1.0)]
+    dense = [(PASSAGES[2], 0.9), (PASSAGES[0], 0.2)]
+
+    rrf = HybridRetriever(fusion="rrf", rrf_k=60)
+    rrf.passages = PASSAGES
+    fused = rrf._fuse(sparse, dense, 0.5, 0.5, top_k=3)
+    # Ranks only: 0 is (1st, 2nd), 2 is (3rd, 1st), 1 is (2nd, absent)
+    assert [p.id for p, _s in fused] == [0, 2, 1]
+    assert fused[0][1] == 0.5 / 61 + 0.5 / 62
+
+    z = HybridRetriever(fusion="zscore")
+    z.passages = PASSAGES
+    assert [p.id for p, _s in z._fuse(sparse, dense, 0.5, 0.5, top_k=3)] == [0, 2, 1]
+
+
+def test_unknown_fusion_mode_rejected():
+    with pytest.raises(ValueError):
+        HybridRetriever(fusion="max")
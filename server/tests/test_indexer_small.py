@@ -1,5 +1,12 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
 from src.retrieval.indexer import TfIdfIndex
+from src.retrieval.index_store import StaleIndexError
 from src.core.models import Passage
+from src.core.text_utils import tokenize
 
 
 def test_indexer_simple():
@@ -19,3 +26,126 @@ def test_indexer_simple():
     top_passage, score = results[0]
     assert top_passage.study_id == 1
     assert score > 0
+
+
+def _dense_tfidf_ranking(texts, query, top_k):
+    """
+    Reference: the original dense TF-IDF cosine search, computed from scratch
+    """
+    docs = [Counter(tokenize(t)) for t in texts]
+    vocab = {t: j for j, t in enumerate(dict.fromkeys(t for d in docs for t in d))}
+    df = np.zeros(len(vocab))
+    for d in docs:
+        for t in d:
+            df[vocab[t]] += 1
+    idf = np.log((1.0 + len(docs)) / (1.0 + df)) + 1.0
+
+    matrix = np.zeros((len(docs), len(vocab)))
+    for i, d in enumerate(docs):
+        length = sum(d.values())
+        for t, c in d.items():
+            matrix[i, vocab[t]] = c / length * idf[vocab[t]]
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-8
+
+    q = Counter(tokenize(query))
+    vector = np.zeros(len(vocab))
+    for t, c in q.items():
+        if t in vocab:
+            vector[vocab[t]] = c / sum(q.values()) * idf[vocab[t]]
+    vector /= np.linalg.norm(vector) + 1e-8
+    scores = matrix @ vector
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [(int(i), float(scores[i])) for i in order if scores[i] > 0]
+
+
+def test_indexer_matches_dense_tfidf_rankings():
+    rng = np.random.default_rng(1)
+    words = [
+        "creatine", "strength", "hypertrophy", "protein", "sleep", "volume",
+        "trained", "untrained", "squat", "bench", "recovery", "fatigue",
+        "muscle", "lean", "mass", "cardio", "running", "intensity",
+    ]  # fmt: skip
+    texts = [" ".join(rng.choice(words, size=rng.integers(2, 25))) for _ in range(300)]
+    passages = [
+        Passage(id=i + 1, study_id=i + 1, section="abstract", text=t)
+        for i, t in enumerate(texts)
+    ]
+
+    idx = TfIdfIndex()
+    idx.add_passages(passages)
+    idx.build()
+    assert idx.doc_token_counts == []  # build step frees the raw counts
+    assert idx.passage_vectors.data.dtype == np.float32
+
+    for _ in range(100):
+        query = " ".join(rng.choice(words, size=rng.integers(1, 5)))
+        expected = _dense_tfidf_ranking(texts, query, top_k=10)
+        got = [(p.id - 1, s) for p, s in idx.search(query, top_k=10)]
+
+        assert len(got) == len(expected)
+        for (i, s), (j, ref) in zip(got, expected):
+            # float32 storage: rows may only swap places when their scores tie
+            assert s == pytest.approx(ref, abs=1e-5)
+            if i != j:
+                assert abs(ref - dict(expected).get(i, -1.0)) < 1e-5
+
+
+def test_indexer_posting_lists_give_exact_top_k():
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(40)]
+    passages = [
+        Passage(
+            id=i + 1,
+            study_id=i + 1,
+            section="abstract",
+            text=" ".join(rng.choice(words, size=rng.integers(3, 30))),
+        )
+        for i in range(200)
+    ]
+
+    idx = TfIdfIndex()
+    idx.add_passages(passages)
+    idx.build()
+
+    for _ in range(50):
+        query = " ".join(rng.choice(words, size=rng.integers(1, 6)))
+        counts = {t: query.split().count(t) for t in set(query.split())}
+
+        # Brute force over every passage
+        vector = np.zeros(len(idx.vocab))
+        for token, count in counts.items():
+            j = idx.vocab[token]
+            vector[j] = count / len(query.split()) * idx.idf[j]
+        vector = vector / (np.linalg.norm(vector) + 1e-8)
+        scores = idx.passage_vectors.dot(vector)
+        expected = list(np.lexsort((np.arange(len(scores)), -scores))[:10])
+
+        results = idx.search(query, top_k=10)
+        assert [p.id - 1 for p, _s in results] == expected
+        assert np.allclose([s for _p, s in results], scores[expected])
+
+
+def test_indexer_save_load_roundtrip(tmp_path):
+    passages = [
+        Passage(
+            id=1, study_id=1, section="abstract", text="Creatine increases strength."
+        ),
+        Passage(id=2, study_id=2, section="abstract", text="Running improves cardio."),
+    ]
+
+    idx = TfIdfIndex()
+    idx.add_passages(passages)
+    idx.build()
+    idx.save(tmp_path / "tfidf", corpus_hash="abc")
+
+    loaded = TfIdfIndex.load(tmp_path / "tfidf", passages, corpus_hash="abc")
+    assert isinstance(loaded.passage_vectors.data, np.memmap)
+    assert [(p.id, s) for p, s in loaded.search("running cardio")] == [
+        (p.id, s) for p, s in idx.search("running cardio")
+    ]
+
+    # Different corpus or passage list: refuse to load
+    with pytest.raises(StaleIndexError):
+        TfIdfIndex.load(tmp_path / "tfidf", passages, corpus_hash="other")
+    with pytest.raises(StaleIndexError):
+        TfIdfIndex.load(tmp_path / "tfidf", passages[:1], corpus_hash="abc")
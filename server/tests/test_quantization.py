@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from src.retrieval.quantization import QuantizedVectors, rescore
+
+
+def _unit_rows(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _clustered_rows(n, dim, seed=0):
+    # Embeddings cluster by topic; sign codes rely on that structure
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    x = centers[rng.integers(0, 20, n)] + rng.normal(size=(n, dim))
+    x = x.astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize(
+    "mode, min_overlap", [("float16", 1.0), ("int8", 1.0), ("binary", 0.9)]
+)
+def test_quantised_candidates_rescored_match_exact(mode, min_overlap):
+    vectors = _clustered_rows(2000, 128)
+    quantized = QuantizedVectors.from_vectors(vectors, mode)
+    assert quantized.nbytes < vectors.nbytes / 1.9
+
+    rng = np.random.default_rng(1)
+    queries = vectors[:20] + 0.05 * rng.normal(size=(20, 128)).astype(np.float32)
+    hits = 0
+    for q in queries:
+        exact = np.argsort(-(vectors @ q), kind="stable")[:10]
+        rows, scores = rescore(vectors, q, quantized.candidates(q, 100), 10)
+        assert np.allclose(scores, vectors[rows] @ q)
+        hits += len(set(rows.tolist()) & set(exact.tolist()))
+    assert hits / (10 * len(queries)) >= min_overlap
+
+
+def test_binary_codes_are_one_bit_per_dimension():
+    vectors = _unit_rows(10, 384)
+    quantized = QuantizedVectors.from_vectors(vectors, "binary")
+    assert quantized.codes.shape == (10, 48)
+    # A row is at Hamming distance 0 from itself
+    assert quantized.approx_scores(vectors[3])[3] == 0
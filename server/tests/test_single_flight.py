@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from src.api.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flights = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*[flights.do("k", work) for _ in range(5)])
+        assert results == [1] * 5
+        # Finished flights are forgotten, the next call runs again
+        assert await flights.do("k", work) == 2
+        assert flights.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 4}
+
+    asyncio.run(main())
+
+
+def test_failure_and_cancellation_do_not_poison_waiters():
+    async def main():
+        flights = SingleFlight()
+
+        async def boom():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        with pytest.raises(RuntimeError):
+            await flights.do("k", boom)
+
+        async def ok():
+            await asyncio.sleep(0.02)
+            return "answer"
+
+        first = asyncio.ensure_future(flights.do("k", ok))
+        second = asyncio.ensure_future(flights.do("k", ok))
+        await asyncio.sleep(0)
+        first.cancel()  # the leader's client goes away
+        assert await second == "answer"
+        assert first.cancelled()
+
+    asyncio.run(main())
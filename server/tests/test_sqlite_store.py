@@ -0,0 +1,110 @@
+import sqlite3
+
+import pytest
+
+from src.core.models import Passage, Study
+from src.core.sqlite_store import SqliteStudyStore
+from src.retrieval.filters import SearchFilters
+from src.retrieval.fts import Fts5Index
+from src.retrieval.hybrid_retriever import HybridRetriever
+
+
+def _study(sid, year, tags):
+    return Study(
+        id=sid,
+        title=f"S{sid}",
+        authors="A B",
+        year=year,
+        doi=None,
+        journal="J",
+        rating=4.0,
+        tags=tags,
+        outcomes={"primary": ["strength"]},
+    )
+
+
+STUDIES = [_study(4, 2015, ["creatine"]), _study(2, 2022, ["creatine", "sleep"])]
+PASSAGES = [
+    Passage(id=1, study_id=4, section="abstract", text="Creatine raised strength."),
+    Passage(id=2, study_id=4, section="Results", text="Lean mass was unchanged."),
+    Passage(id=3, study_id=2, section="results", text="Creatine and sleep quality."),
+]
+
+
+def test_sqlite_store_round_trips_and_upserts(tmp_path):
+    db = SqliteStudyStore(tmp_path / "corpus.sqlite")
+    db.import_corpus(STUDIES, PASSAGES, corpus_hash="h1")
+
+    reopened = SqliteStudyStore(tmp_path / "corpus.sqlite")
+    assert reopened.corpus_hash == "h1"
+    assert reopened.studies == STUDIES  # load order kept
+    assert reopened.get_all_passages() == PASSAGES
+    assert [p.id for p in reopened.get_passages_for_section("RESULTS")] == [2, 3]
+    assert reopened.get_passage_rows_for_study(2) == range(2, 3)
+    assert reopened.get_passage_rows_for_study(9) == []
+    assert reopened.get_study_ids_for_tag("creatine") == [4, 2]
+    assert reopened.get_studies_by_ids({2, 4, 9}) == STUDIES
+
+    fts = Fts5Index(reopened)
+    assert [p.id for p, _s in fts.search("lean mass")] == [2]
+
+    # An upsert replaces the study's passages, searchable once committed
+    db.upsert_study(
+        STUDIES[0],
+        [Passage(id=1, study_id=4, section="abstract", text="Protein and mass.")],
+    )
+    assert reopened.get_passage_by_id(2) is None
+    assert [p.id for p, _s in fts.search("protein")] == [1]
+    assert fts.search("lean") == []
+
+    db.delete_study(2)
+    assert reopened.get_study_by_id(2) is None
+    assert fts.search("sleep") == []
+
+
+def test_fts_index_as_hybrid_sparse_leg(tmp_path):
+    db = SqliteStudyStore(tmp_path / "corpus.sqlite")
+    db.import_corpus(STUDIES, PASSAGES)
+
+    r = HybridRetriever(sparse=Fts5Index(db))
+    r.dense = None  # sparse-only, no model needed
+    r.add_passages(PASSAGES, studies=STUDIES)
+
+    results = r.search("creatine", top_k=2)
+    assert results and {p.id for p, _s in results} <= {1, 3}
+    # The hybrid's own Passage objects come back, not copies from the DB
+    assert all(any(p is q for q in PASSAGES) for p, _s in results)
+
+    filtered = r.search("creatine", top_k=2, filters=SearchFilters(year_min=2020))
+    assert [p.id for p, _s in filtered] == [3]
+
+    # Building a retriever never writes to the corpus DB
+    extra = Passage(id=9, study_id=2, section="results", text="Not imported.")
+    with pytest.raises(ValueError):
+        Fts5Index(db).add_passages(PASSAGES + [extra])
+    assert db.get_passage_by_id(9) is None
+
+
+def test_read_only_store_never_creates_or_writes(tmp_path):
+    missing = tmp_path / "typo" / "corpus.sqlite"
+    with pytest.raises(FileNotFoundError):
+        SqliteStudyStore(missing, read_only=True)
+    assert not missing.parent.exists()
+
+    writer = SqliteStudyStore(tmp_path / "corpus.sqlite")
+    writer.import_corpus(STUDIES, PASSAGES, corpus_hash="v1")
+    db = SqliteStudyStore(tmp_path / "corpus.sqlite", read_only=True)
+    assert db.corpus_hash == "v1" and db.get_passage_by_id(1) == PASSAGES[0]
+    with pytest.raises(sqlite3.OperationalError):
+        db.upsert_passages(PASSAGES[:1])
+
+    # The hybrid serves the passages it started with; later writes need a restart
+    r = HybridRetriever(sparse=Fts5Index(db))
+    r.dense = None
+    r.add_passages(PASSAGES, studies=STUDIES)
+    writer.upsert_passages(
+        [Passage(id=9, study_id=1, section="results", text="Creatine creatine.")]
+    )
+    assert 9 not in {p.id for p, _s in r.search("creatine", top_k=5)}
+    writer.close()
+    db.close()
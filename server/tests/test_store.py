@@ -0,0 +1,39 @@
+from src.core.models import Passage, Study
+from src.core.store import StudyStore
+
+
+def _study(sid, tags):
+    return Study(
+        id=sid,
+        title=f"S{sid}",
+        authors="A B",
+        year=2020,
+        doi=None,
+        journal=None,
+        rating=4.0,
+        tags=tags,
+    )
+
+
+def test_store_indexes_match_linear_scans():
+    studies = [_study(5, ["creatine", "strength"]), _study(2, ["strength"])]
+    passages = [
+        Passage(id=10, study_id=5, section="abstract", text="a"),
+        Passage(id=11, study_id=5, section="Results", text="b"),
+        Passage(id=12, study_id=2, section="results", text="c"),
+        Passage(id=13, study_id=5, section="discussion", text="d"),  # out of run
+    ]
+    store = StudyStore(
+        studies=studies, passages=passages, _study_by_id={s.id: s for s in studies}
+    )
+
+    for sid in (5, 2, 99):
+        assert store.get_passages_for_study(sid) == [
+            p for p in passages if p.study_id == sid
+        ]
+    assert store.get_passage_rows_for_study(2) == range(2, 3)
+    assert store.get_passage_by_id(12) is passages[2]
+    assert store.get_passage_by_id(99) is None
+    assert [p.id for p in store.get_passages_for_section("RESULTS")] == [11, 12]
+    assert store.get_study_ids_for_tag("strength") == [5, 2]
+    assert store.get_studies_by_ids({2, 5, 7}) == studies  # corpus order